@@ -0,0 +1,31 @@
+import context
+import pytest
+import torch
+import config as cfg
+from ipeps.ipeps import IPEPS
+from ctm.generic.env import ENV, write_env
+
+test_dims=[(8,2), (64,5)]
+
+
+def _env_8site(chi, D, packed):
+	state= IPEPS({(x,0): torch.rand((2,)+(D,)*4, dtype=cfg.global_args.torch_dtype)-0.5\
+		for x in range(8)}, lX=8, lY=1)
+	env= ENV(chi, state)
+	for ts in [env.C, env.T]:
+		for k in ts.keys(): ts[k]= torch.rand_like(ts[k])
+	if packed: env.pack_()
+	return env
+
+@pytest.mark.parametrize("dims",test_dims)
+@pytest.mark.parametrize("packed",[False,True])
+def test_profile_env_clone(dims, packed, benchmark):
+	env= _env_8site(*dims, packed)
+	benchmark.pedantic(env.clone, iterations=10, rounds=5, warmup_rounds=1)
+
+@pytest.mark.parametrize("dims",test_dims)
+@pytest.mark.parametrize("packed",[False,True])
+def test_profile_write_env(dims, packed, tmp_path, benchmark):
+	env= _env_8site(*dims, packed)
+	benchmark.pedantic(write_env, args=(env, tmp_path/"env.json"),\
+		iterations=1, rounds=5, warmup_rounds=1)
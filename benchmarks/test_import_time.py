@@ -0,0 +1,31 @@
+import context
+import os
+import sys
+import subprocess
+import pytest
+
+# modules imported by typical entry point, i.e. examples/j1j2/ctmrg_j1j2.py
+entry_points= {
+	"generic": "import config; from ipeps.ipeps import *; from ctm.generic.env import *;"\
+		+" from ctm.generic import ctmrg, rdm, transferops",
+	"c4v": "import config; from ipeps.ipeps_c4v import *; from ctm.one_site_c4v.env_c4v import *;"\
+		+" from ctm.one_site_c4v import ctmrg_c4v, transferops_c4v",
+}
+# optional dependencies, which are loaded only when used
+lazy_deps= ["scipy", "arrayfire", "yastn", "pkg_resources"]
+
+def _run(code):
+	root= os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	return subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0,'{root}'); "+code],\
+		cwd=root, capture_output=True, text=True, check=True)
+
+@pytest.mark.parametrize("entry_point",entry_points.keys())
+def test_profile_import(entry_point, benchmark):
+	benchmark.pedantic(_run, args=(entry_points[entry_point],), iterations=1, rounds=5,\
+		warmup_rounds=1)
+
+@pytest.mark.parametrize("entry_point",entry_points.keys())
+def test_lazy_deps(entry_point):
+	cp= _run(entry_points[entry_point]+"; print(' '.join(sys.modules.keys()))")
+	loaded= set(m.split('.')[0] for m in cp.stdout.split())
+	assert loaded.isdisjoint(lazy_deps), f"eagerly imported {loaded.intersection(lazy_deps)}"
@@ -0,0 +1,35 @@
+import context
+import pytest
+import torch
+import config as cfg
+from ipeps.ipeps import IPEPS, write_ipeps, read_ipeps
+
+test_dims=[(7,4), (9,4)]
+
+
+@pytest.mark.parametrize("dims",test_dims)
+@pytest.mark.parametrize("tensor_io_format",["legacy","1D","raw"])
+def test_profile_write_ipeps(dims, tensor_io_format, tmp_path, benchmark):
+	D,n_sites= dims
+
+	state= IPEPS({(x,0): torch.rand((2,)+(D,)*4, dtype=cfg.global_args.torch_dtype)-0.5\
+		for x in range(n_sites)}, lX=n_sites, lY=1)
+	global_args= cfg.GLOBALARGS()
+	global_args.tensor_io_format= tensor_io_format
+
+	benchmark.pedantic(write_ipeps, args=(state, tmp_path/"state.json"),\
+		kwargs={"global_args": global_args}, iterations=1, rounds=2, warmup_rounds=1)
+
+@pytest.mark.parametrize("dims",test_dims)
+@pytest.mark.parametrize("tensor_io_format",["legacy","1D","raw"])
+def test_profile_read_ipeps(dims, tensor_io_format, tmp_path, benchmark):
+	D,n_sites= dims
+
+	state= IPEPS({(x,0): torch.rand((2,)+(D,)*4, dtype=cfg.global_args.torch_dtype)-0.5\
+		for x in range(n_sites)}, lX=n_sites, lY=1)
+	global_args= cfg.GLOBALARGS()
+	global_args.tensor_io_format= tensor_io_format
+	write_ipeps(state, tmp_path/"state.json", global_args=global_args)
+
+	benchmark.pedantic(read_ipeps, args=(tmp_path/"state.json",),\
+		iterations=1, rounds=2, warmup_rounds=1)
@@ -1,17 +1,20 @@
+import importlib
+from functools import lru_cache
 import torch
 import argparse
 import logging
 
+@lru_cache(maxsize=None)
 def _torch_version_check(version):
     # for version="X.Y.Z" checks if current version is higher or equal to X.Y
     assert version.count('.')==2 and version.replace('.','').isdigit(),"Invalid version string"
     try:
-        import pkg_resources
-        return pkg_resources.parse_version(torch.__version__) >= pkg_resources.parse_version(version)
+        from packaging.version import parse
+        return parse(torch.__version__) >= parse(version)
     except ModuleNotFoundError:
         try:
-            from packaging import version
-            return version.parse(torch.__version__) >= version.parse(version)
+            import pkg_resources
+            return pkg_resources.parse_version(torch.__version__) >= pkg_resources.parse_version(version)
         except ModuleNotFoundError:
             tokens= torch.__version__.split('.')
             tokens_v= version.split('.')
@@ -19,11 +22,48 @@ def _torch_version_check(version):
                 (int(tokens[0])==int(tokens_v[0]) and int(tokens[1]) >= int(tokens_v[1])) 
     return True
 
+class _LazyModule():
+    def __init__(self, name, msg=None):
+        self._name= name
+        self._msg= msg
+        self._module= None
+
+    def __getattr__(self, attr):
+        if attr in ("_name", "_msg", "_module"):
+            raise AttributeError(attr)
+        if self._module is None:
+            try:
+                self._module= importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError(self._msg if self._msg else f"Missing {self._name}") from e
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'"+(">" if self._module is None else " (loaded)>")
+
+def _lazy_import(name, msg=None):
+    r"""
+    :param name: absolute name of the module
+    :param msg: error message, if the module is not available
+    :type name: str
+    :type msg: str
+    :return: module, which is imported on first access to any of its attributes
+    :rtype: _LazyModule
+
+    Defer import of heavy or optional dependency, i.e. ``scipy`` or ``arrayfire``,
+    until it is actually used. If it is not available, ``ImportError``
+    with message ``msg`` is raised on first use instead of at import.
+    """
+    return _LazyModule(name, msg)
+
 def get_args_parser():
     parser = argparse.ArgumentParser(description='',allow_abbrev=False)
     parser.add_argument("--omp_cores", type=int, default=1,help="number of OpenMP cores")
     parser.add_argument("--instate", default=None, help="Input state JSON")
     parser.add_argument("--instate_noise", type=float, default=0., help="magnitude of noise added to the trial \"instate\"")
+    parser.add_argument("--instate_env", default=None, help="environment file. If it exists,"\
+        +" CTM starts from the stored environment, extended or compressed to chi. Otherwise, the converged"\
+        +" environment is written into it")
     parser.add_argument("--ipeps_init_type", default="RANDOM", help="initialization of the trial iPEPS state")
     parser.add_argument("--out_prefix", default="output", help="Output files prefix")
     parser.add_argument("--bond_dim", type=int, default=1, help="iPEPS auxiliary bond dimension")
@@ -142,6 +182,11 @@ class MAINARGS():
     :vartype instate: str or Path
     :ivar instate_noise: magnitude of noise applied to the input state, if any. Default: ``0.0``
     :vartype instate_noise: float
+    :ivar instate_env: environment file. If it exists, CTM is initialized with the environment 
+                       stored in it, which is validated against the input state and extended
+                       or compressed to ``chi``. Otherwise, 
+                       the converged environment is written into it. Default: ``None``
+    :vartype instate_env: str or Path
     :ivar ipeps_init_type: initialization of the trial iPEPS state, if no ``instate`` is provided. Default: ``RANDOM``
     :vartype ipeps_init_type: str
     :ivar out_prefix: output file prefix. Default: ``output``
@@ -173,6 +218,12 @@ class GLOBALARGS():
     Holds global configuration options. The default settings can be modified through 
     command line arguments as follows ``--GLOBALARGS_<variable-name> desired-value``
 
+    :ivar tensor_io_format: format in which tensors of states are written out. Choices: 
+               ``'legacy'`` (list of entries), ``'1D'`` (flat array of elements) or ``'raw'``
+               (binary container of JSON header and raw arrays, memory-mapped on read, 
+               see :mod:`ipeps.tensor_io`). The readers detect the format automatically. 
+               Default: ``'legacy'``
+    :vartype tensor_io_format: str
     :ivar dtype: data type of all torch.tensor. Default: ``float64``
     :vartype dtype: torch.dtype
     :ivar device: device on which all the torch.tensors are stored. Default: ``'cpu'``
@@ -181,6 +232,29 @@ class GLOBALARGS():
                and all the intermediates of CTM on CPU and compute only the core parts of the expensive
                CTM step on GPU. Default: ``'None'``
     :vartype offload_to_gpu: str
+    :ivar oe_path_cache: directory of the persistent cache of contraction paths 
+               found by :mod:`oe_ext`, shared between runs and processes. 
+               Use ``python -m oe_ext.path_cache <dir>`` to pre-warm the cache. Default: ``'None'``
+    :vartype oe_path_cache: str
+    :ivar oe_memory_target: peak memory (in GiB) targeted by contractions with automatically 
+               selected unrolled indices, i.e. ``unroll='auto'``. If non-positive, 
+               no indices are unrolled. Default: ``0.0``
+    :vartype oe_memory_target: float
+    :ivar oe_unroll_workers: number of threads evaluating unrolled contractions of :mod:`oe_ext`
+               concurrently. Default: ``1``
+    :vartype oe_unroll_workers: int
+    :ivar oe_expression_registry: maximal number of compiled contraction expressions of 
+               :mod:`oe_ext` kept for reuse, together with their folded constant subnetworks.
+               If zero, expressions are compiled and constants are folded anew by every 
+               contraction. Default: ``16``
+    :vartype oe_expression_registry: int
+    :ivar rdm_variant_selection: selection among implementation variants of reduced density 
+               matrices in :mod:`ctm.generic.rdm_dispatch`. Choices: ``'default'`` (fixed variants)
+               or ``'benchmark'`` (fastest variant by one-off micro-benchmark). Default: ``'default'``
+    :vartype rdm_variant_selection: str
+    :ivar rdm_variant_cache: JSON file caching the variants selected by micro-benchmark. 
+               Default: ``'None'``
+    :vartype rdm_variant_cache: str
     """
     def __init__(self):
         self.tensor_io_format= "legacy"
@@ -188,6 +262,12 @@ class GLOBALARGS():
         self.torch_dtype= torch.float64
         self.device= 'cpu'
         self.offload_to_gpu= 'None'
+        self.oe_path_cache= 'None'
+        self.oe_memory_target= 0.0
+        self.oe_unroll_workers= 1
+        self.oe_expression_registry= 16
+        self.rdm_variant_selection= 'default'
+        self.rdm_variant_cache= 'None'
 
     def __str__(self):
         res=type(self).__name__+"\n"
@@ -286,6 +366,36 @@ class CTMARGS():
     :vartype fwd_checkpoint_absorb: bool
     :ivar fwd_checkpoint_move: recompute forward pass of whole ``ctm_MOVE`` during backward pass. Default: ``False``
     :vartype fwd_checkpoint_move: bool
+    :ivar fwd_checkpoint_loop_rdm: recompute forward pass of unrolled loops of looped reduced density matrices
+                                   during backward pass. Default: ``False``
+    :vartype fwd_checkpoint_loop_rdm: bool
+    :ivar memory_budget: if positive, memory (in GiB) available for the activations of CTM retained for 
+                         backward pass. The ``fwd_checkpoint_*`` flags are then chosen automatically 
+                         within optimization, see :func:`ctm.generic.checkpoint_planner.plan_checkpoints`.
+                         Default: ``0.0``
+    :vartype memory_budget: float
+    :ivar rdm_batched: compute reduced density matrices of several subsystems in a single batched
+                       contraction, see :func:`ctm.generic.rdm.rdm2x2_batched`. If ``False``,
+                       they are computed one by one. Default: ``False``
+    :vartype rdm_batched: bool
+    :ivar rdm_batched_memory: if positive, memory (in GiB) available for the largest intermediate
+                              of batched contraction of reduced density matrices. If exceeded,
+                              they are computed one by one. Default: ``0.0``
+    :vartype rdm_batched_memory: float
+    :ivar ctm_pack_env: pack environment tensors of converged environment into a single
+                        contiguous buffer, see :meth:`ctm.generic.env.ENV.pack_`. Default: ``False``
+    :vartype ctm_pack_env: bool
+    :ivar ctm_out_of_core: keep environment tensors, which do not enter the current directional
+                           move, in memory-mapped files and page them in on demand, prefetching
+                           the tensors of the next move on background thread.
+                           See :class:`ctm.generic.env_ooc.OutOfCoreStore`. Effective only
+                           with ``projector_method='4X2'``. Default: ``False``
+    :vartype ctm_out_of_core: bool
+    :ivar ctm_out_of_core_dir: directory for memory-mapped files of out-of-core environment.
+                               If ``'None'``, default temporary directory is used. It has to
+                               reside on disk, directories on ``tmpfs`` save no memory.
+                               Default: ``'None'``
+    :vartype ctm_out_of_core_dir: str
 
     FPCM related options
 
@@ -348,6 +458,12 @@ class CTMARGS():
         self.fwd_checkpoint_absorb = False
         self.fwd_checkpoint_move = False
         self.fwd_checkpoint_loop_rdm = False
+        self.memory_budget = 0.0
+        self.rdm_batched = False
+        self.rdm_batched_memory = 0.0
+        self.ctm_pack_env = False
+        self.ctm_out_of_core = False
+        self.ctm_out_of_core_dir = 'None'
 
     def __str__(self):
         res=type(self).__name__+"\n"
@@ -398,6 +514,14 @@ class OPTARGS():
     :vartype momentum: float
     :ivar dampening: dampening used in the SGD step
     :vartype dampening: float
+    :ivar precondition: preconditioning of the gradient in the SGD step. Supported options are
+        ``'NONE'`` and ``'NORM'``, the latter using the single-site norm tensors built from 
+        the environment as an approximate metric, see 
+        :func:`optim.norm_metric.precondition_norm_metric`. Default: ``'NONE'``
+    :vartype precondition: str
+    :ivar precondition_eps: regularization of the norm metric relative to its largest eigenvalue.
+        Default: ``1.0e-4``
+    :vartype precondition_eps: float
 
     Gradients through finite differences
 
@@ -407,6 +531,26 @@ class OPTARGS():
     :ivar fd_ctm_reinit: recompute environment from scratch after applying the displacement.
         Default: ``True`` 
 
+    Adaptive (inexact) CTM convergence
+
+    :ivar ctm_conv_tol_adaptive: adapt CTM convergence tolerance ``CTMARGS.ctm_conv_tol`` and 
+        maximal number of CTM iterations ``CTMARGS.ctm_max_iter`` to the progress of optimization.
+        The environment is converged loosely while the gradient and the change of the loss
+        are large and progressively tighter as the optimization converges, reaching 
+        the tolerance set by ``CTMARGS``. Default: ``False``
+    :vartype ctm_conv_tol_adaptive: bool
+    :ivar ctm_conv_tol_max: loosest CTM convergence tolerance used. Default: ``1.0e-4``
+    :vartype ctm_conv_tol_max: float
+    :ivar ctm_conv_tol_scale: CTM convergence tolerance is set to ``ctm_conv_tol_scale`` times 
+        the smaller of :math:`\infty`-norm of gradient and the change of the loss in the last epoch.
+        Default: ``1.0e-2``
+    :vartype ctm_conv_tol_scale: float
+    :ivar ctm_conv_tol_tighten_factor: smallest allowed ratio of CTM convergence tolerances 
+        between two consecutive epochs. Default: ``0.1``
+    :vartype ctm_conv_tol_tighten_factor: float
+    :ivar ctm_max_iter_min: maximal number of CTM iterations at the loosest tolerance. Default: ``10``
+    :vartype ctm_max_iter_min: int
+
     Logging
 
     :ivar opt_logging: turns on recording of additional data from optimization, such as
@@ -422,6 +566,8 @@ class OPTARGS():
         self.lr= 1.0
         self.momentum= 0.
         self.dampening= 0.
+        self.precondition= 'NONE'
+        self.precondition_eps= 1.0e-4
         self.tolerance_grad= 1e-5
         self.tolerance_change= 1e-9
         self.opt_ctm_reinit= True
@@ -432,6 +578,11 @@ class OPTARGS():
         self.line_search_tol= 1.0e-8
         self.fd_eps= 1.0e-4
         self.fd_ctm_reinit= True
+        self.ctm_conv_tol_adaptive= False
+        self.ctm_conv_tol_max= 1.0e-4
+        self.ctm_conv_tol_scale= 1.0e-2
+        self.ctm_conv_tol_tighten_factor= 0.1
+        self.ctm_max_iter_min= 10
         self.history_size= 100
         self.max_iter_per_epoch= 1
         self.verbosity_opt_epoch= 1
@@ -0,0 +1,212 @@
+import warnings
+from itertools import product
+import torch
+import config as cfg
+from ctm.generic.env import ENV
+import logging
+log = logging.getLogger(__name__)
+
+# stages of directional CTM (and RDM evaluation) which can be checkpointed,
+# in the order of increasing granularity
+_STAGES= ("c2x2", "halves", "projectors", "absorb", "move", "loop_rdm")
+
+def _site_dims(A):
+    # returns (D^2, p), the dimension of double-layer auxiliary index and physical dimension
+    # squared, for either single-layer (p,D,D,D,D) or double-layer (D^2,D^2,D^2,D^2) on-site tensor
+    if len(A.size())==5:
+        return max(A.size()[1:])**2, A.size(0)
+    return max(A.size()), 1
+
+def estimate_ctm_stages(state, env, ctm_args=cfg.ctm_args, loop_rdm=False):
+    r"""
+    :param state: wavefunction
+    :param env: environment
+    :param ctm_args: CTM algorithm configuration
+    :param loop_rdm: include evaluation of looped 2x3 and 3x2 reduced density matrices
+    :type state: IPEPS
+    :type env: ENV
+    :type ctm_args: CTMARGS
+    :type loop_rdm: bool
+    :return: for each stage, the number of elements of intermediate tensors retained for backward
+             pass (``"mem"``), the number of elements of its outputs (``"out"``) and
+             the cost (FLOPs) of its forward pass (``"flops"``). The estimates for CTM stages
+             are given per single directional ``ctm_MOVE``, the estimates
+             for ``"loop_rdm"`` per single evaluation of all looped RDMs.
+    :rtype: dict[str, dict]
+
+    Estimates the activation memory of individual stages of directional CTM from the shapes
+    of on-site and environment tensors. The estimates follow the sequence of contractions
+    in :func:`ctm.generic.ctm_components.c2x2_LU_sl_c`,
+    :func:`ctm.generic.ctm_projectors.ctm_get_projectors_from_matrices` and
+    :func:`ctm.generic.ctmrg.absorb_truncate_CTM_MOVE_UP_c` (and their counterparts)
+    keeping only the leading terms.
+    """
+    X= env.chi
+    sl= not ctm_args.ctm_force_dl
+    n_corners= 4 if ctm_args.projector_method=='4X4' else 2
+    est= {s: dict({"mem": 0, "out": 0, "flops": 0}) for s in _STAGES}
+
+    for coord in state.sites.keys():
+        D2, p= _site_dims(state.site(coord))
+        if not sl: D2, p= D2*p, 1
+
+        # enlarged corners C2x2: C--T, C--T--T, C--T--T--a, (C--T--T--a)--a*
+        est["c2x2"]["mem"]+= n_corners*(X**2*D2 + X**2*D2**2 + X**2*D2**2*p)
+        est["c2x2"]["out"]+= n_corners*X**2*D2
+        est["c2x2"]["flops"]+= n_corners*(X**3*D2 + X**3*D2**2 + 2*X**2*D2**3*p)
+
+        # halves of 4x4 network
+        if n_corners==4:
+            est["halves"]["mem"]+= 4*X**2*D2
+            est["halves"]["out"]+= 2*X**2*D2
+            est["halves"]["flops"]+= 2*(X*D2)**3
+
+        # projectors: M=R^T Rt, truncated U,S,V and projectors P, Pt
+        est["projectors"]["mem"]+= X**2*D2**2 + 2*X**2*D2
+        est["projectors"]["out"]+= 2*X**2*D2 + 2*X**2*D2
+        est["projectors"]["flops"]+= (X*D2)**3 + 2*X**3*D2**2
+
+        # absorption and truncation: new C's and T
+        est["absorb"]["mem"]+= 2*X**2*D2 + X**2*D2**2*(2+p)
+        est["absorb"]["out"]+= 2*X**2 + X**2*D2
+        est["absorb"]["flops"]+= 2*X**3*D2 + 2*X**3*D2**2 + 2*X**2*D2**3*p
+
+        # the whole move retains only the new environment tensors
+        est["move"]["out"]+= 2*X**2 + X**2*D2
+
+        # looped 2x3 and 3x2 RDMs
+        if loop_rdm:
+            est["loop_rdm"]["mem"]+= 2*X**2*D2**4*p**2
+            est["loop_rdm"]["out"]+= 2*p**8
+            est["loop_rdm"]["flops"]+= 2*X**3*D2**4*p**2
+
+    # within move, SVD is also recomputed (~ 10 (X D^2)^3 FLOPs)
+    est["move"]["flops"]= sum(est[s]["flops"] for s in _STAGES[:4]) \
+        + 10*sum( (X*_site_dims(A)[0])**3 for A in state.sites.values() )
+    return est
+
+def _retained_per_move(est, flags):
+    r"""
+    Elements retained for backward pass by single ``ctm_MOVE`` under checkpointing ``flags``.
+    """
+    mem= 0
+    # c2x2 within halves are not retained if halves are checkpointed
+    if not (flags["c2x2"] or flags["halves"]):
+        mem+= est["c2x2"]["mem"]
+    mem+= est["c2x2"]["out"] if not flags["halves"] else est["halves"]["out"]
+    if not flags["halves"]:
+        mem+= est["halves"]["mem"]
+    mem+= est["projectors"]["out"] + (0 if flags["projectors"] else est["projectors"]["mem"])
+    mem+= est["absorb"]["out"] + (0 if flags["absorb"] else est["absorb"]["mem"])
+    return mem
+
+def estimate_retained_memory(est, flags, n_moves, n_rdm=1):
+    r"""
+    :param est: stage estimates as returned by :func:`estimate_ctm_stages`
+    :param flags: checkpointing flags for each stage
+    :param n_moves: total number of ``ctm_MOVE`` calls recorded by autograd
+    :param n_rdm: number of evaluations of looped RDMs recorded by autograd
+    :type est: dict[str, dict]
+    :type flags: dict[str, bool]
+    :type n_moves: int
+    :type n_rdm: int
+    :return: number of retained elements and extra FLOPs due to recomputation
+    :rtype: int, int
+    """
+    per_move= _retained_per_move(est, flags)
+    if flags["move"]:
+        # only outputs of each move are retained, the intermediates of a single
+        # move are materialized during its recomputation in backward pass
+        mem= n_moves*est["move"]["out"] + per_move
+    else:
+        mem= n_moves*per_move
+    mem+= n_rdm*(est["loop_rdm"]["out"] if flags["loop_rdm"] else est["loop_rdm"]["mem"])
+
+    # recomputation: each checkpointed stage is evaluated once more, stages nested
+    # in checkpointed move are evaluated once more for every checkpoint level
+    flops= 0
+    if flags["move"]: flops+= n_moves*est["move"]["flops"]
+    for s in ("c2x2", "halves", "projectors", "absorb"):
+        if flags[s]: flops+= n_moves*est[s]["flops"]
+    if flags["halves"] and not flags["c2x2"]:
+        flops+= n_moves*est["c2x2"]["flops"]
+    if flags["loop_rdm"]: flops+= n_rdm*est["loop_rdm"]["flops"]
+    return mem, flops
+
+def plan_checkpoints(state, env, memory_budget=None, loop_rdm=False, ctm_args=cfg.ctm_args,\
+    global_args=cfg.global_args, verbosity=0):
+    r"""
+    :param state: wavefunction
+    :param env: environment
+    :param memory_budget: memory (in GiB) available for activations retained
+                          for backward pass. If ``None``, ``ctm_args.memory_budget`` is used
+    :param loop_rdm: consider also checkpointing of looped reduced density matrices, see
+                     ``CTMARGS.fwd_checkpoint_loop_rdm``
+    :param ctm_args: CTM algorithm configuration. Its ``fwd_checkpoint_*`` flags are set in-place
+    :param global_args: global configuration
+    :param verbosity: logging verbosity
+    :type state: IPEPS
+    :type env: ENV
+    :type memory_budget: float
+    :type loop_rdm: bool
+    :type ctm_args: CTMARGS
+    :type global_args: GLOBALARGS
+    :type verbosity: int
+    :return: selected plan with keys ``"flags"``, ``"mem"`` (estimated retained memory
+             in GiB) and ``"flops"`` (estimated FLOPs spent in recomputation)
+    :rtype: dict
+
+    Selects the set of checkpointed CTM stages (``fwd_checkpoint_c2x2``, ``_halves``,
+    ``_projectors``, ``_absorb``, ``_move``, and optionally ``_loop_rdm``) which fits
+    the activation memory of the whole CTMRG, assuming ``ctm_args.ctm_max_iter`` iterations,
+    into ``memory_budget`` and incurs the least recomputation cost.
+    The loss functions evaluating looped RDMs with unrolled loops pass
+    ``ctm_args.fwd_checkpoint_loop_rdm`` as ``checkpoint_unrolled``, see e.g.
+    :meth:`models.spin_triangular.J1J2J4_1SITEQ.energy_per_site`, hence the selected flag
+    takes effect through ``ctm_args`` alone.
+    If no set of checkpoints fits the budget, the one with the smallest memory is selected.
+
+    Only environments of generic iPEPS are supported, for other environments the flags
+    are left unchanged.
+    """
+    if memory_budget is None: memory_budget= ctm_args.memory_budget
+    if not isinstance(env, ENV):
+        warnings.warn(f"Checkpoint planning is not supported for {type(env).__name__}",\
+            RuntimeWarning)
+        return None
+
+    itemsize= torch.empty((), dtype=state.dtype).element_size()
+    budget= memory_budget*1024**3/itemsize
+    n_moves= ctm_args.ctm_max_iter*(2*state.lX + 2*state.lY)
+    n_rdm= 1 if loop_rdm else 0
+
+    est= estimate_ctm_stages(state, env, ctm_args=ctm_args, loop_rdm=loop_rdm)
+    # on-site and environment tensors are always held in memory
+    base= sum(t.numel() for t in state.sites.values()) \
+        + sum(t.numel() for t in env.C.values()) + sum(t.numel() for t in env.T.values())
+
+    # halves are relevant only for projectors built from 4x4 network
+    stages= tuple(s for s in _STAGES if (s!="loop_rdm" or loop_rdm) \
+        and (s!="halves" or ctm_args.projector_method=='4X4'))
+    candidates= []
+    for vals in product((False,True), repeat=len(stages)):
+        flags= dict({s: False for s in _STAGES}, **dict(zip(stages, vals)))
+        mem, flops= estimate_retained_memory(est, flags, n_moves, n_rdm)
+        candidates.append( (base+mem, flops, sum(vals), flags) )
+
+    fitting= [c for c in candidates if c[0] <= budget]
+    if len(fitting)>0:
+        mem, flops, _, flags= min(fitting, key=lambda c: (c[1], c[2], c[0]))
+    else:
+        mem, flops, _, flags= min(candidates, key=lambda c: (c[0], c[1]))
+        warnings.warn(f"No checkpointing fits memory budget {memory_budget} GiB. "\
+            +f"Estimated memory {mem*itemsize/1024**3} GiB", RuntimeWarning)
+
+    for s in stages:
+        setattr(ctm_args, "fwd_checkpoint_"+s, flags[s])
+
+    plan= dict({"flags": flags, "mem": mem*itemsize/1024**3, "flops": flops})
+    log.info(f"checkpoint plan {plan}")
+    if verbosity>0:
+        print(f"checkpoint plan {plan}")
+    return plan
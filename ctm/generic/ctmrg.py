@@ -5,9 +5,11 @@ from torch.utils.checkpoint import checkpoint
 import config as cfg
 from config import _torch_version_check
 from ipeps.ipeps import IPEPS
+from ipeps.site_cache import refresh_sites
 from ctm.generic.env import *
 from ctm.generic.ctm_components import *
 from ctm.generic.ctm_projectors import *
+from ctm.generic.env_ooc import OutOfCoreStore
 from tn_interface import contract, einsum
 from tn_interface import conj
 from tn_interface import contiguous, view, permute
@@ -35,7 +37,11 @@ def run(state, env, conv_check=None, ctm_args=cfg.ctm_args, global_args=cfg.glob
     ``conv_check(IPEPS,ENV,Object,CTMARGS)`` where ``Object`` is an arbitary argument. For 
     example it can be a list or dict used for storing CTM data from previous steps to   
     check convergence.
+
+    Stale on-site tensors of ``state`` derived from other tensors,
+    see :func:`ipeps.site_cache.cached_build`, are rebuilt once before the CTM starts.
     """
+    refresh_sites(state)
 
     # 0) Create double-layer (DL) tensors, preserving the same convention
     # for order of indices 
@@ -59,33 +65,53 @@ def run(state, env, conv_check=None, ctm_args=cfg.ctm_args, global_args=cfg.glob
         stateDL = IPEPS(sites=sitesDL,vertexToSite=state.vertexToSite,lX=state.lX,lY=state.lY,\
             global_args=global_args)
 
+    # keep environment tensors outside of the current move in memory-mapped files
+    ooc_store= None
+    if ctm_args.ctm_out_of_core:
+        if ctm_args.projector_method!='4X2':
+            log.warning("Out-of-core environment requires projector_method 4X2, "\
+                +f"with {ctm_args.projector_method} all tensors are kept in memory")
+        ooc_store= OutOfCoreStore(None if ctm_args.ctm_out_of_core_dir=='None' \
+            else ctm_args.ctm_out_of_core_dir)
+    move_sequence= ctm_args.ctm_move_sequence
+
     # 1) perform CTMRG
     t_obs=t_ctm=0.
     history=None
-    for i in range(ctm_args.ctm_max_iter):
-        t0_ctm= time.perf_counter()
-        for direction in ctm_args.ctm_move_sequence:
-            diagnostics={"ctm_i": i, "ctm_d": direction} if ctm_args.verbosity_projectors>0 else None
-            num_rows_or_cols= stateDL.lX if direction in [(-1,0),(1,0)] else stateDL.lY
-            for row_or_col in range(num_rows_or_cols):
-                ctm_MOVE(direction, stateDL, env, ctm_args=ctm_args, global_args=global_args, \
-                    verbosity=ctm_args.verbosity_ctm_move,diagnostics=diagnostics)
-        t1_ctm= time.perf_counter()
-
-        t0_obs= time.perf_counter()
-        if conv_check is not None:
-            # evaluate convergence of the CTMRG procedure
-            converged, history = conv_check(state, env, history, ctm_args=ctm_args)
-            if ctm_args.verbosity_ctm_convergence>1: print(history)
-            if converged:
-                if ctm_args.verbosity_ctm_convergence>0: 
-                    print(f"CTMRG  converged at iter= {i}, history= {history[-1]}")
-                break
-        t1_obs= time.perf_counter()
-
-        t_ctm+= t1_ctm-t0_ctm
-        t_obs+= t1_obs-t0_obs
-
+    try:
+        for i in range(ctm_args.ctm_max_iter):
+            t0_ctm= time.perf_counter()
+            for i_d,direction in enumerate(move_sequence):
+                diagnostics={"ctm_i": i, "ctm_d": direction} if ctm_args.verbosity_projectors>0 else None
+                num_rows_or_cols= stateDL.lX if direction in [(-1,0),(1,0)] else stateDL.lY
+                for row_or_col in range(num_rows_or_cols):
+                    next_direction= direction if row_or_col<num_rows_or_cols-1 \
+                        else move_sequence[(i_d+1)%len(move_sequence)]
+                    ctm_MOVE(direction, stateDL, env, ctm_args=ctm_args, global_args=global_args, \
+                        verbosity=ctm_args.verbosity_ctm_move,diagnostics=diagnostics,\
+                        ooc_store=ooc_store, prefetch_direction=next_direction)
+            t1_ctm= time.perf_counter()
+
+            t0_obs= time.perf_counter()
+            if conv_check is not None:
+                # spilled tensors reside in host memory, load them to the device of environment
+                if ooc_store is not None and torch.device(env.device).type!='cpu':
+                    ooc_store.require(env, None)
+                # evaluate convergence of the CTMRG procedure
+                converged, history = conv_check(state, env, history, ctm_args=ctm_args)
+                if ctm_args.verbosity_ctm_convergence>1: print(history)
+                if converged:
+                    if ctm_args.verbosity_ctm_convergence>0: 
+                        print(f"CTMRG  converged at iter= {i}, history= {history[-1]}")
+                    break
+            t1_obs= time.perf_counter()
+
+            t_ctm+= t1_ctm-t0_ctm
+            t_obs+= t1_obs-t0_obs
+    finally:
+        if ooc_store is not None: ooc_store.close(env)
+
+    if ctm_args.ctm_pack_env: env.pack_()
     return env, history, t_ctm, t_obs
 
 def run_overlap(state1, state2, env, conv_check=None, ctm_args=cfg.ctm_args, global_args=cfg.global_args):
@@ -107,6 +133,8 @@ def run_overlap(state1, state2, env, conv_check=None, ctm_args=cfg.ctm_args, glo
     # """
 
     assert ctm_args.ctm_force_dl,'ctmrg for wavefunction overlap requires use of double-layer routines'
+    refresh_sites(state1)
+    refresh_sites(state2)
     # 0) Create double-layer (DL) tensors, preserving the same convention
     # for order of indices
     #
@@ -156,7 +184,7 @@ def run_overlap(state1, state2, env, conv_check=None, ctm_args=cfg.ctm_args, glo
 # performs 
 # 
 def ctm_MOVE(direction, state, env, ctm_args=cfg.ctm_args, global_args=cfg.global_args, \
-    verbosity=0, diagnostics=None):
+    verbosity=0, diagnostics=None, ooc_store=None, prefetch_direction=None):
     r"""
     :param direction: one of Up=(0,-1), Left=(-1,0), Down=(0,1), Right=(1,0)
     :type direction: tuple(int,int)
@@ -164,10 +192,16 @@ def ctm_MOVE(direction, state, env, ctm_args=cfg.ctm_args, global_args=cfg.globa
     :param env: environment
     :param ctm_args: CTM algorithm configuration
     :param global_args: global configuration
+    :param ooc_store: store for environment tensors not entering this move. If ``None``,
+                      all environment tensors are kept in memory
+    :param prefetch_direction: direction of the next move, whose tensors are paged in
+                               on background thread while this move is executed
     :type state: IPEPS
     :type env: ENV
     :type ctm_args: CTMARGS
     :type global_args: GLOBALARGS
+    :type ooc_store: OutOfCoreStore
+    :type prefetch_direction: tuple(int,int)
 
     Executes a single directional CTM move in one of the directions. First, build  
     projectors for each non-equivalent bond (to be truncated) in the unit cell of iPEPS.
@@ -182,6 +216,12 @@ def ctm_MOVE(direction, state, env, ctm_args=cfg.ctm_args, global_args=cfg.globa
     else:
         raise ValueError("Invalid Projector method: "+str(ctm_args.projector_method))
 
+    # page in environment tensors entering this move and spill the rest
+    if ooc_store is not None:
+        ooc_store.require(env, direction, ctm_args)
+        if prefetch_direction is not None:
+            ooc_store.prefetch(env, prefetch_direction, ctm_args)
+
     # 0) extract raw tensors as tuple
     tensors= tuple(state.sites[key] for key in state.sites.keys()) \
         + tuple(env.C[key] for key in env.C.keys()) + tuple(env.T[key] for key in env.T.keys())
@@ -314,7 +354,7 @@ def absorb_truncate_CTM_MOVE_UP(coord, state, env, P, Pt, ctm_args=cfg.ctm_args)
     if mode:
         tensors += (torch.ones(1,dtype=torch.bool),)
 
-    if cfg.ctm_args.fwd_checkpoint_absorb:
+    if ctm_args.fwd_checkpoint_absorb:
         return checkpoint(absorb_truncate_CTM_MOVE_UP_c,*tensors)
     else:
         return absorb_truncate_CTM_MOVE_UP_c(*tensors)
@@ -434,7 +474,7 @@ def absorb_truncate_CTM_MOVE_LEFT(coord, state, env, P, Pt, ctm_args=cfg.ctm_arg
     if mode:
         tensors += (torch.ones(1,dtype=torch.bool),)
 
-    if cfg.ctm_args.fwd_checkpoint_absorb:
+    if ctm_args.fwd_checkpoint_absorb:
         return checkpoint(absorb_truncate_CTM_MOVE_LEFT_c,*tensors)
     else:
         return absorb_truncate_CTM_MOVE_LEFT_c(*tensors)
@@ -560,7 +600,7 @@ def absorb_truncate_CTM_MOVE_DOWN(coord, state, env, P, Pt, ctm_args=cfg.ctm_arg
     if mode:
         tensors += (torch.ones(1,dtype=torch.bool),)
 
-    if cfg.ctm_args.fwd_checkpoint_absorb:
+    if ctm_args.fwd_checkpoint_absorb:
         return checkpoint(absorb_truncate_CTM_MOVE_DOWN_c,*tensors)
     else:
         return absorb_truncate_CTM_MOVE_DOWN_c(*tensors)
@@ -676,7 +716,7 @@ def absorb_truncate_CTM_MOVE_RIGHT(coord, state, env, P, Pt, ctm_args=cfg.ctm_ar
     if mode:
         tensors += (torch.ones(1,dtype=torch.bool),)
 
-    if cfg.ctm_args.fwd_checkpoint_absorb:
+    if ctm_args.fwd_checkpoint_absorb:
         return checkpoint(absorb_truncate_CTM_MOVE_RIGHT_c,*tensors)
     else:
         return absorb_truncate_CTM_MOVE_RIGHT_c(*tensors)
@@ -1,6 +1,9 @@
-from math import sqrt
+from math import sqrt, prod
+import warnings
 import torch
 import config as cfg
+from ipeps.tensor_io import load_json, write_json, serialize_bare_tensor_raw,\
+    read_bare_json_tensor_np, fingerprint_tensors
 from tn_interface import einsum
 from tn_interface import conj
 from tn_interface import contiguous, view
@@ -70,6 +73,9 @@ class ENV():
             The structure of fused double-layer legs, which are carried by T-tensors, is obtained
             by fusing on-site tensor (`ket`) with its conjugate (`bra`). The leg of `ket` always
             preceeds `bra` when fusing.
+
+        Optionally, all environment tensors can be packed into a single contiguous buffer, 
+        see :meth:`pack_`.
         """
         if state:
             self.dtype= state.dtype
@@ -82,7 +88,7 @@ class ENV():
         # initialize environment tensors
         self.C = dict()
         self.T = dict()
-
+        self._packed= None
 
         if state is not None:
             numl= 2 if len(next(iter(state.sites.values())).size())>4 else 1
@@ -124,6 +130,10 @@ class ENV():
             This operation preserves gradient tracking.
         """
         new_env= ENV(self.chi, ctm_args=ctm_args, global_args=global_args)
+        if self.is_packed():
+            buffer, layout, views= self._packed
+            new_env._set_packed(buffer.clone(), layout)
+            return new_env
         new_env.C= { k: c.clone() for k,c in self.C.items() }
         new_env.T= { k: t.clone() for k,t in self.T.items() }
         return new_env
@@ -142,14 +152,96 @@ class ENV():
             This operation does not preserve gradient tracking.
         """
         new_env= ENV(self.chi, ctm_args=ctm_args, global_args=global_args)
+        if self.is_packed():
+            buffer, layout, views= self._packed
+            new_env._set_packed(buffer.detach(), layout)
+            return new_env
         new_env.C= { k: c.detach() for k,c in self.C.items() }
         new_env.T= { k: t.detach() for k,t in self.T.items() }
         return new_env
 
     def detach_(self):
+        if self.is_packed():
+            # views can not be detached in-place
+            buffer, layout, views= self._packed
+            self._set_packed(buffer.detach(), layout)
+            return
         for c in self.C.values(): c.detach_()
         for t in self.T.values(): t.detach_()
 
+    def _set_packed(self, buffer, layout):
+        # rebind environment tensors to views into flat buffer
+        self.C, self.T= dict(), dict()
+        views= tuple(t.view(shape) for t,(label,key,shape) in \
+            zip(torch.split(buffer, [prod(shape) for label,key,shape in layout]), layout))
+        for t,(label,key,shape) in zip(views,layout):
+            getattr(self,label)[key]= t
+        self.dtype, self.device= buffer.dtype, buffer.device
+        self._packed= (buffer, layout, views)
+
+    def pack_(self):
+        r"""
+        Copy all environment tensors into a single contiguous buffer and replace them 
+        by its views. Afterwards, :meth:`clone`, :meth:`detach` and :meth:`write_env` 
+        operate on the whole buffer at once.
+
+        The environment remains packed only until any of its tensors is replaced, 
+        i.e. by directional CTM move. See :meth:`is_packed`.
+
+        .. note::
+            This operation preserves gradient tracking.
+        """
+        layout= tuple((label, key, tuple(t.size())) for label,ts in [("C",self.C), ("T",self.T)]\
+            for key,t in ts.items())
+        if len(layout)==0: return
+        buffer= torch.cat([getattr(self,label)[key].reshape(-1) for label,key,shape in layout])
+        self._set_packed(buffer, layout)
+
+    def is_packed(self):
+        r"""
+        :return: ``True`` if all environment tensors are views into the buffer created 
+                 by :meth:`pack_`
+        :rtype: bool
+        """
+        if getattr(self, "_packed", None) is None: return False
+        buffer, layout, views= self._packed
+        if len(layout)!=len(self.C)+len(self.T): return False
+        return all(getattr(self,label).get(key, None) is t for t,(label,key,shape) in zip(views,layout))
+
+    def get_packed(self):
+        r"""
+        :return: flat buffer holding all environment tensors and its layout, 
+                 i.e. a tuple of (``"C"`` or ``"T"``, key, shape) for each tensor
+        :rtype: torch.Tensor, tuple
+
+        Pack the environment, if it is not packed already. See :meth:`pack_`.
+        """
+        if not self.is_packed(): self.pack_()
+        return self._packed[:2]
+
+    @staticmethod
+    def from_packed(chi, buffer, layout, ctm_args=cfg.ctm_args, global_args=cfg.global_args):
+        r"""
+        :param chi: environment bond dimension :math:`\chi`
+        :param buffer: flat buffer holding all environment tensors
+        :param layout: layout of the ``buffer``, see :meth:`get_packed`
+        :param ctm_args: CTM algorithm configuration
+        :param global_args: global configuration
+        :type chi: int
+        :type buffer: torch.Tensor
+        :type layout: tuple
+        :type ctm_args: CTMARGS
+        :type global_args: GLOBALARGS
+        :return: packed environment with tensors being views into ``buffer``
+        :rtype: ENV
+
+        Counterpart of :meth:`get_packed`. The ``buffer`` is not copied, i.e. it can
+        reside in shared memory. 
+        """
+        env= ENV(chi, ctm_args=ctm_args, global_args=global_args)
+        env._set_packed(buffer, layout)
+        return env
+
     def extend(self, new_chi, ctm_args=cfg.ctm_args, global_args=cfg.global_args):
         r"""
         :param new_chi: new environment bond dimension
@@ -189,6 +281,21 @@ class ENV():
 
         return new_env
 
+    def save(self, outputfile, state=None):
+        r"""
+        Write environment to file. See :meth:`write_env`.
+        """
+        write_env(self, outputfile, state=state)
+
+    @staticmethod
+    def load(inputfile, state=None, strict=True, ctm_args=cfg.ctm_args,\
+        global_args=cfg.global_args):
+        r"""
+        Read environment from file. See :meth:`read_env`.
+        """
+        return read_env(inputfile, state=state, strict=strict, ctm_args=ctm_args,\
+            global_args=global_args)
+
     def get_spectra(self):
         spec= {}
         for c_key, c_t in self.C.items():
@@ -220,6 +327,138 @@ class ENV():
         T4= self.T[(state.vertexToSite(coord),(-1,0))]
         return C1, C2, C3, C4, T1, T2, T3, T4
 
+def serialize_env(env, state=None, serialize_tensor=serialize_bare_tensor_raw):
+    r"""
+    :param env: CTM environment
+    :param state: wavefunction for which the environment was converged
+    :param serialize_tensor: serialization of individual environment tensors
+    :type env: ENV or ENV_C4V or ENV_ABELIAN
+    :type state: IPEPS
+    :type serialize_tensor: function(torch.Tensor)->dict
+    :return: JSON-compliant representation of environment
+    :rtype: dict
+
+    The environment tensors are stored together with their keys ``(coord, vec)``
+    and, if ``state`` is given, with the fingerprint of its on-site tensors.
+    Packed environment (see :meth:`ENV.pack_`) is stored as a single buffer.
+    """
+    json_env= dict({"format": "env", "type": type(env).__name__, "chi": env.chi,\
+        "state_fingerprint": fingerprint_tensors(state.sites) if state else None,\
+        "C": [], "T": []})
+    if isinstance(env, ENV) and env.is_packed():
+        # single record holding whole buffer
+        buffer, layout= env.get_packed()
+        json_env["packed"]= serialize_tensor(buffer)
+        json_env["packed"]["layout"]= [[label, list(coord), list(vec), list(shape)]\
+            for label,(coord,vec),shape in layout]
+        return json_env
+    for label,ts in [("C",env.C), ("T",env.T)]:
+        for (coord,vec),t in ts.items():
+            json_t= serialize_tensor(t)
+            json_t["coord"], json_t["vec"]= list(coord), list(vec)
+            json_env[label].append(json_t)
+    return json_env
+
+def deserialize_env(json_env, env, state=None, strict=True, read_tensor=None):
+    r"""
+    :param json_env: environment serialized by :meth:`serialize_env`
+    :param env: environment to be filled with the stored tensors
+    :param state: wavefunction for which the environment is expected to be converged
+    :param strict: raise if stored environment has been converged for a different
+                   state than ``state``. Otherwise, only warn.
+    :param read_tensor: deserialization of individual environment tensors
+    :type json_env: dict
+    :type env: ENV or ENV_C4V or ENV_ABELIAN
+    :type state: IPEPS
+    :type strict: bool
+    :type read_tensor: function(dict)->torch.Tensor
+    :return: environment ``env``
+    :rtype: ENV or ENV_C4V or ENV_ABELIAN
+    """
+    assert json_env.get("format",None)=="env", "Not an environment file"
+    if json_env["type"]!=type(env).__name__:
+        raise ValueError(f"Stored environment {json_env['type']} is not {type(env).__name__}")
+    if state is not None and json_env["state_fingerprint"] is not None \
+        and json_env["state_fingerprint"]!=fingerprint_tensors(state.sites):
+        msg= "Stored environment has been converged for a different state"
+        if strict: raise ValueError(msg)
+        warnings.warn(msg, Warning)
+    env.C, env.T= dict(), dict()
+    if "packed" in json_env:
+        layout= tuple((label, (tuple(coord),tuple(vec)), tuple(shape))\
+            for label,coord,vec,shape in json_env["packed"]["layout"])
+        env._set_packed(read_tensor(json_env["packed"]), layout)
+    for label,ts in [("C",env.C), ("T",env.T)]:
+        for json_t in json_env[label]:
+            key= (tuple(json_t["coord"]), tuple(json_t["vec"]))
+            ts[key]= read_tensor(json_t)
+    if state is not None:
+        missing= set(state.sites.keys())-set(coord for coord,vec in env.T.keys())
+        if missing: raise ValueError(f"Stored environment misses sites {missing}")
+    return env
+
+def write_env(env, outputfile, state=None):
+    r"""
+    :param env: CTM environment
+    :param outputfile: target file
+    :param state: wavefunction for which the environment was converged
+    :type env: ENV
+    :type outputfile: str or Path object
+    :type state: IPEPS
+
+    Write out environment into binary container, see :meth:`ipeps.tensor_io.write_json`,
+    with environment tensors stored as raw arrays. If ``state`` is given, 
+    the fingerprint of its on-site tensors is stored as well and validated on read.
+    """
+    write_json(serialize_env(env, state=state), outputfile)
+
+def read_env(inputfile, state=None, strict=True, chi=None, ctm_args=cfg.ctm_args,\
+    global_args=cfg.global_args):
+    r"""
+    :param inputfile: file with environment written by :meth:`write_env`
+    :param state: wavefunction for which the environment is expected to be converged
+    :param strict: raise if stored environment has been converged for a different
+                   state than ``state``. Otherwise, only warn.
+    :param chi: if given, the environment is extended or compressed 
+                (see :func:`compress_env`) to bond dimension ``chi``
+    :param ctm_args: CTM algorithm configuration
+    :param global_args: global configuration
+    :type inputfile: str or Path object
+    :type state: IPEPS
+    :type strict: bool
+    :type chi: int
+    :type ctm_args: CTMARGS
+    :type global_args: GLOBALARGS
+    :return: environment
+    :rtype: ENV
+
+    The environment tensors are memory-mapped from ``inputfile`` if ``global_args.device``
+    is cpu. Otherwise, they are moved to ``global_args.device``.
+    """
+    with open(inputfile) as f:
+        json_env= load_json(f)
+    env= ENV(json_env["chi"], ctm_args=ctm_args, global_args=global_args)
+    env= deserialize_env(json_env, env, state=state, strict=strict, read_tensor=\
+        lambda json_t: torch.from_numpy(read_bare_json_tensor_np(json_t)).to(\
+        device=global_args.device))
+    env.dtype= next(iter(env.C.values())).dtype
+    if chi is not None:
+        env= _resize_env(state, env, chi, compress_env, ctm_args=ctm_args, global_args=global_args)
+    return env
+
+def _resize_env(state, env, chi, compress_env_f, ctm_args=cfg.ctm_args, global_args=cfg.global_args):
+    # extend environment to bond dimension chi or compress it with compress_env_f
+    if env.chi < chi:
+        log.info(f"extending environment from chi={env.chi} to chi={chi}")
+        env= env.extend(chi, ctm_args=ctm_args, global_args=global_args)
+    elif env.chi > chi:
+        assert state is not None, "compression of environment requires state"
+        chi0= env.chi
+        env, trunc_err= compress_env_f(state, env, chi, ctm_args=ctm_args, global_args=global_args)
+        log.info(f"compressing environment from chi={chi0} to chi={chi},"\
+            +f" truncation error {trunc_err}")
+    return env
+
 def init_env(state, env, ctm_args=cfg.ctm_args):
     """
     :param state: wavefunction
@@ -854,3 +1093,121 @@ def ctmrg_conv_specC(state, env, history, p='inf', ctm_args=cfg.ctm_args):
         log.info({"history_length": len(history['diffs']), "history": history['diffs']})
         return True, history
     return False, history
+
+def compress_env(state, env, compressed_chi, ctm_args=cfg.ctm_args, \
+    global_args=cfg.global_args, verbosity=0):
+    r"""
+    :param state: wavefunction
+    :param env: environment corresponding to ``state``
+    :param compressed_chi: reduced environment bond dimension
+    :param ctm_args: CTM algorithm configuration
+    :param global_args: global configuration
+    :param verbosity: logging verbosity
+    :type state: IPEPS
+    :type env: ENV
+    :type compressed_chi: int
+    :type ctm_args: CTMARGS
+    :type global_args: GLOBALARGS
+    :type verbosity: int
+    :return: environment with bond dimension ``compressed_chi`` and the estimate 
+             of the truncation error
+    :rtype: ENV, float
+
+    Compress the environment bond dimension from :math:`\chi` down to 
+    ``compressed_chi``. Each boundary bond, shared by the pair of corners
+    meeting on it, is truncated by a pair of projectors, obtained as CTMRG projectors 
+    (see :meth:`ctm.generic.ctm_projectors.ctm_get_projectors_from_matrices`)
+    from these corners. For instance, for the bond of the upper boundary between 
+    vertices ``coord+(-1,0)`` and ``coord``::
+
+        C(coord,(-1,-1))--|\    /|--C(coord+(-1,0),(1,-1))
+        |                 | >--< |                      |
+
+    The same pair of projectors acts on all environment tensors 
+    carrying this bond, i.e. also on T-tensors of the upper boundary of vertices
+    ``coord+(-1,0)`` and ``coord``. Any reduced density matrix of :mod:`ctm.generic.rdm`, 
+    :mod:`ctm.generic.rdm_looped` or :mod:`ctm.pess_kagome.rdm_kagome` can then be evaluated
+    with the compressed environment at reduced cost.
+
+    The truncation error is estimated as the largest discarded weight 
+
+    .. math::
+
+        \epsilon = \max_{\textrm{bonds}} \sum_{i > \chi_c} s^2_i / \sum_i s^2_i
+
+    where :math:`s_i` are the singular values of the product of two corners 
+    meeting on the bond. If ``compressed_chi`` is not smaller than :math:`\chi`, 
+    the original environment is returned with zero error.
+
+    .. note::
+        This operation preserves gradient tracking.
+    """
+    from ctm.generic.ctm_projectors import ctm_get_projectors_from_matrices
+    if compressed_chi is None or compressed_chi<=0 or compressed_chi>=env.chi:
+        return env, 0.
+
+    def _vts(coord, vec):
+        return state.vertexToSite((coord[0]+vec[0],coord[1]+vec[1]))
+
+    # projectors for pairs of corners sharing a bond. The first projector acts on the 
+    # upper (left) side of the bond and the second one on the lower (right) side
+    #
+    # horizontal bonds between coord+(-1,0) and coord, keyed by (coord, (0,-1)) and
+    # (coord, (0,1)) for upper and lower boundary respectively
+    # vertical bonds between coord+(0,-1) and coord, keyed by (coord, (-1,0)) and
+    # (coord, (1,0)) for left and right boundary respectively
+    P= dict()
+    errs= dict()
+    for coord in state.sites.keys():
+        c_l= _vts(coord,(-1,0))
+        c_u= _vts(coord,(0,-1))
+        #   C(coord,(-1,-1))--1 0--C(c_l,(1,-1))
+        pairs= {
+            (0,-1): (env.C[(c_l,(1,-1))], env.C[(coord,(-1,-1))].t()),
+        #   C(coord,(-1,1))--1 1--C(c_l,(1,1))
+            (0,1): (env.C[(c_l,(1,1))].t(), env.C[(coord,(-1,1))].t()),
+        #   C(c_u,(-1,1)) 
+        #   0
+        #   0
+        #   C(coord,(-1,-1))
+            (-1,0): (env.C[(c_u,(-1,1))], env.C[(coord,(-1,-1))]),
+        #   C(c_u,(1,1)) 
+        #   0
+        #   1
+        #   C(coord,(1,-1))
+            (1,0): (env.C[(c_u,(1,1))], env.C[(coord,(1,-1))].t()),
+        }
+        for vec,(R,Rt) in pairs.items():
+            P_Rt, Pt_R= ctm_get_projectors_from_matrices(R, Rt, compressed_chi, ctm_args, \
+                global_args)
+            P[(coord,vec)]= (P_Rt, Pt_R)
+
+            with torch.no_grad():
+                S= torch.linalg.svdvals(R.t()@Rt)
+                kept= int(torch.count_nonzero(P_Rt.abs().sum(0)))
+                errs[(coord,vec)]= ((S[kept:]**2).sum()/(S**2).sum()).item()
+    if verbosity>0:
+        log.info(f"compress_env chi={env.chi} -> {compressed_chi} truncation errors {errs}")
+
+    new_env= ENV(compressed_chi, ctm_args=ctm_args, global_args=global_args)
+    new_env.dtype, new_env.device= env.dtype, env.device
+    for coord in state.sites.keys():
+        c_r= _vts(coord,(1,0))
+        c_d= _vts(coord,(0,1))
+        new_env.C[(coord,(-1,-1))]= einsum('ab,ai,bj->ij', env.C[(coord,(-1,-1))],\
+            P[(coord,(-1,0))][0], P[(coord,(0,-1))][0])
+        new_env.C[(coord,(1,-1))]= einsum('ab,ai,bj->ij', env.C[(coord,(1,-1))],\
+            P[(c_r,(0,-1))][1], P[(coord,(1,0))][0])
+        new_env.C[(coord,(-1,1))]= einsum('ab,ai,bj->ij', env.C[(coord,(-1,1))],\
+            P[(c_d,(-1,0))][1], P[(coord,(0,1))][0])
+        new_env.C[(coord,(1,1))]= einsum('ab,ai,bj->ij', env.C[(coord,(1,1))],\
+            P[(c_d,(1,0))][1], P[(c_r,(0,1))][1])
+        new_env.T[(coord,(0,-1))]= einsum('axb,ai,bj->ixj', env.T[(coord,(0,-1))],\
+            P[(coord,(0,-1))][1], P[(c_r,(0,-1))][0])
+        new_env.T[(coord,(-1,0))]= einsum('abx,ai,bj->ijx', env.T[(coord,(-1,0))],\
+            P[(coord,(-1,0))][1], P[(c_d,(-1,0))][0])
+        new_env.T[(coord,(0,1))]= einsum('xab,ai,bj->xij', env.T[(coord,(0,1))],\
+            P[(coord,(0,1))][1], P[(c_r,(0,1))][0])
+        new_env.T[(coord,(1,0))]= einsum('axb,ai,bj->ixj', env.T[(coord,(1,0))],\
+            P[(coord,(1,0))][1], P[(c_d,(1,0))][0])
+    return new_env, max(errs.values())
@@ -0,0 +1,159 @@
+import os
+import mmap
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+import config as cfg
+import logging
+log = logging.getLogger(__name__)
+
+def required_vecs(direction, ctm_args=cfg.ctm_args):
+    r"""
+    :param direction: one of Up=(0,-1), Left=(-1,0), Down=(0,1), Right=(1,0) or ``None``
+    :param ctm_args: CTM algorithm configuration
+    :type direction: tuple(int,int)
+    :type ctm_args: CTMARGS
+    :return: relative vectors of environment tensors entering the directional CTM move
+    :rtype: set[tuple(int,int)]
+
+    Directional move in direction ``direction`` with ``4X2`` projectors does not touch
+    the corners and half-row (half-column) tensors on the opposite side of the system, i.e.
+    for Up move the tensors C(-1,1), T(0,1) and C(1,1). The ``4X4`` projectors, as well as
+    ``direction=None``, require all environment tensors.
+    """
+    vecs= set([(-1,-1),(0,-1),(1,-1),(1,0),(1,1),(0,1),(-1,1),(-1,0)])
+    if direction is None or ctm_args.projector_method!='4X2':
+        return vecs
+    return set(v for v in vecs if v[0]*direction[0]+v[1]*direction[1]!=-1)
+
+class OutOfCoreStore():
+    def __init__(self, path=None):
+        r"""
+        :param path: directory for memory-mapped files. If ``None``, the default
+                     temporary directory is used
+        :type path: str
+
+        Keeps environment tensors, which do not enter the current directional CTM move,
+        in memory-mapped files instead of RAM. Each spilled tensor is backed by its own
+        file, which is unlinked right after it is mapped. Hence, no files are left behind
+        and the disk space is released as soon as the mapped tensor is dropped.
+
+        Spilled tensors are CPU tensors. For environments on CPU, they can be used
+        directly by convergence checks or RDM routines, the operating system pages them in
+        on access. For environments on other devices, they have to be loaded back
+        by ``require(env, None)`` first, as done by :meth:`ctm.generic.ctmrg.run`
+        before each convergence check.
+
+        .. note::
+            Memory is saved only if ``path`` resides on disk. The default temporary
+            directory is often ``tmpfs`` (i.e. ``/tmp`` or ``/dev/shm``), whose files are
+            themselves held in RAM, hence spilling the tensors there releases no memory.
+
+        Tensors needed by the next move are paged in by a background thread
+        through :meth:`prefetch` and swapped into environment by :meth:`require`.
+        Only tensors which do not require gradient are spilled.
+        """
+        self.path= path
+        self._mapped= dict()
+        self._pending= dict()
+        self._executor= ThreadPoolExecutor(max_workers=1, thread_name_prefix="ctm_ooc")
+
+    def _map(self, t):
+        t= t.detach()
+        nbytes= max(t.numel()*t.element_size(), 1)
+        fd, fname= tempfile.mkstemp(suffix=".ooc", dir=self.path)
+        try:
+            os.ftruncate(fd, nbytes)
+            mm= mmap.mmap(fd, nbytes)
+        finally:
+            os.close(fd)
+            os.unlink(fname)
+        dtype= torch.empty(0, dtype=t.dtype).numpy().dtype
+        m= torch.from_numpy(np.frombuffer(mm, dtype=dtype, count=t.numel()).reshape(t.size()))
+        m.copy_(t)
+        # shared mapping, dirty pages are retained by page cache and written back
+        if hasattr(mmap, "MADV_DONTNEED"):
+            mm.madvise(mmap.MADV_DONTNEED)
+        return m
+
+    def _is_spilled(self, ts, kind, key):
+        return (kind,key) in self._mapped and ts[key] is self._mapped[(kind,key)][0]
+
+    def _entries(self, env, direction, ctm_args):
+        vecs= required_vecs(direction, ctm_args)
+        for kind,ts in (("C",env.C), ("T",env.T)):
+            for key in ts.keys():
+                yield kind, ts, key, key[1] in vecs
+
+    def spill(self, env, direction, ctm_args=cfg.ctm_args):
+        r"""
+        :param env: environment
+        :param direction: direction of the current CTM move
+        :param ctm_args: CTM algorithm configuration
+        :type env: ENV
+        :type direction: tuple(int,int)
+        :type ctm_args: CTMARGS
+
+        Move environment tensors, which do not enter the move in ``direction``,
+        to memory-mapped files.
+        """
+        for kind,ts,key,required in self._entries(env, direction, ctm_args):
+            if required or self._is_spilled(ts, kind, key): continue
+            if ts[key].requires_grad:
+                log.warning(f"{kind}{key} requires gradient and is kept in memory")
+                continue
+            self._pending.pop((kind,key), None)
+            self._mapped[(kind,key)]= (self._map(ts[key].cpu()), ts[key].device)
+            ts[key]= self._mapped[(kind,key)][0]
+
+    def prefetch(self, env, direction, ctm_args=cfg.ctm_args):
+        r"""
+        :param env: environment
+        :param direction: direction of the next CTM move
+        :param ctm_args: CTM algorithm configuration
+        :type env: ENV
+        :type direction: tuple(int,int)
+        :type ctm_args: CTMARGS
+
+        Start loading spilled tensors, which enter the move in ``direction``, into memory
+        on a background thread.
+        """
+        for kind,ts,key,required in self._entries(env, direction, ctm_args):
+            if not required or not self._is_spilled(ts, kind, key) \
+                or (kind,key) in self._pending: continue
+            m, device= self._mapped[(kind,key)]
+            self._pending[(kind,key)]= (m, self._executor.submit(lambda m=m, device=device:\
+                m.clone().to(device)))
+
+    def require(self, env, direction, ctm_args=cfg.ctm_args):
+        r"""
+        :param env: environment
+        :param direction: direction of the current CTM move or ``None`` for all tensors
+        :param ctm_args: CTM algorithm configuration
+        :type env: ENV
+        :type direction: tuple(int,int)
+        :type ctm_args: CTMARGS
+
+        Ensure that all tensors entering the move in ``direction`` are held in memory,
+        waiting for their prefetch if necessary, and spill the remaining tensors.
+        """
+        for kind,ts,key,required in self._entries(env, direction, ctm_args):
+            if not required or not self._is_spilled(ts, kind, key): continue
+            m, device= self._mapped.pop((kind,key))
+            src, fut= self._pending.pop((kind,key), (None,None))
+            ts[key]= fut.result() if src is m else m.clone().to(device)
+        if direction is not None:
+            self.spill(env, direction, ctm_args)
+
+    def close(self, env=None):
+        r"""
+        :param env: environment to be loaded into memory
+        :type env: ENV
+
+        Load all spilled tensors of ``env`` into memory and stop the background thread.
+        """
+        if env is not None: self.require(env, None)
+        self._executor.shutdown(wait=True)
+        self._pending.clear()
+        self._mapped.clear()
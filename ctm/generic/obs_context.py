@@ -0,0 +1,252 @@
+import torch
+import config as cfg
+from ctm.generic.rdm import _sym_pos_def_rdm
+from oe_ext.oe_ext import get_contraction_path
+import opt_einsum as oe
+import logging
+log = logging.getLogger(__name__)
+
+class OBS_CONTEXT():
+    def __init__(self, state, env, sym_pos_def=False, verbosity=0):
+        r"""
+        :param state: wavefunction
+        :param env: environment corresponding to ``state``
+        :param sym_pos_def: enforce hermiticity (always) and positive definiteness of returned
+                            reduced density matrices if ``True``
+        :param verbosity: logging verbosity
+        :type state: IPEPS
+        :type env: ENV
+        :type sym_pos_def: bool
+        :type verbosity: int
+
+        Context for evaluation of reduced density matrices (RDMs) of many observables
+        over a single pair ``(state, env)``. The intermediates, shared between different
+        RDMs, are built once and memoized
+
+            * half-systems of 2x1 and 1x2 networks, with physical indices of the site
+              left open. Each of them serves both :meth:`rdm2x1` (or :meth:`rdm1x2`) and
+              :meth:`rdm1x1`
+            * enlarged corners of 2x2 network, with physical indices either open or traced
+              over. These serve :meth:`rdm2x2` for any choice of ``open_sites``
+
+        The RDMs are given by the same tensor networks and follow the same conventions as
+        :func:`ctm.generic.rdm.rdm1x1`, :func:`ctm.generic.rdm.rdm2x1`,
+        :func:`ctm.generic.rdm.rdm1x2` and :func:`ctm.generic.rdm.rdm2x2`.
+
+        The memoized intermediates are dropped whenever any on-site tensor of ``state`` or
+        any tensor of ``env`` is replaced or modified in-place, or explicitly by
+        :meth:`invalidate`.
+        """
+        self.state= state
+        self.env= env
+        self.sym_pos_def= sym_pos_def
+        self.verbosity= verbosity
+        self._cache= dict()
+        self._fingerprint= None
+
+    def _current_fingerprint(self):
+        # identity and version counter of all tensors, changes on both re-assignment
+        # and in-place modification
+        ts= list(self.state.sites.values()) + list(self.env.C.values()) \
+            + list(self.env.T.values())
+        return tuple( (id(t), t._version) for t in ts )
+
+    def invalidate(self):
+        r"""
+        Drop all memoized intermediates.
+        """
+        self._cache.clear()
+        self._fingerprint= None
+
+    def _memoized(self, key, build_f):
+        fp= self._current_fingerprint()
+        if fp != self._fingerprint:
+            if self._fingerprint is not None and self.verbosity>0:
+                log.info(f"OBS_CONTEXT invalidated")
+            self._cache.clear()
+            self._fingerprint= fp
+        if key not in self._cache:
+            self._cache[key]= build_f()
+        return self._cache[key]
+
+    def _site_env(self, coord):
+        # on-site tensor and environment of site with its double-layer auxiliary indices
+        # of T tensors unfused into ket and bra
+        #
+        # C1--T1--C2     T1: (X,D,D,X) T2: (X,D,D,X)
+        # |   |   |      T3: (D,D,X,X) T4: (X,X,D,D)
+        # T4--a---T2
+        # |   |   |
+        # C4--T3--C3
+        #
+        state, env= self.state, self.env
+        site= state.vertexToSite(coord)
+        a= state.site(site)
+        C1, C2, C3, C4= [env.C[(site,d)] for d in [(-1,-1),(1,-1),(1,1),(-1,1)]]
+        T1, T2, T3, T4= [env.T[(site,d)] for d in [(0,-1),(1,0),(0,1),(-1,0)]]
+        T1= T1.view(T1.size(0),a.size(1),a.size(1),T1.size(2))
+        T2= T2.view(T2.size(0),a.size(4),a.size(4),T2.size(2))
+        T3= T3.view(a.size(3),a.size(3),T3.size(1),T3.size(2))
+        T4= T4.view(T4.size(0),T4.size(1),a.size(2),a.size(2))
+        return a, C1, C2, C3, C4, T1, T2, T3, T4
+
+    def _contract(self, *tn, names=None, who=None):
+        path, path_info= get_contraction_path(*tn,names=names,path=None,who=who)
+        return oe.contract(*tn,optimize=path,backend='torch')
+
+    def _half(self, coord, side):
+        r"""
+        Half-systems of 2x1 and 1x2 networks with open physical indices of the site::
+
+            side L        side R        side U          side D
+
+            C1--T1--0     0--T1--C2     C1--T1--C2      0  1  2   3
+            |   |           |    |      |   |   |       |  |  |   |
+            T4--a---1     1--a---T2     T4--a---T2      T4--a-----T2
+            |   |\        |  |\  |      |   |\  |       |   |\    |
+            T4--a*--2     2--a*--T2     0   1 2 3       C4--T3----C3
+            |   |           |    |
+            C4--T3--3     3--T3--C3     the physical indices s,s' of a,a* follow
+                                        as the last two indices
+        """
+        def build():
+            a, C1, C2, C3, C4, T1, T2, T3, T4= self._site_env(coord)
+            # see rdm2x1_sl and rdm1x2_sl for the labeling
+            if side=="L":
+                tn= C1,[0,1],T1,[1,2,5,24],T4,[0,9,3,6],a,[4,2,3,10,26],a.conj(),[7,5,6,11,27],\
+                    C4,[9,8],T3,[10,11,8,25],[24,26,27,25,4,7]
+                names= ("C1","T1","T4","a","a*","C4","T3")
+            elif side=="R":
+                tn= T1,[24,14,17,12],C2,[12,13],T2,[13,15,18,21],a,[16,14,26,22,15],\
+                    a.conj(),[19,17,27,23,18],C3,[21,20],T3,[22,23,25,20],[24,26,27,25,16,19]
+                names= ("T1","C2","T2","a","a*","C3","T3")
+            elif side=="U":
+                tn= C1,[0,1],T1,[1,2,5,9],T4,[0,24,3,6],a,[4,2,3,25,10],a.conj(),[7,5,6,26,11],\
+                    T2,[8,10,11,27],C2,[9,8],[24,25,26,27,4,7]
+                names= ("C1","T1","T4","a","a*","T2","C2")
+            elif side=="D":
+                tn= T4,[24,13,14,17],C4,[13,12],T3,[15,18,12,21],a,[16,25,14,15,22],\
+                    a.conj(),[19,26,17,18,23],C3,[20,21],T2,[27,22,23,20],[24,25,26,27,16,19]
+                names= ("T4","C4","T3","a","a*","C3","T2")
+            return self._contract(*tn,names=names,who=f"OBS_CONTEXT_half_{side}")
+        return self._memoized(("half", self.state.vertexToSite(coord), side), build)
+
+    def _edge(self, coord):
+        # right edge C2--T2--C3 of site, with indices ordered as the open indices
+        # of L half-system
+        def build():
+            a, C1, C2, C3, C4, T1, T2, T3, T4= self._site_env(coord)
+            return self._contract(C2,[0,1],T2,[1,2,3,4],C3,[4,5],[0,2,3,5],\
+                names=("C2","T2","C3"),who="OBS_CONTEXT_edge_R")
+        return self._memoized(("edge", self.state.vertexToSite(coord), "R"), build)
+
+    def _corner(self, coord, corner, open_site):
+        r"""
+        Enlarged corners of 2x2 network::
+
+            LU: C1--T1--0,1,2   RU: 0,1,2--T1--C2   LD: 0,1,2      RD:      0,1,2
+                |   |                      |   |        |                   |
+                T4--a                      a---T2       T4--a             a--T2
+                |                          |            |   |             |  |
+                3,4,5                      3,4,5        C4--T3--3,4,5  3,4,5-T3--C3
+
+        where each triple of indices corresponds to environment, ket and bra indices.
+        If ``open_site``, the physical indices s,s' of the site follow as the last two indices.
+        """
+        def build():
+            a, C1, C2, C3, C4, T1, T2, T3, T4= self._site_env(coord)
+            s, sp= (40, 41) if open_site else (40, 40)
+            out_phys= [s,sp] if open_site else []
+            if corner=="LU":
+                tn= C1,[0,1],T1,[1,2,5,10],T4,[0,20,3,6],a,[s,2,3,21,11],a.conj(),[sp,5,6,22,12],\
+                    [10,11,12,20,21,22]+out_phys
+                names= ("C1","T1","T4","a","a*")
+            elif corner=="RU":
+                tn= C2,[1,8],T1,[10,2,5,1],T2,[8,11,12,20],a,[s,2,13,21,11],a.conj(),[sp,5,14,22,12],\
+                    [10,13,14,20,21,22]+out_phys
+                names= ("C2","T1","T2","a","a*")
+            elif corner=="LD":
+                tn= C4,[0,12],T4,[10,0,3,6],T3,[15,16,12,20],a,[s,11,3,15,21],a.conj(),[sp,13,6,16,22],\
+                    [10,11,13,20,21,22]+out_phys
+                names= ("C4","T4","T3","a","a*")
+            elif corner=="RD":
+                tn= C3,[17,13],T2,[10,1,2,17],T3,[15,16,20,13],a,[s,11,21,15,1],a.conj(),[sp,12,22,16,2],\
+                    [10,11,12,20,21,22]+out_phys
+                names= ("C3","T2","T3","a","a*")
+            return self._contract(*tn,names=names,who=f"OBS_CONTEXT_corner_{corner}")
+        return self._memoized(("corner", self.state.vertexToSite(coord), corner, open_site),\
+            build)
+
+    def rdm1x1(self, coord):
+        r"""
+        :param coord: vertex (x,y) for which reduced density matrix is constructed
+        :type coord: tuple(int,int)
+        :return: 1-site reduced density matrix with indices :math:`s;s'`
+        :rtype: torch.tensor
+
+        See :func:`ctm.generic.rdm.rdm1x1`. Built from the memoized left half-system
+        of :meth:`rdm2x1`.
+        """
+        R= torch.einsum('ijklab,ijkl->ab',self._half(coord,"L"),self._edge(coord))
+        return _sym_pos_def_rdm(R, sym_pos_def=self.sym_pos_def, verbosity=self.verbosity,\
+            who="OBS_CONTEXT_rdm1x1")
+
+    def rdm2x1(self, coord):
+        r"""
+        :param coord: vertex (x,y) specifies position of 2x1 subsystem
+        :type coord: tuple(int,int)
+        :return: 2-site reduced density matrix with indices :math:`s_0s_1;s'_0s'_1`
+        :rtype: torch.tensor
+
+        See :func:`ctm.generic.rdm.rdm2x1`.
+        """
+        R= torch.einsum('ijklab,ijklcd->acbd',self._half(coord,"L"),\
+            self._half((coord[0]+1,coord[1]),"R"))
+        return _sym_pos_def_rdm(R, sym_pos_def=self.sym_pos_def, verbosity=self.verbosity,\
+            who="OBS_CONTEXT_rdm2x1")
+
+    def rdm1x2(self, coord):
+        r"""
+        :param coord: vertex (x,y) specifies position of 1x2 subsystem
+        :type coord: tuple(int,int)
+        :return: 2-site reduced density matrix with indices :math:`s_0s_1;s'_0s'_1`
+        :rtype: torch.tensor
+
+        See :func:`ctm.generic.rdm.rdm1x2`.
+        """
+        R= torch.einsum('ijklab,ijklcd->acbd',self._half(coord,"U"),\
+            self._half((coord[0],coord[1]+1),"D"))
+        return _sym_pos_def_rdm(R, sym_pos_def=self.sym_pos_def, verbosity=self.verbosity,\
+            who="OBS_CONTEXT_rdm1x2")
+
+    def rdm2x2(self, coord, open_sites=[0,1,2,3]):
+        r"""
+        :param coord: vertex (x,y) specifies upper left site of 2x2 subsystem
+        :param open_sites: which sites to keep open
+        :type coord: tuple(int,int)
+        :type open_sites: list(int)
+        :return: reduced density matrix of ``open_sites`` with indices
+                 :math:`s_0s_1s_2s_3;s'_0s'_1s'_2s'_3`
+        :rtype: torch.tensor
+
+        See :func:`ctm.generic.rdm.rdm2x2`. Built from memoized enlarged corners,
+        which are shared between different choices of ``open_sites``.
+        """
+        x,y= coord
+        corners= [self._corner((x,y),"LU",0 in open_sites),\
+            self._corner((x+1,y),"RU",1 in open_sites),\
+            self._corner((x,y+1),"LD",2 in open_sites),\
+            self._corner((x+1,y+1),"RD",3 in open_sites)]
+        # labels of bundled environment indices between corners and of physical indices
+        h_u, h_d, v_l, v_r= [0,1,2], [3,4,5], [6,7,8], [9,10,11]
+        bonds= [h_u+v_l, h_u+v_r, v_l+h_d, v_r+h_d]
+        tn, out_ket, out_bra= [], [], []
+        for i,(c,b) in enumerate(zip(corners,bonds)):
+            phys= [20+i,30+i] if i in open_sites else []
+            tn+= [c, b+phys]
+            out_ket+= phys[:1]
+            out_bra+= phys[1:]
+        R= self._contract(*tn,out_ket+out_bra,names=("LU","RU","LD","RD"),\
+            who="OBS_CONTEXT_rdm2x2")
+        return _sym_pos_def_rdm(R, sym_pos_def=self.sym_pos_def, verbosity=self.verbosity,\
+            who="OBS_CONTEXT_rdm2x2")
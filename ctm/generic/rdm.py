@@ -12,7 +12,8 @@ import ctm.generic.corrf as corrf
 try:
     import opt_einsum as oe
     from opt_einsum.contract import _VALID_CONTRACT_KWARGS, PathInfo
-    from oe_ext.oe_ext import get_contraction_path, contract_with_unroll
+    from oe_ext.oe_ext import get_contraction_path, contract_with_unroll,\
+        get_unroll_for_memory_target
 except:
     oe=False
     warnings.warn("opt_einsum not available.")
@@ -1453,6 +1454,10 @@ def rdm2x2_oe(coord, state, env, open_sites=[0,1,2,3], unroll=False,
     #
     if type(unroll)==bool and unroll:
         unroll= I_out
+    elif unroll=='auto':
+        unroll= get_unroll_for_memory_target(*contract_tn,\
+            memory_target=cfg.global_args.oe_memory_target*1024**3/a.element_size(),\
+            names=names,path=None,who=who)
     path, path_info= get_contraction_path(*contract_tn,unroll=unroll,\
         names=names,path=None,who=who)
     R= contract_with_unroll(*contract_tn,unroll=unroll,optimize=path,backend='torch',
@@ -1465,6 +1470,228 @@ def rdm2x2_oe(coord, state, env, open_sites=[0,1,2,3], unroll=False,
     return R
 
 
+def rdm2x2_batched(coords, state, env, open_sites=[0,1,2,3], sym_pos_def=False,
+    force_cpu=False, obs_ctx=None, ctm_args=cfg.ctm_args, verbosity=0):
+    r"""
+    :param coords: vertices (x,y) specifying upper left sites of 2x2 subsystems
+    :param state: underlying wavefunction
+    :param env: environment corresponding to ``state``
+    :param open_sites: which sites to keep open
+    :param sym_pos_def: enforce hermiticity (always) and positive definiteness if ``True``
+    :param force_cpu: compute on CPU
+    :param obs_ctx: context for ``(state, env)`` used to compute the rdms one by one
+    :param ctm_args: CTM algorithm configuration
+    :param verbosity: logging verbosity
+    :type coords: list(tuple(int,int))
+    :type state: IPEPS
+    :type env: ENV
+    :type open_sites: list(int)
+    :type sym_pos_def: bool
+    :type force_cpu: bool
+    :type obs_ctx: OBS_CONTEXT
+    :type ctm_args: CTMARGS
+    :type verbosity: int
+    :return: 4-site reduced density matrices with indices :math:`b;s_0s_1s_2s_3;s'_0s'_1s'_2s'_3`,
+             where `b` runs over ``coords``
+    :rtype: torch.tensor
+
+    Computes 2x2 reduced density matrices of :func:`rdm2x2` for all ``coords`` at once.
+    The on-site and environment tensors of individual 2x2 subsystems are stacked along
+    an extra batch index, shared by all tensors in the network, which is then
+    contracted in a single pass. The memory footprint grows linearly with the number 
+    of ``coords``.
+
+    The reduced density matrices are computed one by one, if ``ctm_args.rdm_batched`` 
+    is ``False``, if the shapes of tensors differ between the subsystems, or if
+    the largest intermediate of the batched contraction exceeds ``ctm_args.rdm_batched_memory``.
+    In that case, if ``obs_ctx`` is given, the rdms are obtained by :meth:`OBS_CONTEXT.rdm2x2`,
+    reusing its enlarged corners, with ``sym_pos_def`` and ``verbosity`` of ``obs_ctx``
+    and ``force_cpu`` ignored.
+    """
+    ind_os= set(sorted(open_sites))
+    assert len(ind_os)==len(open_sites),"contains repeated elements"
+    assert ind_os <= {0,1,2,3},"allowed site labels are 0,1,2, and 3"
+    I= sum([[100+2*x,100+2*x+1] if x in ind_os else [100+2*x]*2 for x in [0,1,2,3]],[])
+    I_out= [99]+[100+2*x for x in ind_os]+[100+2*x+1 for x in ind_os]
+    who=f"rdm2x2_batched_{ind_os}"
+
+    def _tensors(coord):
+        a= state.site(coord)
+        a_x= state.site( (coord[0]+1,coord[1]) )
+        a_y= state.site( (coord[0],coord[1]+1) )
+        a_xy= state.site( (coord[0]+1,coord[1]+1) )
+        C1, C2_x, C3_xy, C4_y= env.C[(state.vertexToSite( coord ),(-1,-1))],\
+            env.C[(state.vertexToSite( (coord[0]+1,coord[1]) ), (1,-1))],\
+            env.C[(state.vertexToSite( (coord[0]+1,coord[1]+1) ), (1,1))],\
+            env.C[(state.vertexToSite( (coord[0],coord[1]+1) ), (-1,1))]
+        T1, T4, T1_x, T2_x, T2_xy, T3_xy, T3_y, T4_y= \
+            env.T[(state.vertexToSite( coord ),(0,-1))],\
+            env.T[(state.vertexToSite( coord ),(-1,0))],\
+            env.T[(state.vertexToSite( (coord[0]+1,coord[1]) ), (0,-1))],\
+            env.T[(state.vertexToSite( (coord[0]+1,coord[1]) ), (1,0))],\
+            env.T[(state.vertexToSite( (coord[0]+1,coord[1]+1) ), (1,0))],\
+            env.T[(state.vertexToSite( (coord[0]+1,coord[1]+1) ), (0,1))],\
+            env.T[(state.vertexToSite( (coord[0],coord[1]+1) ), (0,1))],\
+            env.T[(state.vertexToSite( (coord[0],coord[1]+1) ), (-1,0))]
+        T1= T1.view(T1.size(0),a.size(1),a.size(1),T1.size(2))
+        T1_x= T1_x.view(T1_x.size(0),a_x.size(1),a_x.size(1),T1_x.size(2))
+        T2_xy= T2_xy.view(T2_xy.size(0),a_xy.size(4),a_xy.size(4),T2_xy.size(2))
+        T2_x= T2_x.view(T2_x.size(0),a_x.size(4),a_x.size(4),T2_x.size(2))
+        T3_xy= T3_xy.view(a_xy.size(3),a_xy.size(3),T3_xy.size(1),T3_xy.size(2))
+        T3_y= T3_y.view(a_y.size(3),a_y.size(3),T3_y.size(1),T3_y.size(2))
+        T4= T4.view(T4.size(0),T4.size(1),a.size(2),a.size(2))
+        T4_y= T4_y.view(T4_y.size(0),T4_y.size(1),a_y.size(2),a_y.size(2))
+        return C1, T1, T4, a, a.conj(), T4_y, C4_y, T3_y, a_y, a_y.conj(), \
+            T1_x, C2_x, T2_x, a_x, a_x.conj(), T2_xy, C3_xy, T3_xy, a_xy, a_xy.conj()
+
+    def _rdm2x2_loop():
+        if obs_ctx is not None:
+            return torch.stack([obs_ctx.rdm2x2(coord, open_sites=open_sites) for coord in coords])
+        return torch.stack([rdm2x2(coord, state, env, open_sites=open_sites, sym_pos_def=sym_pos_def,
+            force_cpu=force_cpu, verbosity=verbosity) for coord in coords])
+
+    if not ctm_args.rdm_batched or not oe:
+        return _rdm2x2_loop()
+    ts= [_tensors(coord) for coord in coords]
+    if any(tuple(t.size())!=tuple(t0.size()) for t_c in ts[1:] for t,t0 in zip(t_c,ts[0])):
+        return _rdm2x2_loop()
+
+    # stack tensors of individual subsystems along batch index 99
+    ts= [torch.stack(t_b) for t_b in zip(*ts)]
+    if force_cpu:
+        ts= [x.cpu() for x in ts]
+    igs= [0,1],[1,2,5,36],[0,15,3,6],[I[0],2,3,16,37],[I[1],5,6,17,38],\
+        [15,8,9,12],[8,7],[10,13,7,41],[I[4],16,9,10,39],[I[5],17,12,13,40],\
+        [36,20,23,18],[18,19],[19,21,24,33],[I[2],20,37,34,21],[I[3],23,38,35,24],\
+        [33,28,31,26],[26,27],[29,32,41,27],[I[6],34,39,29,28],[I[7],35,40,32,31]
+    contract_tn= sum(([t,[99]+ig] for t,ig in zip(ts,igs)),[])+[I_out]
+    names= tuple(x.strip() for x in ("C1, T1, T4, a, a*, T4_y, C4_y, T3_y, a_y, a_y*, T1_x, C2_x, T2_x, a_x, a_x*,"\
+        +"T2_xy, C3_xy, T3_xy, a_xy, a_xy*").split(','))
+    path, path_info= get_contraction_path(*contract_tn,names=names,path=None,who=who)
+    mem= path_info.largest_intermediate*ts[0].element_size()/1024**3
+    if ctm_args.rdm_batched_memory>0 and mem>ctm_args.rdm_batched_memory:
+        log.info(f"{who} largest intermediate {mem:4.3e} GiB exceeds rdm_batched_memory"\
+            +f" {ctm_args.rdm_batched_memory} GiB, computing rdms one by one")
+        return _rdm2x2_loop()
+    R= contract_with_unroll(*contract_tn,optimize=path,backend='torch',who=who,verbosity=verbosity)
+
+    R= torch.stack([_sym_pos_def_rdm(r, sym_pos_def=sym_pos_def, verbosity=verbosity, who=who) \
+        for r in R])
+    if force_cpu:
+        R= R.to(env.device)
+    return R
+
+
+def _terms_to_site_ops(terms, phys_dims, dtype, device):
+    r"""
+    Stack operators of ``terms``, given as list of dicts {site: operator}, into tensors W_i 
+    of shape (1+len(terms), d_i, d_i) for each site i, with identity for the sites not present 
+    in the term. The leading term is identity, giving the norm. Returns None for sites, 
+    which are not acted on by any term.
+    """
+    Ws= []
+    for i,d in enumerate(phys_dims):
+        if not any(i in term for term in terms):
+            Ws.append(None)
+            continue
+        Id= torch.eye(d,dtype=dtype,device=device)
+        Ws.append(torch.stack([Id]+[term[i].to(dtype) if i in term else Id for term in terms]))
+    return Ws
+
+def expval2x2(coord, state, env, terms, unroll=False, checkpoint_unrolled=False, 
+    checkpoint_on_device=False, force_cpu=False, verbosity=0):
+    r"""
+    :param coord: vertex (x,y) specifies upper left site of 2x2 subsystem
+    :param state: underlying wavefunction
+    :param env: environment corresponding to ``state``
+    :param terms: operator products, each given as a dictionary ``{site: operator}``
+                  with sites labeled as in :func:`rdm2x2` and identity 
+                  on the sites absent from the dictionary
+    :param unroll: evaluate terms one by one, reducing memory at the expense of repeating
+                   the contraction of environment for every term
+    :param force_cpu: compute on CPU
+    :param verbosity: logging verbosity
+    :type coord: tuple(int,int)
+    :type state: IPEPS
+    :type env: ENV
+    :type terms: list(dict(int,torch.tensor))
+    :type unroll: bool
+    :type force_cpu: bool
+    :type verbosity: int
+    :return: normalized expectation values 
+             :math:`\langle O^{(k)}_0 O^{(k)}_1 O^{(k)}_2 O^{(k)}_3 \rangle` of the terms
+    :rtype: torch.tensor
+
+    Evaluates expectation values of operator products over 2x2 subsystem directly, i.e.
+    without constructing the reduced density matrix :math:`\rho_{2x2}`. The operators
+    of all terms are stacked along an additional index, shared by the on-site tensors 
+    of the sites acted on by the terms, and inserted into the network of :func:`rdm2x2`, 
+    together with identity giving the norm. Hence, the largest intermediates carry the 
+    number of terms instead of :math:`d^2` for each open site. 
+    A Hamiltonian term of the form :math:`h=\sum_k c_k O^{(k)}_0 O^{(k)}_1 O^{(k)}_2 O^{(k)}_3`
+    evaluates as ``(c*expval2x2(coord,state,env,terms)).sum()``.
+
+    Operators act on the ket, i.e. :math:`\langle O \rangle = \sum_{ss'} A^*_{s}O_{ss'}A_{s'}`, 
+    as for ``operator`` of :func:`rdm1x1`.
+    """
+    who="expval2x2"
+    coords= [coord, (coord[0]+1,coord[1]), (coord[0],coord[1]+1), (coord[0]+1,coord[1]+1)]
+    a, a_x, a_y, a_xy= [state.site(c) for c in coords]
+    C1, C2_x, C3_xy, C4_y= env.C[(state.vertexToSite( coord ),(-1,-1))],\
+        env.C[(state.vertexToSite( (coord[0]+1,coord[1]) ), (1,-1))],\
+        env.C[(state.vertexToSite( (coord[0]+1,coord[1]+1) ), (1,1))],\
+        env.C[(state.vertexToSite( (coord[0],coord[1]+1) ), (-1,1))]
+    T1, T4, T1_x, T2_x, T2_xy, T3_xy, T3_y, T4_y= \
+        env.T[(state.vertexToSite( coord ),(0,-1))],\
+        env.T[(state.vertexToSite( coord ),(-1,0))],\
+        env.T[(state.vertexToSite( (coord[0]+1,coord[1]) ), (0,-1))],\
+        env.T[(state.vertexToSite( (coord[0]+1,coord[1]) ), (1,0))],\
+        env.T[(state.vertexToSite( (coord[0]+1,coord[1]+1) ), (1,0))],\
+        env.T[(state.vertexToSite( (coord[0]+1,coord[1]+1) ), (0,1))],\
+        env.T[(state.vertexToSite( (coord[0],coord[1]+1) ), (0,1))],\
+        env.T[(state.vertexToSite( (coord[0],coord[1]+1) ), (-1,0))]
+    t= C1, C2_x, C3_xy, C4_y, T1, T4, T1_x, T2_x, T2_xy, T3_xy, T3_y, T4_y, a, a_x, a_y, a_xy
+    if force_cpu:
+        C1, C2_x, C3_xy, C4_y, T1, T4, T1_x, T2_x, T2_xy, T3_xy, T3_y, T4_y, a, a_x, a_y, a_xy=\
+            (x.cpu() for x in t)
+
+    T1= T1.view(T1.size(0),a.size(1),a.size(1),T1.size(2))
+    T1_x= T1_x.view(T1_x.size(0),a_x.size(1),a_x.size(1),T1_x.size(2))
+    T2_xy= T2_xy.view(T2_xy.size(0),a_xy.size(4),a_xy.size(4),T2_xy.size(2))
+    T2_x= T2_x.view(T2_x.size(0),a_x.size(4),a_x.size(4),T2_x.size(2))
+    T3_xy= T3_xy.view(a_xy.size(3),a_xy.size(3),T3_xy.size(1),T3_xy.size(2))
+    T3_y= T3_y.view(a_y.size(3),a_y.size(3),T3_y.size(1),T3_y.size(2))
+    T4= T4.view(T4.size(0),T4.size(1),a.size(2),a.size(2))
+    T4_y= T4_y.view(T4_y.size(0),T4_y.size(1),a_y.size(2),a_y.size(2))
+
+    # insert operators, acting on the ket, and the index of terms (200) shared by 
+    # the sites acted on by any of the terms
+    Ws= _terms_to_site_ops(terms, [x.size(0) for x in (a, a_x, a_y, a_xy)], a.dtype, a.device)
+    a_ops, K= [], []
+    for x,W in zip((a, a_x, a_y, a_xy),Ws):
+        a_ops.append( x if W is None else torch.tensordot(W,x,([2],[0])) )
+        K.append( [] if W is None else [200] )
+
+    # see rdm2x2_oe for the labeling, with physical indices contracted
+    contract_tn= C1,[0,1],T1,[1,2,5,36],T4,[0,15,3,6],a_ops[0],K[0]+[100,2,3,16,37],a.conj(),[100,5,6,17,38],\
+        T4_y,[15,8,9,12],C4_y,[8,7],T3_y,[10,13,7,41],a_ops[2],K[2]+[104,16,9,10,39],a_y.conj(),[104,17,12,13,40],\
+        T1_x,[36,20,23,18],C2_x,[18,19],T2_x,[19,21,24,33],a_ops[1],K[1]+[102,20,37,34,21],a_x.conj(),[102,23,38,35,24],\
+        T2_xy,[33,28,31,26],C3_xy,[26,27],T3_xy,[29,32,41,27],a_ops[3],K[3]+[106,34,39,29,28],a_xy.conj(),[106,35,40,32,31],\
+        [200]
+    names= tuple(x.strip() for x in ("C1, T1, T4, a_op, a*, T4_y, C4_y, T3_y, a_op_y, a_y*, T1_x, C2_x, T2_x,"\
+        +"a_op_x, a_x*, T2_xy, C3_xy, T3_xy, a_op_xy, a_xy*").split(','))
+
+    unroll= [200] if unroll else []
+    path, path_info= get_contraction_path(*contract_tn,unroll=unroll,\
+        names=names,path=None,who=who)
+    R= contract_with_unroll(*contract_tn,unroll=unroll,optimize=path,backend='torch',
+        checkpoint_unrolled=checkpoint_unrolled,checkpoint_on_device=checkpoint_on_device,
+        who=who,verbosity=verbosity)
+    R= R[1:]/R[0]
+    if force_cpu:
+        R= R.to(env.device)
+    return R
+
 def rdm2x3_trglringex(coord, state, env, sym_pos_def=False, verbosity=0):
     r"""
     :param coord: vertex (x,y) specifies lower left site of 2x3 subsystem
@@ -0,0 +1,283 @@
+import os, json, time, platform, tempfile
+import torch
+import config as cfg
+from ctm.generic import rdm, rdm_looped
+import logging
+
+log = logging.getLogger(__name__)
+
+# Interchangeable implementations of reduced density matrices. All variants of the same
+# group accept identical arguments and return the same density matrix, with indices
+# s_i...;s'_i... for i in (sorted) open_sites. Variants which handle only a subset of
+# open sites are adapted, keeping their own contraction strategy.
+
+def _rdm2x2_legacy(coord, state, env, open_sites=[0,1,2,3], unroll=False,
+    checkpoint_unrolled=False, checkpoint_on_device=False, sym_pos_def=False,
+    force_cpu=False, verbosity=0):
+    return rdm.rdm2x2_legacy(coord, state, env, sym_pos_def=sym_pos_def, verbosity=verbosity)
+
+def _rdm2x3_loop_trglringex_manual(coord, state, env, open_sites=[1,2,3,4], unroll=False,
+    checkpoint_unrolled=False, checkpoint_on_device=False, sym_pos_def=False,
+    force_cpu=False, verbosity=0):
+    # manual variant is specified by lower-left vertex and returns sites in order
+    #
+    # x  s3 s2              x  s2 s1
+    # s0 s1 x  => (permute) s3 s4 x
+    R= rdm_looped.rdm2x3_loop_trglringex_manual((coord[0],coord[1]+1), state, env,
+        sym_pos_def=sym_pos_def, checkpoint_unrolled=checkpoint_unrolled, verbosity=verbosity)
+    return R.permute(3,2,0,1, 7,6,4,5).contiguous()
+
+def _rdm3x2_loop_trglringex_manual(coord, state, env, open_sites=[1,2,3,4], unroll=False,
+    checkpoint_unrolled=False, checkpoint_on_device=False, sym_pos_def=False,
+    force_cpu=False, verbosity=0):
+    # manual variant is specified by lower-left vertex and returns sites in order
+    #
+    # x  s2              x  s3
+    # s3 s1              s1 s4
+    # s0 x  => (permute) s2 x
+    R= rdm_looped.rdm3x2_loop_trglringex_manual((coord[0],coord[1]+2), state, env,
+        sym_pos_def=sym_pos_def, checkpoint_unrolled=checkpoint_unrolled, verbosity=verbosity)
+    return R.permute(3,0,2,1, 7,4,6,5).contiguous()
+
+# group -> list of (name, function, predicate on sorted open sites)
+VARIANTS= {
+    "rdm2x2": [
+        ("rdm2x2_oe", rdm.rdm2x2_oe, lambda os: True),
+        ("rdm2x2_legacy", _rdm2x2_legacy, lambda os: os==[0,1,2,3]),
+    ],
+    "rdm2x3": [
+        ("rdm2x3_loop_oe", rdm_looped.rdm2x3_loop_oe, lambda os: True),
+        ("rdm2x3_loop_oe_semimanual", rdm_looped.rdm2x3_loop_oe_semimanual, lambda os: True),
+        ("rdm2x3_loop_trglringex_manual", _rdm2x3_loop_trglringex_manual, lambda os: os==[1,2,3,4]),
+    ],
+    "rdm3x2": [
+        ("rdm3x2_loop_oe", rdm_looped.rdm3x2_loop_oe, lambda os: True),
+        ("rdm3x2_loop_oe_semimanual", rdm_looped.rdm3x2_loop_oe_semimanual, lambda os: True),
+        ("rdm3x2_loop_trglringex_manual", _rdm3x2_loop_trglringex_manual, lambda os: os==[1,2,3,4]),
+    ],
+}
+
+
+class VariantCache():
+    def __init__(self, cache_file=None):
+        r"""
+        :param cache_file: JSON file holding the selected variants or ``None``
+                           for in-memory cache only
+        :type cache_file: str
+
+        Cache of variants selected by micro-benchmark. Each record holds the measured
+        timings of all candidate variants. The file is re-read before each update
+        and written atomically, hence it can be shared between runs. The keys include
+        the host name, so the file can be shared also between different machines.
+        """
+        self.cache_file= cache_file
+        self.records= {}
+        self._load()
+
+    def _load(self):
+        if self.cache_file is None: return
+        try:
+            with open(self.cache_file, "r") as f:
+                self.records.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def put(self, key, record):
+        self._load()
+        self.records[key]= record
+        if self.cache_file is None: return
+        cache_dir= os.path.dirname(os.path.abspath(self.cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file= tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.records, f, indent=1)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            log.warning(f"Failed to store selected variants in {self.cache_file}: {e}")
+            if os.path.exists(tmp_file): os.remove(tmp_file)
+
+
+_variant_cache= None
+
+def get_variant_cache():
+    r"""
+    :return: cache of variants selected by micro-benchmark, persisted in the file
+             given by ``GLOBALARGS.rdm_variant_cache``
+    :rtype: VariantCache
+    """
+    global _variant_cache
+    cache_file= cfg.global_args.rdm_variant_cache
+    if cache_file in ['None','none','NONE','',None]: cache_file= None
+    if _variant_cache is None or _variant_cache.cache_file!=cache_file:
+        _variant_cache= VariantCache(cache_file)
+    return _variant_cache
+
+
+def _unroll_for(unroll, group, name):
+    if isinstance(unroll, dict):
+        return unroll.get(name, unroll.get(group, False))
+    return unroll
+
+def _variant_key(group, coord, state, env, open_sites, unroll, force_cpu):
+    # the timings depend on dimensions of the network, but also on the tiling
+    # of the unit cell, as distinct sites might have distinct dimensions
+    sites= [state.site((coord[0]+x,coord[1]+y)) for x in range(3) for y in range(3)]
+    A= sites[0]
+    device= 'cpu' if force_cpu else A.device
+    return json.dumps([group, open_sites, [list(a.size()) for a in sites], env.chi,
+        str(A.dtype), str(torch.device(device).type),
+        {name: _unroll_for(unroll, group, name) for name,_,_ in VARIANTS[group]},
+        cfg.global_args.oe_memory_target, torch.get_num_threads(),
+        platform.node(), torch.__version__])
+
+def benchmark_variants(group, coord, state, env, open_sites, unroll=False, **kwargs):
+    r"""
+    :param group: group of variants, i.e. one of ``"rdm2x2"``, ``"rdm2x3"``, or ``"rdm3x2"``
+    :param coord: vertex of reduced density matrix
+    :param state: wavefunction
+    :param env: environment corresponding to ``state``
+    :param open_sites: which sites to keep open
+    :param unroll: unrolled indices, either shared by all variants or given
+                   as dict by variant name
+    :type group: str
+    :type coord: tuple(int,int)
+    :type state: IPEPS
+    :type env: ENV
+    :type open_sites: list(int)
+    :type unroll: bool or list(int) or dict
+    :return: wall-clock time in seconds by variant name
+    :rtype: dict(str, float)
+
+    Times a single evaluation of each variant applicable to ``open_sites``. Each variant
+    is evaluated once beforehand, so that search for contraction paths is not included
+    in the timings. Variants which fail, i.e. by exceeding available memory, are assigned
+    infinite time.
+    """
+    open_sites= sorted(open_sites)
+    timings= {}
+    with torch.no_grad():
+        for name, f, applicable in VARIANTS[group]:
+            if not applicable(open_sites): continue
+            try:
+                f(coord, state, env, open_sites=open_sites,
+                    unroll=_unroll_for(unroll, group, name), **kwargs)
+                if torch.cuda.is_available(): torch.cuda.synchronize()
+                t0= time.perf_counter()
+                f(coord, state, env, open_sites=open_sites,
+                    unroll=_unroll_for(unroll, group, name), **kwargs)
+                if torch.cuda.is_available(): torch.cuda.synchronize()
+                timings[name]= time.perf_counter()-t0
+            except RuntimeError as e:
+                log.warning(f"{name} failed: {e}")
+                timings[name]= float('inf')
+    return timings
+
+def select_variant(group, coord, state, env, open_sites, unroll=False, default=None,
+    force_cpu=False, **kwargs):
+    r"""
+    :param group: group of variants, i.e. one of ``"rdm2x2"``, ``"rdm2x3"``, or ``"rdm3x2"``
+    :param default: variant selected in ``"default"`` mode. If ``None``, the first
+                    applicable variant of the group is selected
+    :type group: str
+    :type default: str
+    :return: name of the selected variant
+    :rtype: str
+
+    Selects variant according to ``GLOBALARGS.rdm_variant_selection``:
+
+        * ``"default"``: the ``default`` variant
+        * ``"benchmark"``: the fastest variant, as measured by :func:`benchmark_variants`
+          once for each combination of bond dimensions, environment dimension, unrolled
+          indices, device and memory target ``GLOBALARGS.oe_memory_target``.
+          The timings are cached per machine, see :func:`get_variant_cache`
+
+    For the remaining arguments see :func:`benchmark_variants`.
+    """
+    open_sites= sorted(open_sites)
+    candidates= [name for name,_,applicable in VARIANTS[group] if applicable(open_sites)]
+    mode= cfg.global_args.rdm_variant_selection
+    if mode=="default":
+        return default if default in candidates else candidates[0]
+    elif mode=="benchmark":
+        cache= get_variant_cache()
+        key= _variant_key(group, coord, state, env, open_sites, unroll, force_cpu)
+        record= cache.get(key)
+        if record is None:
+            timings= benchmark_variants(group, coord, state, env, open_sites, unroll=unroll,
+                force_cpu=force_cpu, **kwargs)
+            record= {"selected": min(timings, key=timings.get), "timings": timings}
+            log.info(f"{group} {open_sites} timings {timings}")
+            cache.put(key, record)
+        return record["selected"]
+    else:
+        raise ValueError("Invalid rdm_variant_selection: "+str(mode))
+
+def _dispatch(group, coord, state, env, open_sites, unroll=False, default=None, **kwargs):
+    name= select_variant(group, coord, state, env, open_sites, unroll=unroll,
+        default=default, **kwargs)
+    f= next(f for n,f,_ in VARIANTS[group] if n==name)
+    return f(coord, state, env, open_sites=open_sites,
+        unroll=_unroll_for(unroll, group, name), **kwargs)
+
+def rdm2x2(coord, state, env, open_sites=[0,1,2,3], unroll=False, default=None,
+    checkpoint_unrolled=False, checkpoint_on_device=False, sym_pos_def=False,
+    force_cpu=False, verbosity=0):
+    r"""
+    :param unroll: unrolled indices, either shared by all variants or given as dict
+                   by variant name (or ``"rdm2x2"`` for all)
+    :param default: variant selected in ``"default"`` mode
+    :type unroll: bool or list(int) or dict
+    :type default: str
+
+    Reduced density matrix of 2x2 subsystem evaluated by variant chosen
+    by :func:`select_variant` among :func:`ctm.generic.rdm.rdm2x2_oe` and
+    :func:`ctm.generic.rdm.rdm2x2_legacy`. See :func:`ctm.generic.rdm.rdm2x2`.
+    """
+    return _dispatch("rdm2x2", coord, state, env, open_sites, unroll=unroll, default=default,
+        checkpoint_unrolled=checkpoint_unrolled, checkpoint_on_device=checkpoint_on_device,
+        sym_pos_def=sym_pos_def, force_cpu=force_cpu, verbosity=verbosity)
+
+def rdm2x3(coord, state, env, open_sites=[0,1,2,3,4,5], unroll=False, default=None,
+    checkpoint_unrolled=False, checkpoint_on_device=False, sym_pos_def=False,
+    force_cpu=False, verbosity=0):
+    r"""
+    :param unroll: unrolled indices, either shared by all variants or given as dict
+                   by variant name (or ``"rdm2x3"`` for all)
+    :param default: variant selected in ``"default"`` mode
+    :type unroll: bool or list(int) or dict
+    :type default: str
+
+    Reduced density matrix of 2x3 subsystem, with ``coord`` specifying its upper-left site,
+    evaluated by variant chosen by :func:`select_variant` among
+    :func:`ctm.generic.rdm_looped.rdm2x3_loop_oe`,
+    :func:`ctm.generic.rdm_looped.rdm2x3_loop_oe_semimanual`, and
+    :func:`ctm.generic.rdm_looped.rdm2x3_loop_trglringex_manual` (only for ``open_sites=[1,2,3,4]``).
+    The physical indices are ordered as in :func:`ctm.generic.rdm_looped.rdm2x3_loop_oe`.
+    """
+    return _dispatch("rdm2x3", coord, state, env, open_sites, unroll=unroll, default=default,
+        checkpoint_unrolled=checkpoint_unrolled, checkpoint_on_device=checkpoint_on_device,
+        sym_pos_def=sym_pos_def, force_cpu=force_cpu, verbosity=verbosity)
+
+def rdm3x2(coord, state, env, open_sites=[0,1,2,3,4,5], unroll=False, default=None,
+    checkpoint_unrolled=False, checkpoint_on_device=False, sym_pos_def=False,
+    force_cpu=False, verbosity=0):
+    r"""
+    :param unroll: unrolled indices, either shared by all variants or given as dict
+                   by variant name (or ``"rdm3x2"`` for all)
+    :param default: variant selected in ``"default"`` mode
+    :type unroll: bool or list(int) or dict
+    :type default: str
+
+    Reduced density matrix of 3x2 subsystem evaluated by variant chosen by
+    :func:`select_variant` among :func:`ctm.generic.rdm_looped.rdm3x2_loop_oe`,
+    :func:`ctm.generic.rdm_looped.rdm3x2_loop_oe_semimanual`, and
+    :func:`ctm.generic.rdm_looped.rdm3x2_loop_trglringex_manual` (only for ``open_sites=[1,2,3,4]``).
+    The physical indices are ordered as in :func:`ctm.generic.rdm_looped.rdm3x2_loop_oe`.
+    """
+    return _dispatch("rdm3x2", coord, state, env, open_sites, unroll=unroll, default=default,
+        checkpoint_unrolled=checkpoint_unrolled, checkpoint_on_device=checkpoint_on_device,
+        sym_pos_def=sym_pos_def, force_cpu=force_cpu, verbosity=verbosity)
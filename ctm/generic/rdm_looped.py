@@ -7,7 +7,8 @@ import config as cfg
 from ctm.generic.env import ENV
 from ctm.generic.ctm_components import c2x2_LU, c2x2_LD, c2x2_RU, c2x2_RD
 from ctm.generic.ctm_projectors import ctm_get_projectors_from_matrices
-from ctm.generic.rdm import _cast_to_real, _sym_pos_def_rdm, get_contraction_path, contract_with_unroll
+from ctm.generic.rdm import _cast_to_real, _sym_pos_def_rdm, get_contraction_path, contract_with_unroll,\
+    get_unroll_for_memory_target
 import ctm.generic.corrf as corrf
 try:
     import opt_einsum as oe
@@ -125,6 +126,10 @@ def _trace_2x3(C2X2_LU, C2X2_RU, T_1n1, T_10, a_1n1, a_10):
 
 def _find_unrolled(to_unroll,*interleaved_exp): 
     if (to_unroll is None) or not to_unroll: return []
+    # unroll=True selects the default unrolled indices of the final contraction only
+    if to_unroll is True: return []
+    if isinstance(to_unroll,str):
+        raise ValueError(f"Unsupported unroll {to_unroll}, expected bool or list of indices")
     indices= set(sum(interleaved_exp[1::2],start=[]))
     intersection= set.intersection(set(to_unroll),indices)
     return list(intersection)
@@ -569,6 +574,11 @@ def rdm2x3_loop_oe(coord, state, env, open_sites=[0,1,2,3,4,5], unroll=True,\
         * prod([_tmp_a[x].size(0)**2 for x in ind_os if x in [0,3,4]])
     if type(unroll)==bool and unroll:
         unroll= [47,48]
+    elif unroll=='auto':
+        unroll= get_unroll_for_memory_target(*contract_tn,\
+            memory_target=cfg.global_args.oe_memory_target*1024**3/a.element_size(),\
+            names=names,path=None,who=who)
+        mem_limit= None
     path, path_info= get_contraction_path(*contract_tn,unroll=unroll if unroll else [],\
         names=names,path=None,who=who,\
         memory_limit=mem_limit if unroll else None)
@@ -1101,6 +1111,11 @@ def rdm3x2_loop_oe(coord, state, env, open_sites=[0,1,2,3,4,5], unroll=True,\
         * prod([_tmp_a[x].size(0)**2 for x in ind_os if x in [0,1,3]])
     if type(unroll)==bool and unroll:
         unroll= [83,84]
+    elif unroll=='auto':
+        unroll= get_unroll_for_memory_target(*contract_tn,\
+            memory_target=cfg.global_args.oe_memory_target*1024**3/a.element_size(),\
+            names=names,path=None,who=who)
+        mem_limit= None
     path, path_info= get_contraction_path(*contract_tn,unroll=unroll if unroll else [],\
         names=names,path=None,who=who,\
         memory_limit=mem_limit if unroll else None)
@@ -1,8 +1,8 @@
 import warnings
 import torch
 import numpy as np
-from scipy.sparse.linalg import LinearOperator
-from scipy.sparse.linalg import eigs
+from config import _lazy_import
+sla= _lazy_import("scipy.sparse.linalg", "Missing scipy. Spectra of transfer operators are not available.")
 import config as cfg
 import ipeps
 from ctm.generic.env import ENV
@@ -67,9 +67,9 @@ def get_Top_w0_spec(n, coord, direction, state, env, verbosity=0):
         return v
 
     _test_T= torch.zeros(1,dtype=env.dtype)
-    T= LinearOperator((chi**2,chi**2), matvec=_mv, \
+    T= sla.LinearOperator((chi**2,chi**2), matvec=_mv, \
         dtype="complex128" if _test_T.is_complex() else "float64")
-    vals= eigs(T, k=n, v0=None, return_eigenvectors=False)
+    vals= sla.eigs(T, k=n, v0=None, return_eigenvectors=False)
 
     # post-process and return as torch tensor with first and second column
     # containing real and imaginary parts respectively
@@ -150,12 +150,12 @@ def get_Top_spec(n, coord, direction, state, env, eigenvectors=False, verbosity=
         return v
 
     _test_T= torch.zeros(1,dtype=env.dtype)
-    T= LinearOperator((chi*ad*ad*chi,chi*ad*ad*chi), matvec=_mv, \
+    T= sla.LinearOperator((chi*ad*ad*chi,chi*ad*ad*chi), matvec=_mv, \
         dtype="complex128" if _test_T.is_complex() else "float64")
     if eigenvectors:
-        vals, vecs= eigs(T, k=n, v0=None, return_eigenvectors=True)
+        vals, vecs= sla.eigs(T, k=n, v0=None, return_eigenvectors=True)
     else:
-        vals= eigs(T, k=n, v0=None, return_eigenvectors=False)
+        vals= sla.eigs(T, k=n, v0=None, return_eigenvectors=False)
 
     # post-process and return as torch tensor with first and second column
     # containing real and imaginary parts respectively
@@ -326,9 +326,9 @@ def get_EH_spec_Ttensor(n, L, coord, direction, state, env, verbosity=0):
         return V.cpu().numpy()
 
     _test_T= torch.zeros(1,dtype=env.dtype)
-    expEH= LinearOperator((np.prod(ads),np.prod(ads)), matvec=_mv, \
+    expEH= sla.LinearOperator((np.prod(ads),np.prod(ads)), matvec=_mv, \
         dtype="complex128" if _test_T.is_complex() else "float64")
-    vals= eigs(expEH, k=n, v0=None, return_eigenvectors=False)
+    vals= sla.eigs(expEH, k=n, v0=None, return_eigenvectors=False)
 
     vals= np.copy(vals[::-1]) # descending order
     vals= (1.0/np.abs(vals[0])) * vals
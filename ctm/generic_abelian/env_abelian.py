@@ -4,9 +4,11 @@ from math import sqrt
 import yastn.yastn as yastn
 try:
     import torch
-    from ctm.generic.env import ENV
+    from ctm.generic.env import ENV, serialize_env, deserialize_env
 except ImportError as e:
     warnings.warn("torch not available", Warning)
+from ipeps.tensor_io import load_json, write_json, serialize_abelian_tensor_raw,\
+    read_abelian_tensor_raw
 import logging
 log = logging.getLogger(__name__)
 
@@ -306,6 +308,21 @@ class ENV_ABELIAN():
         for c in self.C.values(): c.detach()
         for t in self.T.values(): t.detach()
 
+    def save(self, outputfile, state=None):
+        r"""
+        Write environment to file. See :meth:`write_env`.
+        """
+        write_env(self, outputfile, state=state)
+
+    @staticmethod
+    def load(inputfile, settings, state=None, strict=True, ctm_args=cfg.ctm_args,\
+        global_args=cfg.global_args):
+        r"""
+        Read environment from file. See :meth:`read_env`.
+        """
+        return read_env(inputfile, settings, state=state, strict=strict,\
+            ctm_args=ctm_args, global_args=global_args)
+
     def get_spectra(self):
         spec= {}
         for c_key, c_t in self.C.items():
@@ -314,6 +331,51 @@ class ENV_ABELIAN():
         return spec
 
 
+def write_env(env, outputfile, state=None):
+    r"""
+    :param env: abelian-symmetric CTM environment
+    :param outputfile: target file
+    :param state: wavefunction for which the environment was converged
+    :type env: ENV_ABELIAN
+    :type outputfile: str or Path object
+    :type state: IPEPS_ABELIAN
+
+    Write out environment into binary container. The environment tensors are stored
+    together with the fusion history of their legs, see 
+    :meth:`ipeps.tensor_io.serialize_abelian_tensor_raw`.
+    """
+    write_json(serialize_env(env, state=state,\
+        serialize_tensor=serialize_abelian_tensor_raw), outputfile)
+
+def read_env(inputfile, settings, state=None, strict=True, ctm_args=cfg.ctm_args,\
+    global_args=cfg.global_args):
+    r"""
+    :param inputfile: file with environment written by :meth:`write_env`
+    :param settings: YAST configuration
+    :param state: wavefunction for which the environment is expected to be converged
+    :param strict: raise if stored environment has been converged for a different
+                   state than ``state``. Otherwise, only warn.
+    :param ctm_args: CTM algorithm configuration
+    :param global_args: global configuration
+    :type inputfile: str or Path object
+    :type settings: NamedTuple or SimpleNamespace (TODO link to definition)
+    :type state: IPEPS_ABELIAN
+    :type strict: bool
+    :type ctm_args: CTMARGS
+    :type global_args: GLOBALARGS
+    :return: environment
+    :rtype: ENV_ABELIAN
+
+    See :meth:`ctm.generic.env.read_env`.
+    """
+    with open(inputfile) as f:
+        json_env= load_json(f)
+    env= ENV_ABELIAN(json_env["chi"], settings=settings, ctm_args=ctm_args,\
+        global_args=global_args)
+    env= deserialize_env(json_env, env, state=state, strict=strict, read_tensor=\
+        lambda json_t: read_abelian_tensor_raw(json_t, settings).to(global_args.device))
+    return env
+
 def init_env(state, env, init_method=None, ctm_args=cfg.ctm_args):
     """
     :param state: wavefunction
@@ -5,6 +5,7 @@ from torch.utils.checkpoint import checkpoint
 import config as cfg
 from config import _torch_version_check
 from ipeps.ipeps_c4v import IPEPS_C4V
+from ipeps.site_cache import refresh_sites
 from ctm.one_site_c4v.env_c4v import *
 from ctm.one_site_c4v.ctm_components_c4v import *
 from ctm.one_site_c4v.fpcm_c4v import fpcm_MOVE_sl
@@ -45,6 +46,7 @@ def run(state, env, conv_check=None, ctm_args=cfg.ctm_args, global_args=cfg.glob
         Currently, FPCM does not support reverse-mode differentiation.
 
     """
+    refresh_sites(state)
 
     if ctm_args.projector_svd_method=='DEFAULT' or ctm_args.projector_svd_method=='SYMEIG':
         def truncated_eig(M, chi):
@@ -120,6 +122,7 @@ def run_dl(state, env, conv_check=None, ctm_args=cfg.ctm_args, global_args=cfg.g
     A double-layer variant (explicitly building double-layer tensor) of CTM algorithm.
     See :meth:`run`.
     """
+    refresh_sites(state)
     if ctm_args.projector_svd_method=='DEFAULT' or ctm_args.projector_svd_method=='SYMEIG':
         def truncated_eig(M, chi):
             return truncated_eig_sym(M, chi, keep_multiplets=True,\
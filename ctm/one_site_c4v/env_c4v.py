@@ -3,6 +3,8 @@ import config as cfg
 from config import _torch_version_check
 from ipeps.ipeps_c4v import IPEPS_C4V
 from linalg.custom_eig import truncated_eig_sym
+from ctm.generic.env import serialize_env, deserialize_env, _resize_env
+from ipeps.tensor_io import load_json, write_json, read_bare_json_tensor_np
 
 class ENV_C4V():
     def __init__(self, chi, state=None, bond_dim=None, ctm_args=cfg.ctm_args, 
@@ -153,6 +155,21 @@ class ENV_C4V():
             self.get_T()[:x,:x,:self.bond_dim**2]
         return new_env
 
+    def save(self, outputfile, state=None):
+        r"""
+        Write environment to file. See :meth:`write_env`.
+        """
+        write_env(self, outputfile, state=state)
+
+    @staticmethod
+    def load(inputfile, state=None, strict=True, ctm_args=cfg.ctm_args,\
+        global_args=cfg.global_args):
+        r"""
+        Read environment from file. See :meth:`read_env`.
+        """
+        return read_env(inputfile, state=state, strict=strict, ctm_args=ctm_args,\
+            global_args=global_args)
+
     # def move_to(self, device):
     #     if device=='cpu' or device==torch.device('cpu'):
     #         self.C[self.keyC]= self.get_C().to(device)
@@ -163,6 +180,54 @@ class ENV_C4V():
     #     else:
     #         raise RuntimeError(f"Unsupported device {device}")
 
+def write_env(env, outputfile, state=None):
+    r"""
+    :param env: C4v symmetric CTM environment
+    :param outputfile: target file
+    :param state: wavefunction for which the environment was converged
+    :type env: ENV_C4V
+    :type outputfile: str or Path object
+    :type state: IPEPS_C4V
+
+    Write out environment into binary container. See :meth:`ctm.generic.env.write_env`.
+    """
+    write_json(serialize_env(env, state=state), outputfile)
+
+def read_env(inputfile, state=None, strict=True, chi=None, ctm_args=cfg.ctm_args,\
+    global_args=cfg.global_args):
+    r"""
+    :param inputfile: file with environment written by :meth:`write_env`
+    :param state: wavefunction for which the environment is expected to be converged
+    :param strict: raise if stored environment has been converged for a different
+                   state than ``state``. Otherwise, only warn.
+    :param chi: if given, the environment is extended or compressed 
+                (see :func:`compress_env`) to bond dimension ``chi``
+    :param ctm_args: CTM algorithm configuration
+    :param global_args: global configuration
+    :type inputfile: str or Path object
+    :type state: IPEPS_C4V
+    :type strict: bool
+    :type chi: int
+    :type ctm_args: CTMARGS
+    :type global_args: GLOBALARGS
+    :return: environment
+    :rtype: ENV_C4V
+
+    See :meth:`ctm.generic.env.read_env`.
+    """
+    with open(inputfile) as f:
+        json_env= load_json(f)
+    json_T= next(iter(json_env["T"]))
+    env= ENV_C4V(json_env["chi"], bond_dim=round(json_T["dims"][2]**0.5),\
+        ctm_args=ctm_args, global_args=global_args)
+    env= deserialize_env(json_env, env, state=state, strict=strict, read_tensor=\
+        lambda json_t: torch.from_numpy(read_bare_json_tensor_np(json_t)).to(\
+        device=global_args.device))
+    env.dtype= env.get_C().dtype
+    if chi is not None:
+        env= _resize_env(state, env, chi, compress_env, ctm_args=ctm_args, global_args=global_args)
+    return env
+
 def init_env(state, env, C_and_T=None, ctm_args=cfg.ctm_args):
     """
     :param state: wavefunction
@@ -398,6 +463,59 @@ def print_env(env, verbosity=0):
     if verbosity>0:
         print(env.T[env.keyT])
 
+def compress_env(state, env, compressed_chi, ctm_args=cfg.ctm_args, \
+    global_args=cfg.global_args):
+    r"""
+    :param state: wavefunction
+    :param env: environment corresponding to ``state``
+    :param compressed_chi: reduced environment bond dimension
+    :param ctm_args: CTM algorithm configuration
+    :param global_args: global configuration
+    :type state: IPEPS_C4V
+    :type env: ENV_C4V
+    :type compressed_chi: int
+    :type ctm_args: CTMARGS
+    :type global_args: GLOBALARGS
+    :return: environment with bond dimension ``compressed_chi`` and the estimate 
+             of the truncation error
+    :rtype: ENV_C4V, float
+
+    Compress the environment bond dimension from :math:`\chi` down to 
+    ``compressed_chi`` by projecting all environment bonds on the leading 
+    ``compressed_chi`` eigenvectors :math:`U` of the corner tensor :math:`C=UDU^\dagger`
+    (keeping complete multiplets)::
+
+        C' = U^\dagger C U,    T'= --U^\dagger--T--U--
+                                            |
+
+    Any reduced density matrix of :mod:`ctm.one_site_c4v.rdm_c4v`, e.g. 
+    :meth:`ctm.one_site_c4v.rdm_c4v.rdm3x2_NNNN`, can then be evaluated with 
+    the compressed environment at reduced cost. The truncation error is estimated as the 
+    discarded weight :math:`\epsilon = \sum_{i > \chi_c} |d_i|^4 / \sum_i |d_i|^4` 
+    of the spectrum of :math:`C^4`. If ``compressed_chi`` is not smaller than :math:`\chi`, 
+    the original environment is returned with zero error.
+
+    .. note::
+        This operation preserves gradient tracking.
+    """
+    if compressed_chi is None or compressed_chi<=0 or compressed_chi>=env.chi:
+        return env, 0.
+
+    C= env.get_C()
+    D, U= truncated_eig_sym(C, compressed_chi, keep_multiplets=True,\
+        ad_decomp_reg=ctm_args.ad_decomp_reg, verbosity=ctm_args.verbosity_projectors)
+    with torch.no_grad():
+        kept= int(torch.count_nonzero(D))
+        D_all= torch.sort(torch.abs(torch.linalg.eigvalsh(C)), descending=True)[0]
+        err= ((D_all[kept:]**4).sum()/(D_all**4).sum()).item()
+
+    new_env= ENV_C4V(compressed_chi, bond_dim=env.bond_dim, ctm_args=ctm_args, \
+        global_args=global_args)
+    new_env.dtype, new_env.device= env.dtype, env.device
+    new_env.C[new_env.keyC]= U.conj().t() @ C @ U
+    new_env.T[new_env.keyT]= torch.einsum('ija,ik,jl->kla', env.get_T(), U.conj(), U)
+    return new_env, err
+
 def compute_multiplets(env, eps_multiplet_gap=1.0e-10):
     D= torch.zeros(env.chi+1, dtype=env.dtype, device=env.device)
     if _torch_version_check("1.8.1"):
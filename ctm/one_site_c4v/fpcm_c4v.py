@@ -4,11 +4,8 @@ from torch.utils.checkpoint import checkpoint
 import config as cfg
 from ctm.one_site_c4v.env_c4v import *
 from ctm.one_site_c4v.ctm_components_c4v import *
-try:
-    import scipy.sparse.linalg
-    from scipy.sparse.linalg import LinearOperator
-except:
-    print("Warning: Missing scipy. ARNOLDISVD is not available.")
+from config import _lazy_import
+sla= _lazy_import("scipy.sparse.linalg", "Missing scipy. ARNOLDISVD is not available.")
 from linalg.custom_eig import *
 import logging
 log = logging.getLogger(__name__)
@@ -95,7 +92,7 @@ def fp_C(a, T, P, C0=None, verbosity=0):
         B= P_loc.t() @ B @ P_loc
         B= B.view(-1)
         return B.detach().cpu().numpy()
-    M_op= LinearOperator((T.size()[0]**2,T.size()[1]**2), matvec=mv)
+    M_op= sla.LinearOperator((T.size()[0]**2,T.size()[1]**2), matvec=mv)
     
     D, U= truncated_eig_arnoldi(M_op, 2, v0=C0, dtype=a.dtype, device=a.device)
 
@@ -193,7 +190,7 @@ def fp_T(a, P, T0=None, verbosity=0):
         B= B.permute(0,2,1).contiguous()
         B= B.view(-1)
         return B.detach().cpu().numpy()
-    M_op= LinearOperator((P.numel(),P.numel()), matvec=mv)
+    M_op= sla.LinearOperator((P.numel(),P.numel()), matvec=mv)
     
     D, U= truncated_eig_arnoldi(M_op, 2, v0=T0, dtype=a.dtype, device=a.device)
 
@@ -231,7 +228,7 @@ def fp_TT(T, U=None, C2_0=None, verbosity=0):
         B= torch.tensordot(U,B,([0,2],[0,2]))
         B= B.view(-1)
         return B.detach().cpu().numpy()
-    M_op= LinearOperator((T.size()[0]**2,T.size()[0]**2), matvec=mv)
+    M_op= sla.LinearOperator((T.size()[0]**2,T.size()[0]**2), matvec=mv)
 
     D, V= truncated_eig_arnoldi(M_op, 2, v0=C2_0, dtype=T.dtype, device=T.device)
 
@@ -1544,6 +1544,85 @@ def rdm2x2(state, env, sym_pos_def=False, force_cpu=False, verbosity=0):
 
     return rdm
 
+def expval2x2(state, env, terms, force_cpu=False, verbosity=0):
+    r"""
+    :param state: underlying 1-site C4v symmetric wavefunction
+    :param env: C4v symmetric environment corresponding to ``state``
+    :param terms: operator products, each given as a dictionary ``{site: operator}``
+                  with sites labeled as in :func:`rdm2x2` and identity 
+                  on the sites absent from the dictionary
+    :param force_cpu: perform on CPU
+    :param verbosity: logging verbosity
+    :type state: IPEPS_C4V
+    :type env: ENV_C4V
+    :type terms: list(dict(int,torch.tensor))
+    :type force_cpu: bool
+    :type verbosity: int
+    :return: normalized expectation values 
+             :math:`\langle O^{(k)}_0 O^{(k)}_1 O^{(k)}_2 O^{(k)}_3 \rangle` of the terms
+    :rtype: torch.tensor
+
+    Evaluates expectation values of operator products over 2x2 subsystem directly, i.e.
+    without constructing the reduced density matrix :math:`\rho_{2x2}` (see :func:`rdm2x2`).
+    The operators are applied to the open corner C2x2, giving closed corners 
+    :math:`M^{(k)}_i` for each term and site, and the expectation values are obtained as 
+    :math:`\textrm{Tr}(M^{(k)}_0 M^{(k)}_1 M^{(k)}_3 M^{(k)}_2)` normalized by the term 
+    with identities::
+
+        C2x2(O_0)--C2x2(O_1)
+        |          |
+        C2x2(O_2)--C2x2(O_3)
+
+    Hence, the cost is linear in the number of terms instead of the cost of open
+    :math:`\rho_{2x2}` with :math:`d^8` elements.
+    A Hamiltonian term of the form :math:`h=\sum_k c_k O^{(k)}_0 O^{(k)}_1 O^{(k)}_2 O^{(k)}_3`
+    evaluates as ``(c*expval2x2(state,env,terms)).sum()``.
+    """
+    who= "expval2x2"
+    if force_cpu:
+        # move to cpu
+        C = env.C[env.keyC].cpu()
+        T = env.T[env.keyT].cpu()
+        a = next(iter(state.sites.values())).cpu()
+    else:
+        C = env.C[env.keyC]
+        T = env.T[env.keyT]
+        a = next(iter(state.sites.values()))
+    loc_device=C.device
+    is_cpu= loc_device==torch.device('cpu')
+
+    #   --->
+    # A C2x2--1
+    # | |\23
+    #   0
+    C2x2= _get_open_C2x2_LU_dl(C,T,a,verbosity=verbosity)
+    if not is_cpu and verbosity>1: _log_cuda_mem(loc_device,who)
+
+    # close the physical indices of C2x2 with operators of the terms, with leading 
+    # identity term giving the norm
+    #
+    # C2x2--1    
+    # |\23   ->  M[k]
+    # 0   32
+    #      |/
+    #      W[k]
+    Id= torch.eye(a.size(0),dtype=C2x2.dtype,device=loc_device)
+    Ms= []
+    for i in range(4):
+        W= torch.stack([Id]+[term[i].to(device=loc_device,dtype=C2x2.dtype) if i in term \
+            else Id for term in terms])
+        Ms.append(torch.einsum('ijab,kba->kij',C2x2,W))
+    if not is_cpu and verbosity>1: _log_cuda_mem(loc_device,who)
+
+    # M0--M1
+    # |   |
+    # M2--M3
+    vals= torch.einsum('kij,kji->k',Ms[0]@Ms[1],Ms[3]@Ms[2])
+    vals= vals[1:]/vals[0]
+    vals= vals.to(env.device)
+
+    return vals
+
 # ----- single hole ------------------------------------------------------------
 def ddA_rdm1x1(state, env, sym_pos_def=False, verbosity=0):
     r"""
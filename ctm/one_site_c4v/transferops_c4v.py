@@ -1,7 +1,7 @@
 import torch
 import numpy as np
-from scipy.sparse.linalg import LinearOperator
-from scipy.sparse.linalg import eigs
+from config import _lazy_import
+sla= _lazy_import("scipy.sparse.linalg", "Missing scipy. Spectra of transfer operators are not available.")
 import config as cfg
 import ipeps
 from ctm.one_site_c4v.env_c4v import ENV_C4V
@@ -46,12 +46,12 @@ def get_Top_spec_c4v(n, state, env_c4v, normalize=True, eigenvectors=False, verb
         return V.detach().cpu().numpy()
 
     _test_T= torch.zeros(1,dtype=env_c4v.dtype)
-    T= LinearOperator((chi*ad*ad*chi,chi*ad*ad*chi), matvec=_mv, \
+    T= sla.LinearOperator((chi*ad*ad*chi,chi*ad*ad*chi), matvec=_mv, \
         dtype="complex128" if _test_T.is_complex() else "float64")
     if eigenvectors:
-        vals, vecs= eigs(T, k=n, v0=None, return_eigenvectors=True)
+        vals, vecs= sla.eigs(T, k=n, v0=None, return_eigenvectors=True)
     else:
-        vals= eigs(T, k=n, v0=None, return_eigenvectors=False)
+        vals= sla.eigs(T, k=n, v0=None, return_eigenvectors=False)
 
     # post-process and return as torch tensor with first and second column
     # containing real and imaginary parts respectively
@@ -103,8 +103,8 @@ def get_Top2_spec_c4v(n, state, env_c4v, verbosity=0):
         V= V.view(chi*(ad**4)*chi)
         return V.detach().cpu().numpy()
 
-    T= LinearOperator((chi*(ad**4)*chi,chi*(ad**4)*chi), matvec=_mv)
-    vals= eigs(T, k=n, v0=None, return_eigenvectors=False)
+    T= sla.LinearOperator((chi*(ad**4)*chi,chi*(ad**4)*chi), matvec=_mv)
+    vals= sla.eigs(T, k=n, v0=None, return_eigenvectors=False)
 
     # post-process and return as torch tensor with first and second column
     # containing real and imaginary parts respectively
@@ -209,9 +209,9 @@ def get_EH_spec_Ttensor(n, L, state, env_c4v, verbosity=0):
         return V.cpu().numpy()
 
     _test_T= torch.zeros(1,dtype=env_c4v.dtype)
-    expEH= LinearOperator((ad**L,ad**L), matvec=_mv, \
+    expEH= sla.LinearOperator((ad**L,ad**L), matvec=_mv, \
         dtype="complex128" if _test_T.is_complex() else "float64")
-    vals= eigs(expEH, k=n, v0=None, return_eigenvectors=False)
+    vals= sla.eigs(expEH, k=n, v0=None, return_eigenvectors=False)
 
     vals= np.copy(vals[::-1]) # descending order
     vals= (1.0/np.abs(vals[0])) * vals
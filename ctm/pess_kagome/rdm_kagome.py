@@ -27,6 +27,20 @@ def _expand_perm(n_inds):
         c_sum+= n
     return expanded_bra+expanded_ket
 
+def _stack_operators(ops):
+    r"""
+    Stack operators of the down triangle into a tensor of shape [K, physical_dim**3, physical_dim**3]
+    with leading identity, giving the norm. Operators can be given either as a sequence or as
+    a single tensor with leading index running over operators, each operator being rank-6 tensor
+    of shape [physical_dim]*6 or rank-2 tensor of shape [physical_dim**3]*2.
+    """
+    ops= torch.stack(list(ops)) if isinstance(ops, (list, tuple)) else ops
+    assert len(ops.size())==3 or len(ops.size())==7,"Invalid operators"
+    if len(ops.size())==7:
+        ops= ops.reshape(ops.size(0),ops.size(1)**3,ops.size(1)**3)
+    Id= torch.eye(ops.size(1),dtype=ops.dtype,device=ops.device)
+    return torch.cat((Id[None,:,:],ops))
+
 def double_layer_a(state, coord, open_sites=[], force_cpu=False):
     r"""
     :param state: underlying wavefunction
@@ -461,6 +475,93 @@ def trace1x1_dn_kagome(coord, state, env, op, verbosity=0, force_cpu=False):
     trace= trace.to(env.device)
     return trace
 
+def trace1x1_dn_kagome_with_operators(coord, state, env, ops, force_cpu=False, verbosity=0,\
+    **kwargs):
+    r"""
+    :param coord: vertex (x,y) for which the reduced density matrix is constructed
+    :param state: underlying wavefunction
+    :param env: environment corresponding to ``state``
+    :param ops: operators to be contracted, either a sequence of operators as accepted by 
+                :func:`trace1x1_dn_kagome` or a tensor with leading index 
+                running over the operators
+    :param force_cpu: perform on CPU
+    :param verbosity: logging verbosity
+    :type coord: tuple(int,int)
+    :type state: IPEPS_KAGOME
+    :type env: ENV
+    :type ops: list(torch.tensor) or torch.tensor
+    :type force_cpu: bool
+    :type verbosity: int
+    :return: normalized expectation values of operators ``ops`` and the norm
+    :rtype: torch.tensor, torch.tensor
+
+    Batched version of :func:`trace1x1_dn_kagome`. The operators, together with identity
+    giving the norm, are stacked along an extra index of the double-layer on-site tensor. 
+    Hence, the environment is contracted only once for all operators.
+    """
+    who= 'trace1x1_dn_kagome_with_operators'
+    ops= _stack_operators(ops)
+    if force_cpu:
+        ops= ops.cpu()
+        A= state.site(coord).cpu()
+        C1, C2, C3, C4= [env.C[(state.vertexToSite(coord), d)].cpu() \
+            for d in [(-1, -1), (-1, 1), (1, 1), (1, -1)]]
+        T1, T2, T3, T4= [env.T[(state.vertexToSite(coord), d)].cpu() \
+            for d in [(-1, 0), (0, 1), (1, 0), (0, -1)]]
+    else:
+        A= state.site(coord)
+        C1, C2, C3, C4= [env.C[(state.vertexToSite(coord), d)] \
+            for d in [(-1, -1), (-1, 1), (1, 1), (1, -1)]]
+        T1, T2, T3, T4= [env.T[(state.vertexToSite(coord), d)] \
+            for d in [(-1, 0), (0, 1), (1, 0), (0, -1)]]
+
+    # left half
+    #
+    # C1(-1,-1)--0
+    # |
+    # T1(-1,0)--1
+    # |             
+    # C2(-1,1)--T2(0,1)--3
+    #           2
+    left= contract(contract(contract(C1,T1,([0],[0])),C2,([1],[0])),T2,([2],[1]))
+
+    # right half
+    #
+    # 0--T4(0,-1)--C4(1,-1)
+    #    1         |
+    #         2--T3(1,0)
+    #              |
+    #         3--C3(1,1)
+    right= contract(contract(contract(T4,C4,([2],[0])),T3,([2],[0])),C3,([3],[0]))
+    if verbosity>0:
+        print(f"{who} left {left.size()} right {right.size()}")
+
+    #    /
+    # --A*--
+    #  /|
+    #   ops[k]
+    #   |/
+    # --A--
+    #  /
+    dimsA = A.size()
+    a_ops = torch.einsum('iabcd,kji,jefgh->kaebfcgdh', A, ops, conj(A))
+    a_ops = view(contiguous(a_ops), (ops.size(0), dimsA[1]**2, dimsA[2]**2, dimsA[3]**2, \
+        dimsA[4]**2))
+
+    # C1--------T4--------C4
+    # |         |         |
+    # T1------a_ops[k]----T3
+    # |         |         |
+    # C2--------T2--------C3
+    trace= contract(left,a_ops,([1,2],[2,3]))
+    trace= torch.einsum('iekur,iure->k',trace,right)
+    norm= _cast_to_real(trace[0],who=who,**kwargs)
+
+    vals= trace[1:]/norm
+    vals= vals.to(env.device)
+    norm= norm.to(env.device)
+    return vals, norm
+
 def rdm1x1_kagome(coord, state, env, sites_to_keep=('A', 'B', 'C'), force_cpu=False, 
     sym_pos_def=False, verbosity=0, **kwargs):
     r"""
@@ -1283,6 +1384,126 @@ def rdm2x2_dn_triangle_with_operator(coord, state, env, op, force_cpu=False,\
     rdm = rdm.to(env.device)
     return rdm, rdm_id
 
+def rdm2x2_dn_triangle_with_operators(coord, state, env, ops, force_cpu=False,\
+    verbosity=0,**kwargs):
+    r"""
+    :param coord: vertex (x,y) for which the reduced density matrix is constructed
+    :param state: underlying wavefunction
+    :param env: environment corresponding to ``state``
+    :param ops: operators to be contracted, either a sequence of operators as accepted by 
+                :func:`rdm2x2_dn_triangle_with_operator` or a tensor with leading index 
+                running over the operators
+    :param force_cpu: perform on CPU
+    :param verbosity: logging verbosity
+    :type coord: tuple(int,int)
+    :type state: IPEPS_KAGOME
+    :type env: ENV
+    :type ops: list(torch.tensor) or torch.tensor
+    :type force_cpu: bool
+    :type verbosity: int
+    :return: normalized expectation values of operators ``ops`` and the norm 
+             of the reduced density matrix
+    :rtype: torch.tensor, torch.tensor
+
+    Batched version of :func:`rdm2x2_dn_triangle_with_operator`. The operators, together
+    with identity giving the norm, are stacked along an extra index of the double-layer 
+    on-site tensor of the upper left corner. The remaining enlarged corners are built 
+    only once and all expectation values are obtained from a single contraction.
+    """
+    who = 'rdm2x2_dn_triangle_with_operators'
+    ops= _stack_operators(ops)
+
+    # ----- building C2x2_LU ----------------------------------------------------
+    if force_cpu:
+        C = env.C[(state.vertexToSite(coord), (-1, -1))].cpu()
+        T1 = env.T[(state.vertexToSite(coord), (0, -1))].cpu()
+        T2 = env.T[(state.vertexToSite(coord), (-1, 0))].cpu()
+        a_1layer = state.site(coord).cpu()
+        ops = ops.cpu()
+    else:
+        C = env.C[(state.vertexToSite(coord), (-1, -1))]
+        T1 = env.T[(state.vertexToSite(coord), (0, -1))]
+        T2 = env.T[(state.vertexToSite(coord), (-1, 0))]
+        a_1layer = state.site(coord)
+    dimsA = a_1layer.size()
+
+    a_ops = contiguous(
+        einsum('mefgh,knm,nabcd->keafbgchd', a_1layer, ops, conj(a_1layer)))
+    a_ops = view(a_ops, (ops.size(0), dimsA[1] ** 2, dimsA[2] ** 2, dimsA[3] ** 2, dimsA[4] ** 2))
+
+    # C--10--T1--2
+    # 0      1
+    C2x2_LU = contract(C, T1, ([1], [0]))
+
+    # C------T1--2->1
+    # 0      1->0
+    # 0
+    # T2--2->3
+    # 1->2
+    C2x2_LU = contract(C2x2_LU, T2, ([0], [0]))
+
+    # C-------T1--1->0
+    # |       0
+    # |       0
+    # T2--3 2 a_ops[k]--4
+    # 2->1    3
+    C2x2_LU = contract(C2x2_LU, a_ops, ([0, 3], [1, 2]))
+
+    # permute 01234->21304
+    # reshape 2(13)(04)->012
+    # C2x2[k]--2
+    # |
+    # 1
+    C2x2_LU = contiguous(permute(C2x2_LU, (2, 1, 3, 0, 4)))
+    C2x2_LU = view(C2x2_LU, (ops.size(0), T2.size(1) * a_ops.size(3), T1.size(2) * a_ops.size(4)))
+    if verbosity > 0:
+        print("C2X2 LU " + str(coord) + "->" + str(state.vertexToSite(coord)) + " (-1,-1): " + str(C2x2_LU.size()))
+
+    # ----- building C2x2_RU ----------------------------------------------------
+    vec = (1, 0)
+    shift_coord = _shift_coord(state,coord,vec)
+    C2x2_RU = enlarged_corner(shift_coord, state, env, 'RU', force_cpu=force_cpu,\
+        verbosity=verbosity)
+
+    # ----- build upper part C2x2_LU--C2x2_RU -----------------------------------
+    # C2x2_LU[k]--2 0--C2x2_RU
+    # |                |
+    # 1                1->2
+    upper_half = contract(C2x2_LU, C2x2_RU, ([2], [0]))
+
+    # ----- building C2x2_RD ----------------------------------------------------
+    vec = (1, 1)
+    shift_coord = _shift_coord(state,coord,vec)
+    C2x2_RD = enlarged_corner(shift_coord, state, env, 'RD', force_cpu=force_cpu,\
+        verbosity=verbosity)
+
+    # ----- building C2x2_LD ----------------------------------------------------
+    vec = (0, 1)
+    shift_coord = _shift_coord(state,coord,vec)
+    C2x2_LD = enlarged_corner(shift_coord, state, env, 'LD', force_cpu=force_cpu,\
+        verbosity=verbosity)
+
+    # ----- build lower part C2x2_LD--C2x2_RD -----------------------------------
+    # 0             0->1
+    # |             |
+    # C2x2_LD--1 1--C2x2_RD
+    lower_half = contract(C2x2_LD, C2x2_RD, ([1], [1]))
+
+    # contract lower and upper halfs for all operators at once
+    # C2x2_LU[k]---C2x2_RU
+    # |            |
+    # 1            2
+    # 0            1
+    # |            |
+    # C2x2_LD------C2x2_RD
+    vals = contract(upper_half, lower_half, ([1, 2], [0, 1]))
+    norm = _cast_to_real(vals[0],who=who,**kwargs)
+
+    vals = vals[1:]/norm
+    vals = vals.to(env.device)
+    norm = norm.to(env.device)
+    return vals, norm
+
 def rdm2x2_kagome(coord, state, env, sites_to_keep_00=('A', 'B', 'C'),\
     sites_to_keep_10=('A', 'B', 'C'), sites_to_keep_01=('A', 'B', 'C'),\
     sites_to_keep_11=('A', 'B', 'C'), force_cpu=False, sym_pos_def=False,\
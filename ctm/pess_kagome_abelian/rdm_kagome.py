@@ -1031,6 +1031,96 @@ def rdm2x2_dn_triangle_with_operator(coord, state, env, op, force_cpu=False,\
     return exp_val_op, rdm_id
 
 
+def rdm2x2_dn_triangle_with_operators(coord, state, env, ops, force_cpu=False,\
+    verbosity=0, **kwargs):
+    r"""
+    :param coord: vertex (x,y) for which the reduced density matrix is constructed
+    :param state: underlying wavefunction
+    :param env: environment corresponding to ``state``
+    :param ops: operators to be contracted, each as accepted by 
+                :func:`rdm2x2_dn_triangle_with_operator`
+    :param force_cpu: perform on CPU
+    :param verbosity: logging verbosity
+    :type coord: tuple(int,int)
+    :type state: IPEPS_KAGOME_ABELIAN
+    :type env: ENV_ABELIAN
+    :type ops: list(yastn.Tensor)
+    :type force_cpu: bool
+    :type verbosity: int
+    :return: normalized expectation values of operators ``ops`` and the norm 
+             of the reduced density matrix
+    :rtype: list(yastn.Tensor), float
+
+    Batched version of :func:`rdm2x2_dn_triangle_with_operator`. Operators of different 
+    charge can not be stacked into a single leg. Instead, the enlarged corners 
+    C2x2_RU, C2x2_RD, C2x2_LD and the lower half of the network are contracted only once 
+    and shared by all operators, for which only the upper left corner is rebuilt.
+    """
+    who = 'rdm2x2_dn_triangle_with_operators'
+    ops= [op.fuse_legs(axes=((0,1,2),(3,4,5))) if op.ndim==6 else op for op in ops]
+    assert all(op.ndim==2 for op in ops),"Invalid operator"
+
+    # ----- building C2x2_LU ----------------------------------------------------
+    if force_cpu:
+        C = env.C[(state.vertexToSite(coord), (-1, -1))].to('cpu')
+        T1 = env.T[(state.vertexToSite(coord), (0, -1))].to('cpu')
+        T2 = env.T[(state.vertexToSite(coord), (-1, 0))].to('cpu')
+        a_1layer = state.site(coord).to('cpu')
+        ops = [op.to('cpu') for op in ops]
+    else:
+        C = env.C[(state.vertexToSite(coord), (-1, -1))]
+        T1 = env.T[(state.vertexToSite(coord), (0, -1))]
+        T2 = env.T[(state.vertexToSite(coord), (-1, 0))]
+        a_1layer = state.site(coord)
+
+    # C------T1--2->1(-)
+    # 0      1->0(-)
+    # 0
+    # T2--2->3(-)
+    # 1->2(-)
+    C2x2_LU = contract(C, T1, ([1], [0]))
+    C2x2_LU = contract(C2x2_LU, T2, ([0], [0]))
+
+    # ----- building C2x2_RU, C2x2_RD, C2x2_LD ----------------------------------
+    C2x2_RU = enlarged_corner_kagome(_shift_coord(state,coord,(1,0)), state, env, 'RU',\
+        force_cpu=force_cpu, verbosity=verbosity)
+    C2x2_RD = enlarged_corner_kagome(_shift_coord(state,coord,(1,1)), state, env, 'RD',\
+        force_cpu=force_cpu, verbosity=verbosity)
+    C2x2_LD = enlarged_corner_kagome(_shift_coord(state,coord,(0,1)), state, env, 'LD',\
+        force_cpu=force_cpu, verbosity=verbosity)
+
+    # ----- build lower part C2x2_LD--C2x2_RD -----------------------------------
+    # 0(+)                0->1(-)
+    # |                   |
+    # C2x2_LD--1(-) (+)1--C2x2_RD
+    lower_half = contract(C2x2_LD, C2x2_RD, ([1], [1]))
+
+    def _expval(a):
+        # C-------T1--0(-)
+        # |       |
+        # T2------a--3(+)
+        # 1(-)    2(+)
+        #
+        # reshape (12)(03)->01
+        C2x2 = contract(C2x2_LU, a, ([0, 3], [0, 1]))
+        C2x2 = C2x2.fuse_legs(axes=((1, 2), (0, 3)))
+        # C2x2_LU------C2x2_RU
+        # |            |
+        # C2x2_LD------C2x2_RD
+        upper_half = contract(C2x2, C2x2_RU, ([1], [0]))
+        return contract(upper_half, lower_half, ([0, 1], [0, 1]))
+
+    a = double_layer_kagome_a(state,coord,force_cpu=force_cpu,verbosity=verbosity)
+    norm = _cast_to_real(_expval(a), who=who, **kwargs).to_number()
+    vals = []
+    for op in ops:
+        a_op = contract(op,a_1layer,([0],[0]),conj=(0,1))
+        a_op = contract(a_1layer,a_op,([0],[0]))
+        a_op = a_op.fuse_legs(axes=((0,4),(1,5),(2,6),(3,7)))
+        vals.append( (_expval(a_op)/norm).to(env.device) )
+    return vals, norm
+
+
 def rdm2x2_kagome(coord, state, env, sites_to_keep_00=('A', 'B', 'C'),\
     sites_to_keep_10=('A', 'B', 'C'), sites_to_keep_01=('A', 'B', 'C'),\
     sites_to_keep_11=('A', 'B', 'C'), force_cpu=False, sym_pos_def=False,\
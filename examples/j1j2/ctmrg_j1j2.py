@@ -1,4 +1,5 @@
 import context
+import os
 import torch
 import argparse
 import config as cfg
@@ -144,8 +145,11 @@ def main():
                 return True, history
         return False, history
 
-    ctm_env_init = ENV(args.chi, state)
-    init_env(state, ctm_env_init)
+    if args.instate_env and os.path.exists(args.instate_env):
+        ctm_env_init= read_env(args.instate_env, state=state, chi=args.chi)
+    else:
+        ctm_env_init = ENV(args.chi, state)
+        init_env(state, ctm_env_init)
     print(ctm_env_init)
 
     e_curr0 = energy_f(state, ctm_env_init)
@@ -155,6 +159,8 @@ def main():
     print(", ".join([f"{-1}",f"{e_curr0}"]+[f"{v}" for v in obs_values0]))
 
     ctm_env_init, *ctm_log= ctmrg.run(state, ctm_env_init, conv_check=ctmrg_conv_energy)
+    if args.instate_env and not os.path.exists(args.instate_env):
+        write_env(ctm_env_init, args.instate_env, state=state)
 
     # 6) compute final observables
     e_curr0 = energy_f(state, ctm_env_init)
@@ -228,4 +234,40 @@ class TestCtmrg(unittest.TestCase):
         args.GLOBALARGS_device="cuda:0"
         args.CTMARGS_projector_svd_method="GESDD"
         args.tiling="4SITE"
-        main()
\ No newline at end of file
+        main()
+
+    def test_ctmrg_instate_env(self):
+        import tempfile
+        args.CTMARGS_projector_svd_method="GESDD"
+        args.tiling="BIPARTITE"
+        chi0= args.chi
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            args.instate_env= os.path.join(tmp_dir, "env.json")
+            try:
+                # converged environment is stored by the first run and read by the second
+                main()
+                self.assertTrue(os.path.exists(args.instate_env))
+                main()
+                # stored environment is extended or compressed to requested chi
+                args.chi= chi0+4
+                main()
+                args.chi= chi0-4
+                main()
+            finally:
+                args.instate_env= None
+                args.chi= chi0
+
+    def test_expval2x2_4SITE(self):
+        cfg.configure(args)
+        def lattice_to_site(coord):
+            return (coord[0]%2, coord[1]%2)
+        sites= {(x,y): torch.rand(2,2,2,2,2,dtype=torch.float64)-0.5 for x in range(2) \
+            for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lattice_to_site)
+        env= ENV(args.chi, state)
+        init_env(state, env)
+        env, *ctm_log= ctmrg.run(state, env)
+
+        model= j1j2.J1J2(j1=args.j1, j2=0.5)
+        self.assertTrue(torch.allclose(model.energy_2x2_expval(state,env), \
+            model.energy_2x2_4site(state,env)))
@@ -1,4 +1,5 @@
 import context
+import os
 import torch
 import argparse
 import config as cfg
@@ -128,8 +129,11 @@ def main():
         return False, history
 
     # 3) initialize environment 
-    ctm_env_init = ENV_C4V(args.chi, state)
-    init_env(state, ctm_env_init)
+    if args.instate_env and os.path.exists(args.instate_env):
+        ctm_env_init= read_env(args.instate_env, state=state, chi=args.chi)
+    else:
+        ctm_env_init = ENV_C4V(args.chi, state)
+        init_env(state, ctm_env_init)
 
     # 4) (optional) compute observables as given by initial environment 
     e_curr0 = energy_f(state, ctm_env_init,force_cpu=args.force_cpu)
@@ -139,6 +143,8 @@ def main():
 
     # 5) (main) execute CTM algorithm
     ctm_env_init, *ctm_log = ctmrg_c4v.run(state, ctm_env_init, conv_check=ctmrg_conv_rdm2x1)
+    if args.instate_env and not os.path.exists(args.instate_env):
+        write_env(ctm_env_init, args.instate_env, state=state)
 
     # 6) compute final observables
     e_curr0 = energy_f(state, ctm_env_init, force_cpu=args.force_cpu)
@@ -256,3 +262,46 @@ class TestRVB(unittest.TestCase):
         self.assertTrue(obs_dict["m"] < eps_m)
         for l in ["sz","sp","sm"]:
             self.assertTrue(abs(obs_dict[l]) < eps_m)
+
+    def test_env_save_load_RVB(self):
+        import tempfile
+        cfg.configure(args)
+        state = read_ipeps_c4v(args.instate)
+
+        @torch.no_grad()
+        def ctmrg_conv_f(state, env, history, ctm_args=cfg.ctm_args):
+            if not history:
+                history=dict({"log": []})
+            rdm= rdm2x1_sl(state, env)
+            dist= torch.dist(rdm, history["rdm"], p=2).item() if "rdm" in history else float('inf')
+            history["rdm"]=rdm
+            history["log"].append(dist)
+            return dist<ctm_args.ctm_conv_tol, history
+
+        ctm_env = ENV_C4V(args.chi, state)
+        init_env(state, ctm_env)
+        ctm_env, history0, *_ = ctmrg_c4v.run(state, ctm_env, conv_check=ctmrg_conv_f)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputfile= os.path.join(tmp_dir, "env.json")
+            ctm_env.save(outputfile, state=state)
+            ctm_env_r= ENV_C4V.load(outputfile, state=state)
+            self.assertEqual((ctm_env_r.chi, ctm_env_r.bond_dim), (ctm_env.chi, ctm_env.bond_dim))
+            self.assertTrue(torch.equal(ctm_env_r.get_C(), ctm_env.get_C()))
+            self.assertTrue(torch.equal(ctm_env_r.get_T(), ctm_env.get_T()))
+            # CTM started from the stored environment is converged
+            ctm_env_r, history, *_ = ctmrg_c4v.run(state, ctm_env_r, conv_check=ctmrg_conv_f)
+            self.assertLess(len(history["log"]), len(history0["log"]))
+
+    def test_compress_env_RVB(self):
+        from ctm.one_site_c4v.rdm_c4v import rdm2x2, rdm3x2_NNNN
+        cfg.configure(args)
+        state = read_ipeps_c4v(args.instate)
+        ctm_env = ENV_C4V(args.chi, state)
+        init_env(state, ctm_env)
+        ctm_env, *ctm_log = ctmrg_c4v.run(state, ctm_env)
+
+        ctm_env_c, err= compress_env(state, ctm_env, 8)
+        self.assertEqual(ctm_env_c.get_C().size(), (8,8))
+        for f in [rdm2x2, rdm3x2_NNNN]:
+            R, R_c= f(state, ctm_env), f(state, ctm_env_c)
+            self.assertLess((R-R_c).abs().max().item(), 10*err+1.0e-8)
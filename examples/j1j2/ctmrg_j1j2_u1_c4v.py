@@ -186,3 +186,21 @@ class TestCtmrg(unittest.TestCase):
         args.GLOBALARGS_device="cuda:0"
         args.CTMARGS_projector_svd_method="SYMEIG"
         main()
+
+    def test_symten_cache(self):
+        import os, tempfile
+        from unittest import mock
+        infile= os.path.join(os.path.dirname(tenU1.__file__), "D3_U1_B.txt")
+        t_ref= [(m, tenU1.fill_from_sparse_coo(torch.zeros((2,)+(3,)*4,\
+            dtype=torch.float64), e)) for m,e in tenU1.parse_symten_file(infile)\
+            if m["meta"]["pg"]=="A_1"]
+        with tempfile.TemporaryDirectory() as tmpdir, \
+            mock.patch.dict(os.environ, {"PEPS_TORCH_SYMTEN_CACHE": tmpdir}):
+            # first call parses the text file and populates the cache, second reads it
+            for i in range(2):
+                t= tenU1.import_sym_tensors(2, 3, "A_1", infile=infile)
+                self.assertEqual(len(os.listdir(tmpdir)), 1)
+                self.assertEqual(len(t), len(t_ref))
+                for (m,x),(m_ref,x_ref) in zip(t,t_ref):
+                    self.assertEqual(m, m_ref)
+                    self.assertTrue(torch.equal(x, x_ref))
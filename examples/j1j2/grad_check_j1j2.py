@@ -0,0 +1,106 @@
+import context
+import torch
+import argparse
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+from ctm.generic import ctmrg
+from models import j1j2
+from optim import test_grad
+import unittest
+import logging
+log = logging.getLogger(__name__)
+
+# parse command line args and build necessary configuration objects
+parser= cfg.get_args_parser()
+# additional model-dependent arguments
+parser.add_argument("--j1", type=float, default=1., help="nearest-neighbour coupling")
+parser.add_argument("--j2", type=float, default=0., help="next nearest-neighbour coupling")
+parser.add_argument("--chis", type=int, nargs="+", default=None, help="environment dimensions"\
+    +" to verify the gradient at. Default: chi")
+parser.add_argument("--n_dirs", type=int, default=4, help="number of random directions"\
+    +" per parameter tensor")
+parser.add_argument("--n_workers", type=int, default=1, help="number of threads evaluating"\
+    +" finite differences")
+args, unknown_args = parser.parse_known_args()
+
+def main():
+    cfg.configure(args)
+    cfg.print_config()
+    torch.set_num_threads(args.omp_cores)
+    torch.manual_seed(args.seed)
+    
+    model= j1j2.J1J2(j1=args.j1, j2=args.j2)
+
+    def lattice_to_site(coord):
+        vx = (coord[0] + abs(coord[0]) * 2) % 2
+        vy = abs(coord[1])
+        return ((vx + vy) % 2, 0)
+
+    if args.instate!=None:
+        state = read_ipeps(args.instate, vertexToSite=lattice_to_site)
+        state.add_noise(args.instate_noise)
+    else:
+        sites= dict()
+        for c in [(0,0), (1,0)]:
+            A = torch.rand((model.phys_dim,)+(args.bond_dim,)*4,\
+                dtype=cfg.global_args.torch_dtype,device=cfg.global_args.device)
+            sites[c]= A/torch.max(torch.abs(A))
+        state = IPEPS(sites, vertexToSite=lattice_to_site)
+    energy_f= model.energy_2x2_2site
+
+    @torch.no_grad()
+    def ctmrg_conv_energy(state, env, history, ctm_args=cfg.ctm_args):
+        if not history:
+            history=[]
+        e_curr= energy_f(state, env)
+        history.append(e_curr.item())
+
+        if (len(history) > 1 and abs(history[-1]-history[-2]) < ctm_args.ctm_conv_tol)\
+            or len(history) >= ctm_args.ctm_max_iter:
+            return True, history
+        return False, history
+
+    def loss_fn(state, ctm_env_in, opt_context):
+        ctm_args= opt_context["ctm_args"]
+        opt_args= opt_context["opt_args"]
+
+        # possibly re-initialize the environment
+        if opt_args.opt_ctm_reinit:
+            init_env(state, ctm_env_in)
+
+        ctm_env_out, *ctm_log= ctmrg.run(state, ctm_env_in, \
+             conv_check=ctmrg_conv_energy, ctm_args=ctm_args)
+        loss = energy_f(state, ctm_env_out)
+        return (loss, ctm_env_out, *ctm_log)
+
+    ctm_env = ENV(args.chi, state)
+    init_env(state, ctm_env)
+    chis= args.chis if args.chis else [args.chi]
+    report= test_grad.test_grad_projected(state, ctm_env, chis, loss_fn, n_dirs=args.n_dirs,\
+        n_workers=args.n_workers)
+    return report
+
+if __name__=='__main__':
+    if len(unknown_args)>0:
+        print("args not recognized: "+str(unknown_args))
+        raise Exception("Unknown command line arguments")
+    main()
+
+class TestGradCheck(unittest.TestCase):
+    def setUp(self):
+        args.j2=0.3
+        args.bond_dim=2
+        args.chi=8
+        args.chis=[8,16]
+        args.n_dirs=2
+        args.n_workers=2
+        args.GLOBALARGS_dtype="float64"
+        args.CTMARGS_ctm_conv_tol=1.0e-10
+        args.OPTARGS_fd_eps=1.0e-5
+
+    def test_grad_projected_BIPARTITE(self):
+        report= main()
+        for chi in args.chis:
+            for b in report[chi]["blocks"]:
+                self.assertLess(b["rel_err"], 1.0e-3)
@@ -9,7 +9,7 @@ from ctm.generic import transferops
 from models import j1j2
 # from optim.ad_optim import optimize_state
 from optim.ad_optim_lbfgs_mod import optimize_state
-# from optim.ad_optim_sgd_mod import optimize_state
+from optim.ad_optim_sgd_mod import optimize_state as optimize_state_sgd
 import unittest
 import logging
 log = logging.getLogger(__name__)
@@ -21,6 +21,7 @@ parser.add_argument("--j1", type=float, default=1., help="nearest-neighbour coup
 parser.add_argument("--j2", type=float, default=0., help="next nearest-neighbour coupling")
 parser.add_argument("--tiling", default="BIPARTITE", help="tiling of the lattice", \
     choices=["BIPARTITE", "1SITE", "2SITE", "4SITE", "8SITE"])
+parser.add_argument("--optimizer", default="LBFGS", help="optimizer", choices=["LBFGS", "SGD"])
 parser.add_argument("--top_freq", type=int, default=-1, help="freuqency of transfer operator spectrum evaluation")
 parser.add_argument("--top_n", type=int, default=2, help="number of leading eigenvalues"+
     "of transfer operator to compute")
@@ -210,7 +211,10 @@ def main():
                         print("TOP "+json.dumps(_to_json(l)))
 
     # optimize
-    optimize_state(state, ctm_env, loss_fn, obs_fn=obs_fn)
+    if args.optimizer=="SGD":
+        optimize_state_sgd(state, ctm_env, loss_fn, obs_fn=obs_fn)
+    else:
+        optimize_state(state, ctm_env, loss_fn, obs_fn=obs_fn)
 
     # compute final observables for the best variational state
     outputstatefile= args.out_prefix+"_state.json"
@@ -234,6 +238,11 @@ class TestOpt(unittest.TestCase):
         args.bond_dim=2
         args.chi=16
         args.opt_max_iter=3
+        args.OPTARGS_ctm_conv_tol_adaptive=False
+        args.CTMARGS_memory_budget=0.0
+        args.optimizer="LBFGS"
+        args.OPTARGS_precondition="NONE"
+        args.OPTARGS_line_search="default"
         try:
             import scipy.sparse.linalg
             self.SCIPY= True
@@ -261,6 +270,38 @@ class TestOpt(unittest.TestCase):
         args.line_search_svd_method="ARP"
         main()
 
+    def test_opt_GESDD_BIPARTITE_adaptive_ctm_conv_tol(self):
+        args.CTMARGS_projector_svd_method="GESDD"
+        args.tiling="BIPARTITE"
+        args.OPTARGS_ctm_conv_tol_adaptive=True
+        main()
+        # schedule of CTM convergence is restored after optimization
+        self.assertEqual(cfg.ctm_args.ctm_conv_tol, args.CTMARGS_ctm_conv_tol)
+        self.assertEqual(cfg.ctm_args.ctm_max_iter, args.CTMARGS_ctm_max_iter)
+
+    def test_opt_GESDD_BIPARTITE_memory_budget(self):
+        args.CTMARGS_projector_svd_method="GESDD"
+        args.tiling="BIPARTITE"
+        args.CTMARGS_memory_budget=1.0e-3
+        main()
+        # checkpoints are planned on a copy of the configuration
+        self.assertFalse(any(getattr(cfg.ctm_args, "fwd_checkpoint_"+s) for s in \
+            ["c2x2", "halves", "projectors", "absorb", "move", "loop_rdm"]))
+
+    def test_opt_GESDD_BIPARTITE_SGD(self):
+        args.CTMARGS_projector_svd_method="GESDD"
+        args.tiling="BIPARTITE"
+        args.optimizer="SGD"
+        main()
+
+    def test_opt_GESDD_BIPARTITE_SGD_norm_precondition(self):
+        args.CTMARGS_projector_svd_method="GESDD"
+        args.tiling="BIPARTITE"
+        args.optimizer="SGD"
+        args.OPTARGS_precondition="NORM"
+        args.OPTARGS_line_search="backtracking"
+        main()
+
     def test_opt_GESDD_4SITE(self):
         args.CTMARGS_projector_svd_method="GESDD"
         args.tiling="4SITE"
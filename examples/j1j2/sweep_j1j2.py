@@ -0,0 +1,167 @@
+import context
+import torch
+import argparse
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+from ctm.generic import ctmrg
+from models import j1j2
+from optim.ad_optim_lbfgs_mod import optimize_state
+from optim.sweep import split_path, run_sweep
+from functools import partial
+import sys
+import unittest
+from unittest import mock
+import logging
+log = logging.getLogger(__name__)
+
+# parse command line args and build necessary configuration objects
+parser= cfg.get_args_parser()
+# additional model-dependent arguments
+parser.add_argument("--j1", type=float, default=1., help="nearest-neighbour coupling")
+parser.add_argument("--j2_path", type=float, nargs=3, default=[0., 0.5, 0.1],\
+    metavar=("START","STOP","STEP"), help="path of next nearest-neighbour couplings (inclusive)")
+parser.add_argument("--sweep_branches", type=int, default=1, help="number of independent"\
+    +" branches of the path")
+parser.add_argument("--sweep_workers", type=int, default=1, help="number of worker processes")
+args, unknown_args = parser.parse_known_args()
+
+def lattice_to_site(coord):
+    vx = (coord[0] + abs(coord[0]) * 2) % 2
+    vy = abs(coord[1])
+    return ((vx + vy) % 2, 0)
+
+def run_point(args, params, state, env):
+    r"""
+    Optimizes BIPARTITE iPEPS for J1-J2 model at coupling ``params["j2"]``. If ``state``
+    and ``env`` are given, the optimization starts from them instead of random state
+    and fresh environment. The handed-over environment is retained also within
+    the optimization, i.e. ``opt_args.opt_ctm_reinit`` is disabled.
+    """
+    # parsed arguments are passed explicitly, as spawned workers do not inherit them
+    cfg.configure(args)
+    cfg.main_args.out_prefix= f"{args.out_prefix}_j2{params['j2']}"
+    torch.set_num_threads(args.omp_cores)
+    torch.manual_seed(args.seed)
+
+    model= j1j2.J1J2(j1=args.j1, j2=params["j2"])
+    energy_f= model.energy_2x2_2site
+
+    if state is None:
+        if args.instate!=None:
+            state = read_ipeps(args.instate, vertexToSite=lattice_to_site)
+            state.add_noise(args.instate_noise)
+        else:
+            sites= dict()
+            for c in [(0,0), (1,0)]:
+                A = torch.rand((model.phys_dim,)+(args.bond_dim,)*4,\
+                    dtype=cfg.global_args.torch_dtype,device=cfg.global_args.device)
+                sites[c]= A/torch.max(torch.abs(A))
+            state = IPEPS(sites, vertexToSite=lattice_to_site)
+    ctm_steps0= []
+    if env is None:
+        env = ENV(args.chi, state)
+        init_env(state, env)
+    else:
+        # warm start from the environment converged at the previous point
+        cfg.opt_args.opt_ctm_reinit= False
+
+    @torch.no_grad()
+    def ctmrg_conv_energy(state, env, history, ctm_args=cfg.ctm_args):
+        if not history:
+            history=[]
+        e_curr= energy_f(state, env)
+        history.append(e_curr.item())
+
+        if (len(history) > 1 and abs(history[-1]-history[-2]) < ctm_args.ctm_conv_tol)\
+            or len(history) >= ctm_args.ctm_max_iter:
+            return True, history
+        return False, history
+
+    def loss_fn(state, ctm_env_in, opt_context):
+        ctm_args= opt_context["ctm_args"]
+        opt_args= opt_context["opt_args"]
+
+        # possibly re-initialize the environment
+        if opt_args.opt_ctm_reinit:
+            init_env(state, ctm_env_in)
+
+        ctm_env_out, history, *ctm_log= ctmrg.run(state, ctm_env_in, \
+             conv_check=ctmrg_conv_energy, ctm_args=ctm_args)
+        if not ctm_steps0: ctm_steps0.append(len(history))
+        loss = energy_f(state, ctm_env_out)
+        return (loss, ctm_env_out, history, *ctm_log)
+
+    epochs= [0]
+    @torch.no_grad()
+    def obs_fn(state, ctm_env, opt_context):
+        if not opt_context.get("line_search", False):
+            epochs[0]= len(opt_context["loss_history"]["loss"])
+
+    optimize_state(state, env, loss_fn, obs_fn=obs_fn)
+
+    # hand over the best state together with the environment converged for it,
+    # starting from the last environment of the optimization
+    state= read_ipeps(cfg.main_args.out_prefix+"_state.json", vertexToSite=lattice_to_site)
+    with torch.no_grad():
+        env, *ctm_log= ctmrg.run(state, env.detach(), conv_check=ctmrg_conv_energy)
+        energy= energy_f(state, env).item()
+        obs_values, obs_labels= model.eval_obs(state, env)
+
+    result= dict({"energy": energy, "epochs": epochs[0], "ctm_steps0": ctm_steps0[0]}, \
+        **{l: float(abs(v)) for l,v in zip(obs_labels, obs_values)})
+    return state, env, result
+
+def main():
+    cfg.configure(args)
+    cfg.print_config()
+    j2_start, j2_stop, j2_step= args.j2_path
+    n_points= int(round((j2_stop-j2_start)/j2_step))+1
+    points= [dict(j2=round(j2_start+i*j2_step,12)) for i in range(n_points)]
+
+    records= run_sweep(partial(run_point, args), split_path(points, args.sweep_branches),\
+        n_workers=args.sweep_workers, out_file=args.out_prefix+"_sweep.dat")
+    print(", ".join(["j2","energy","epochs"]))
+    for r in records:
+        print(", ".join([f"{r['j2']}",f"{r['energy']}",f"{r['epochs']}"]))
+
+if __name__=='__main__':
+    if len(unknown_args)>0:
+        print("args not recognized: "+str(unknown_args))
+        raise Exception("Unknown command line arguments")
+    main()
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        args.j2_path=[0.0, 0.1, 0.1]
+        args.bond_dim=2
+        args.chi=16
+        args.opt_max_iter=3
+        args.out_prefix="output"
+        args.sweep_branches=1
+        args.sweep_workers=1
+
+    def test_sweep_warm_start(self):
+        main()
+
+    def test_run_point_keeps_env(self):
+        state, env, result= run_point(args, dict(j2=0.0), None, None)
+        self.assertTrue(cfg.opt_args.opt_ctm_reinit)
+
+        # cold start from the same state, i.e. with fresh environment
+        state_cold= read_ipeps(args.out_prefix+"_j20.0_state.json", vertexToSite=lattice_to_site)
+        _, _, result_cold= run_point(args, dict(j2=0.1), state_cold, None)
+
+        with mock.patch.object(sys.modules[__name__], "optimize_state",\
+            wraps=optimize_state) as opt_mock:
+            _, _, result_warm= run_point(args, dict(j2=0.1), state, env)
+        self.assertFalse(cfg.opt_args.opt_ctm_reinit)
+        # the optimization starts from the handed-over environment ...
+        self.assertIs(opt_mock.call_args[0][1], env)
+        # ... which is already converged for the starting state
+        self.assertLess(result_warm["ctm_steps0"], result_cold["ctm_steps0"])
+
+    def test_sweep_parallel_branches(self):
+        args.sweep_branches=2
+        args.sweep_workers=2
+        main()
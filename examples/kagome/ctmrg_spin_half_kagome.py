@@ -427,3 +427,59 @@ class TestCtmrg_IPESS_D3_RVB(unittest.TestCase):
                 if os.path.isfile(f): os.remove(f)
 
    
+
+    def test_batched_dn_triangle_operators(self):
+        cfg.configure(args)
+        torch.manual_seed(args.seed)
+        state= read_ipess_kagome_generic(self.DIR_PATH+"/../../test-input/"+self.ANSATZE[0][1])
+        state.add_noise(0.1)
+        env= ENV(args.chi, state)
+        init_env(state, env)
+        env, *ctm_log= ctmrg.run(state, env)
+
+        model= spin_half_kagome.S_HALF_KAGOME(j1=args.j1)
+        ops= [model.SSnnId, model.SSnnId.permute(2,1,0, 5,4,3)]+list(model.obs_ops.values())
+        vals, norm= rdm_kagome.rdm2x2_dn_triangle_with_operators((0,0), state, env, ops)
+        vals_1x1, norm_1x1= rdm_kagome.trace1x1_dn_kagome_with_operators((0,0), state, env,\
+            [op.reshape(model.phys_dim**3, model.phys_dim**3) for op in ops])
+        norm_ref_1x1= rdm_kagome.trace1x1_dn_kagome((0,0), state, env, model.Id3_t)
+        for op, val, val_1x1 in zip(ops, vals, vals_1x1):
+            val_ref, norm_ref= rdm_kagome.rdm2x2_dn_triangle_with_operator((0,0), state, env,\
+                op.contiguous())
+            self.assertTrue(torch.allclose(val, val_ref))
+            self.assertTrue(torch.allclose(norm, norm_ref))
+            val_ref_1x1= rdm_kagome.trace1x1_dn_kagome((0,0), state, env,\
+                op.reshape(model.phys_dim**3, model.phys_dim**3))/norm_ref_1x1
+            self.assertTrue(torch.allclose(val_1x1, val_ref_1x1))
+
+    def test_cached_onsite_tensors(self):
+        cfg.configure(args)
+        state= read_ipess_kagome_generic(self.DIR_PATH+"/../../test-input/"+self.ANSATZE[0][1])
+        a= state.site((0,0))
+        self.assertIs(state.build_onsite_tensors()[(0,0)], a)
+
+        # in-place modification of iPESS tensors triggers rebuild on refresh,
+        # but not on plain access
+        from ipeps.site_cache import refresh_sites
+        with torch.no_grad():
+            state.ipess_tensors['B_c'].mul_(2.0)
+        self.assertIs(state.site((0,0)), a)
+        refresh_sites(state)
+        a_mod= state.site((0,0))
+        self.assertIsNot(a_mod, a)
+        refresh_sites(state)
+        self.assertIs(state.site((0,0)), a_mod)
+        state.ipess_tensors['B_c']= state.ipess_tensors['B_c']/2.0
+        refresh_sites(state)
+        self.assertTrue(torch.allclose(state.site((0,0)), a))
+
+        # gradients through cached on-site tensors across repeated backward passes
+        for t in state.ipess_tensors.values(): t.requires_grad_(True)
+        grads= []
+        for i in range(2):
+            state.sites= state.build_onsite_tensors()
+            loss= state.site((0,0)).abs().pow(2).sum()
+            loss.backward()
+            grads.append(state.ipess_tensors['T_u'].grad.clone())
+            state.ipess_tensors['T_u'].grad= None
+        self.assertTrue(torch.allclose(grads[0], grads[1]))
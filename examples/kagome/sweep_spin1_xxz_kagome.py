@@ -0,0 +1,159 @@
+import context
+import torch
+import argparse
+import config as cfg
+from ipeps.ipess_kagome import *
+from ctm.generic.env import *
+from ctm.generic import ctmrg
+from models import spin1_xxz_kagome
+from optim.ad_optim_lbfgs_mod import optimize_state
+from optim.sweep import split_path, run_sweep
+from functools import partial
+import unittest
+import logging
+log = logging.getLogger(__name__)
+
+# parse command line args and build necessary configuration objects
+parser= cfg.get_args_parser()
+# additional model-dependent arguments
+parser.add_argument("--delta", type=float, default=1., help="Coupling constant of SzSz.")
+parser.add_argument("--h", type=float, default=0., help="Onsite z direction megnetic field.")
+parser.add_argument("--j1", type=float, default=1., help="nearest-neighbor exchange coupling")
+parser.add_argument("--sweep_param", type=str, default="delta", choices=["delta", "h"],\
+    help="coupling varied along the path, the other one is kept fixed")
+parser.add_argument("--sweep_path", type=float, nargs=3, default=[0., 1., 0.25],\
+    metavar=("START","STOP","STEP"), help="path of the swept coupling (inclusive)")
+parser.add_argument("--sweep_branches", type=int, default=1, help="number of independent"\
+    +" branches of the path")
+parser.add_argument("--sweep_workers", type=int, default=1, help="number of worker processes")
+args, unknown_args = parser.parse_known_args()
+
+def run_point(args, params, state, env):
+    r"""
+    Optimizes generic IPESS for spin-1 XXZ model on kagome lattice at couplings
+    given by ``params``, which override ``args.delta`` and ``args.h``. If ``state`` and
+    ``env`` are given, the optimization starts from them instead of random state and
+    fresh environment. The handed-over environment is retained also within
+    the optimization, i.e. ``opt_args.opt_ctm_reinit`` is disabled.
+    """
+    # parsed arguments are passed explicitly, as spawned workers do not inherit them
+    cfg.configure(args)
+    couplings= dict(delta=args.delta, h=args.h, **params)
+    cfg.main_args.out_prefix= f"{args.out_prefix}_delta{couplings['delta']}_h{couplings['h']}"
+    torch.set_num_threads(args.omp_cores)
+    torch.manual_seed(args.seed)
+
+    model= spin1_xxz_kagome.S1_KAGOME_XXZ(delta=couplings["delta"], h=couplings["h"],\
+        j1=args.j1)
+
+    def energy_f(state, env, force_cpu=False):
+        e_dn = model.energy_triangle_dn(state, env, force_cpu=force_cpu)
+        e_up = model.energy_triangle_up(state, env, force_cpu=force_cpu)
+        return (e_up + e_dn)/3
+
+    if state is None:
+        if args.instate!=None:
+            state= read_ipess_kagome_generic(args.instate)
+            state.add_noise(args.instate_noise)
+        else:
+            ipess_tensors= dict()
+            for t in ['T_u', 'T_d']:
+                ipess_tensors[t]= torch.rand((args.bond_dim,)*3,\
+                    dtype=cfg.global_args.torch_dtype, device=cfg.global_args.device)-1.0
+            for t in ['B_a', 'B_b', 'B_c']:
+                ipess_tensors[t]= torch.rand((model.phys_dim,)+(args.bond_dim,)*2,\
+                    dtype=cfg.global_args.torch_dtype, device=cfg.global_args.device)-1.0
+            state= IPESS_KAGOME_GENERIC(ipess_tensors)
+    ctm_steps0= []
+    if env is None:
+        env = ENV(args.chi, state)
+        init_env(state, env)
+    else:
+        # warm start from the environment converged at the previous point
+        cfg.opt_args.opt_ctm_reinit= False
+
+    @torch.no_grad()
+    def ctmrg_conv_energy(state, env, history, ctm_args=cfg.ctm_args):
+        if not history:
+            history=[]
+        e_curr= energy_f(state, env, force_cpu=ctm_args.conv_check_cpu)
+        history.append(e_curr.item())
+
+        if (len(history) > 1 and abs(history[-1]-history[-2]) < ctm_args.ctm_conv_tol)\
+            or len(history) >= ctm_args.ctm_max_iter:
+            return True, history
+        return False, history
+
+    def loss_fn(state, ctm_env_in, opt_context):
+        ctm_args= opt_context["ctm_args"]
+        opt_args= opt_context["opt_args"]
+
+        # build on-site tensors
+        state.sites= state.build_onsite_tensors()
+
+        # possibly re-initialize the environment
+        if opt_args.opt_ctm_reinit:
+            init_env(state, ctm_env_in)
+
+        ctm_env_out, history, *ctm_log= ctmrg.run(state, ctm_env_in, \
+             conv_check=ctmrg_conv_energy, ctm_args=ctm_args)
+        if not ctm_steps0: ctm_steps0.append(len(history))
+        loss = energy_f(state, ctm_env_out, force_cpu=ctm_args.conv_check_cpu)
+        return (loss, ctm_env_out, history, *ctm_log)
+
+    epochs= [0]
+    @torch.no_grad()
+    def obs_fn(state, ctm_env, opt_context):
+        if not opt_context.get("line_search", False):
+            epochs[0]= len(opt_context["loss_history"]["loss"])
+
+    optimize_state(state, env, loss_fn, obs_fn=obs_fn)
+
+    # hand over the best state together with the environment converged for it,
+    # starting from the last environment of the optimization
+    state= read_ipess_kagome_generic(cfg.main_args.out_prefix+"_state.json")
+    with torch.no_grad():
+        env, *ctm_log= ctmrg.run(state, env.detach(), conv_check=ctmrg_conv_energy)
+        energy= energy_f(state, env).item()
+        obs_values, obs_labels= model.eval_obs(state, env, force_cpu=False)
+
+    result= dict({"energy": energy, "epochs": epochs[0], "ctm_steps0": ctm_steps0[0]}, \
+        **{l: float(abs(v)) for l,v in zip(obs_labels, obs_values)})
+    return state, env, result
+
+def main():
+    cfg.configure(args)
+    cfg.print_config()
+    p_start, p_stop, p_step= args.sweep_path
+    n_points= int(round((p_stop-p_start)/p_step))+1
+    points= [{args.sweep_param: round(p_start+i*p_step,12)} for i in range(n_points)]
+
+    records= run_sweep(partial(run_point, args), split_path(points, args.sweep_branches),\
+        n_workers=args.sweep_workers, out_file=args.out_prefix+"_sweep.dat")
+    print(", ".join([args.sweep_param,"energy","epochs"]))
+    for r in records:
+        print(", ".join([f"{r[args.sweep_param]}",f"{r['energy']}",f"{r['epochs']}"]))
+
+if __name__=='__main__':
+    if len(unknown_args)>0:
+        print("args not recognized: "+str(unknown_args))
+        raise Exception("Unknown command line arguments")
+    main()
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        args.sweep_path=[0.0, 0.5, 0.5]
+        args.bond_dim=2
+        args.chi=8
+        args.opt_max_iter=2
+        args.out_prefix="output"
+        args.sweep_branches=1
+        args.sweep_workers=1
+
+    def test_sweep_delta(self):
+        args.sweep_param="delta"
+        main()
+
+    def test_sweep_h(self):
+        args.sweep_param="h"
+        main()
@@ -229,3 +229,24 @@ class TestOpt(unittest.TestCase):
         args.OPTARGS_line_search="backtracking"
         args.OPTARGS_line_search_svd_method="SYMARP"
         main()
+
+    def test_sparse_elem_basis(self):
+        import os
+        infile= os.path.join(os.path.dirname(tenSU2.__file__), "D5.txt")
+        su2sym_t= tenSU2.import_sym_tensors_FIX(2,5,"A_1",infile=infile,\
+            dtype=torch.float64)
+        su2sym_t+= tenSU2.import_sym_tensors_FIX(2,5,"A_2",infile=infile,\
+            dtype=torch.float64)
+        coeffs= {(0,0): torch.rand(len(su2sym_t), dtype=torch.float64, requires_grad=True)}
+        state= IPEPS_LC_1SITE_PG(elem_tensors=su2sym_t, coeffs=coeffs)
+        ts= torch.stack([t if m["meta"]["pg"]=="A_1" else 1.0j*t for m,t in su2sym_t])
+        site_ref= torch.einsum('i,ipuldr->puldr', coeffs[(0,0)]*(1.0+0.j), ts)
+        self.assertTrue(torch.allclose(state.site(), site_ref))
+        g, = torch.autograd.grad(state.site().abs().pow(2).sum(), coeffs[(0,0)])
+        g_ref, = torch.autograd.grad(site_ref.abs().pow(2).sum(), coeffs[(0,0)])
+        self.assertTrue(torch.allclose(g, g_ref))
+
+        # sparse basis is reused across rebuilds of on-site tensor
+        basis= state._sparse_basis["site"][1]
+        state.sites= state.build_onsite_tensors()
+        self.assertIs(state._sparse_basis["site"][1], basis)
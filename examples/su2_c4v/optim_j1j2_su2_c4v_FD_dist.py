@@ -1,10 +1,11 @@
 import context
 import os
 import copy
+import contextlib
 import torch
 import argparse
 import config as cfg
-from su2sym.ipeps_su2 import *
+from ipeps.ipeps_lc import *
 from ctm.one_site_c4v.env_c4v import *
 from ctm.one_site_c4v import ctmrg_c4v
 from ctm.one_site_c4v.rdm_c4v import rdm2x1_sl
@@ -13,6 +14,7 @@ from models import j1j2
 import torch.multiprocessing as mp
 import torch.distributed as dist
 from optim.fd_optim_lbfgs_mod_distributed import optimize_state
+from optim.shared_broadcast import SharedBroadcast
 import su2sym.sym_ten_parser as tenSU2
 import time
 import json
@@ -131,10 +133,10 @@ def grad_fd_component(loss_fn, state, ctm_env, opt_args, ctm_args, loss0, \
             +f" timings {timings}\n")
 
         # 2) reset perturbation
-        state.coeffs[coeff_key].data.copy_(A_orig)
+        state.coeffs[coeff_key].copy_(A_orig)
     return grad_val
 
-def manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0):
+def manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0,shared=None):
     if size<2: raise RuntimeError(f"MANAGER {rank} requires at least one WORKER - size {size}")
     # assume full_grad has all tensors in shared memory
     # 1.1) tasks= [(coeff_key_id)x(local_grad_id)]
@@ -149,11 +151,12 @@ def manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0):
             dist.send( _terminate_worker, dst=i, tag=i )
         return 0
 
-    C_loc_cpu= ctm_env.get_C().cpu()
-    T_loc_cpu= ctm_env.get_T().cpu()
-    coeff_loc= state.coeffs[(0,0)].cpu()
-    loss0_t= torch.zeros(1, dtype=C_loc_cpu.dtype, device='cpu')
+    # 1.2) publish current state and environment to all workers at once
+    loss0_t= torch.zeros(1, dtype=state.dtype, device='cpu')
     loss0_t[0]= loss0
+    version= shared.publish(loss0=loss0_t, coeffs=state.coeffs[(0,0)].cpu(),\
+        C=ctm_env.get_C().cpu(), T=ctm_env.get_T().cpu())
+    log.info(f"MANAGER {rank} published loss0, state and env version {version}")
 
     # 2) Assuming every worker has the necessary tensors to perform 
     #    energy evaluation, issue the first set of gradient components to
@@ -168,17 +171,6 @@ def manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0):
         dist.send( tensor=grad_id, dst=i+1, tag=i+1 )
         numsent+=1
 
-        # 1) send energy to workers
-        log.info(f"MANAGER {rank} sending loss0 to rank {i+1} tag {3000*size+i+1}")
-        dist.send( tensor=loss0_t, dst=i+1, tag=3000*size+i+1 )
-        dist.send( tensor=coeff_loc, dst=i+1, tag=4000*size+i+1 )
-
-        # 1) send current evironment to workers
-        log.info(f"MANAGER {rank} sending C to rank {i+1} tag {1000*size+i+1}")
-        dist.send( tensor=C_loc_cpu, dst=i+1, tag=1000*size+i+1 )
-        log.info(f"MANAGER {rank} sending T to rank {i+1} tag {2000*size+i+1}")
-        dist.send( tensor=T_loc_cpu, dst=i+1, tag=2000*size+i+1 )
-
     # 3) receive gradient components back from workers
     log.info(f"MANAGER {rank} entering receiving stage")
     tmp_result= torch.zeros(3, dtype=state.dtype, device='cpu')
@@ -232,8 +224,8 @@ def worker_code(rank,size,gpu_id,pipe):
         return loss_functional(energy_f, state, ctm_env_in, opt_context)
 
     # get a local copy of initial state
-    state_json_str= pipe.recv()
-    state= from_json(state_json_str)
+    state_file= pipe.recv()
+    state= read_ipeps_lc_1site_pg(state_file)
     #log.info(
     loc_log.write(f"WORKER {rank} initial state {state.coeffs}\n")
 
@@ -241,9 +233,11 @@ def worker_code(rank,size,gpu_id,pipe):
     ctm_env = ENV_C4V(args.chi, state)
     init_env(state, ctm_env)
 
+    # map shared memory, into which the manager publishes current state and env
+    shared= pipe.recv()
+
     # main worker loop
     optimization_done=False
-    loss0= torch.zeros(1, dtype=state.dtype, device='cpu')
     grad_id= torch.zeros(2, dtype=torch.long, device='cpu')
     while not optimization_done:
         #log.info(
@@ -257,29 +251,22 @@ def worker_code(rank,size,gpu_id,pipe):
         #log.info(
         loc_log.write(f"WORKER {rank} received grad_id {grad_id}\n")
 
+        # map loss0, current state and (converged) env published by the manager.
+        # The coefficients are perturbed in-place, hence they are copied
+        ts= shared.get()
+        loss0= ts["loss0"]
         #log.info(
-        loc_log.write(f"WORKER {rank} waiting for loss0 tag {3000*size + rank}\n")
-        dist.recv( tensor=loss0, src=0, tag=3000*size + rank )
-        #log.info(
-        loc_log.write(f"WORKER {rank} received loss0 {loss0.item()} tag {3000*size + rank}\n")
-
-        # receive current state
-        coeff_loc= torch.zeros_like(state.coeffs[(0,0)], dtype=state.dtype, device='cpu')
-        dist.recv( tensor=coeff_loc, src=0, tag=4000*size + rank )
-
-        # receive current (converged) env
-        C_loc_cpu= torch.zeros_like(ctm_env.get_C(),device='cpu')
-        T_loc_cpu= torch.zeros_like(ctm_env.get_T(),device='cpu')
-        #log.info(
-        loc_log.write(f"WORKER {rank} wating for C,T tags {1000*size + rank},{2000*size + rank}\n")
-        dist.recv( tensor=C_loc_cpu, src=0, tag=1000*size + rank )
-        dist.recv( tensor=T_loc_cpu, src=0, tag=2000*size + rank )
+        loc_log.write(f"WORKER {rank} received loss0 {loss0.item()} version {shared.version}\n")
         if gpu_id>=0:
-            state.coeffs[(0,0)]= coeff_loc.to(cuda_dev)
-            ctm_env.C[ctm_env.keyC]= C_loc_cpu.to(cuda_dev)
-            ctm_env.T[ctm_env.keyT]= T_loc_cpu.to(cuda_dev)
+            state.coeffs[(0,0)]= ts["coeffs"].to(cuda_dev)
+            ctm_env.C[ctm_env.keyC]= ts["C"].to(cuda_dev)
+            ctm_env.T[ctm_env.keyT]= ts["T"].to(cuda_dev)
+        else:
+            state.coeffs[(0,0)]= ts["coeffs"].clone()
+            ctm_env.C[ctm_env.keyC]= ts["C"]
+            ctm_env.T[ctm_env.keyT]= ts["T"]
         #log.info(
-        loc_log.write(f"WORKER {rank} received C, T and moved to {cuda_dev}\n")
+        loc_log.write(f"WORKER {rank} mapped C, T and moved to {cuda_dev}\n")
         
         # 2) while there is a valid gradient component to compute
         #    execute energy computation
@@ -289,7 +276,7 @@ def worker_code(rank,size,gpu_id,pipe):
             loc_grad_id= grad_id[1]
 
             # 3) gradient evaluation forcing cuda_dev as default GPU
-            with torch.cuda.device(cuda_dev):
+            with torch.cuda.device(cuda_dev) if cuda_dev else contextlib.nullcontext():
                 # clone the env
                 env_clone= ctm_env.clone()
                 grad_val= grad_fd_component(loss_fn, state, env_clone, \
@@ -375,14 +362,20 @@ def main(rank, size, pipes_to_workers):
     print(state)
     # distribute current state to all workers (if there are any) 
     if len(pipes_to_workers)>0 and size>1:
-        state_json_str= to_json(state)
+        state_file= args.out_prefix+"_init_state.json"
+        write_ipeps_lc_1site_pg(state, state_file)
         for p in pipes_to_workers:
-            p.send(state_json_str)
+            p.send(state_file)
 
     # initialize environment
     ctm_env = ENV_C4V(args.chi, state)
     init_env(state, ctm_env)
 
+    # allocate shared memory for broadcast of current state and env to workers
+    shared= SharedBroadcast(loss0=torch.zeros(1, dtype=state.dtype),\
+        coeffs=state.coeffs[(0,0)], C=ctm_env.get_C(), T=ctm_env.get_T())
+    for p in pipes_to_workers: p.send(shared)
+
     # compute initial observables
     loss0 = energy_f(state, ctm_env, force_cpu=args.force_cpu)
     obs_values, obs_labels = model.eval_obs(state,ctm_env,force_cpu=args.force_cpu)
@@ -406,7 +399,7 @@ def main(rank, size, pipes_to_workers):
                 device='cpu')
 
         # invoke the manager to start sending out component computation jobs
-        status= manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0)
+        status= manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0,shared)
         
         # move full_grad to default device
         for k in state.coeffs.keys(): full_grad[k]= full_grad[k].to(state.device)
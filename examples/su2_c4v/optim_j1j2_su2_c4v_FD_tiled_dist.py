@@ -131,7 +131,7 @@ def grad_fd_component(loss_fn, state, ctm_env, opt_args, ctm_args, loss0, \
             +f" timings {timings}\n")
 
         # 2) reset perturbation
-        state.coeffs[coeff_key].data.copy_(A_orig)
+        state.coeffs[coeff_key].copy_(A_orig)
     return grad_val
 
 def manager_code(rank,size,state,ctm_env,tasks,full_grad,loss0):
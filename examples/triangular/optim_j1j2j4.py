@@ -203,7 +203,7 @@ def main():
 
         # 2) evaluate loss with the converged environment
         loss = energy_f(state_n, ctm_env_out, compressed=args.compressed_rdms,\
-            unroll=args.loop_rdms)
+            unroll=args.loop_rdms, ctm_args=ctm_args)
 
         return (loss, ctm_env_out, *ctm_log)
 
@@ -268,7 +268,7 @@ def main():
         state_g= IPEPS_WEIGHTED(state=state).gauge()
         state= state_g.absorb_weights()
     state.normalize_()
-    optimize_state(state, ctm_env, loss_fn, obs_fn=obs_fn)#, post_proc=post_proc)
+    optimize_state(state, ctm_env, loss_fn, obs_fn=obs_fn, loop_rdm=args.loop_rdms)#, post_proc=post_proc)
 
     # compute final observables for the best variational state
     outputstatefile= args.out_prefix+"_state.json"
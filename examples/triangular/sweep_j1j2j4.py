@@ -0,0 +1,144 @@
+import context
+import torch
+import argparse
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+from ctm.generic import ctmrg
+from models import spin_triangular
+from optim.ad_optim_lbfgs_mod import optimize_state
+from optim.sweep import split_path, run_sweep
+from functools import partial
+import unittest
+import logging
+log = logging.getLogger(__name__)
+
+# parse command line args and build necessary configuration objects
+parser= cfg.get_args_parser()
+# additional model-dependent arguments
+parser.add_argument("--j1", type=float, default=1., help="nearest-neighbour coupling")
+parser.add_argument("--j2", type=float, default=0., help="next nearest-neighbour coupling")
+parser.add_argument("--j4_path", type=float, nargs=3, default=[0., 0.2, 0.05],\
+    metavar=("START","STOP","STEP"), help="path of plaquette couplings (inclusive)")
+parser.add_argument("--sweep_branches", type=int, default=1, help="number of independent"\
+    +" branches of the path")
+parser.add_argument("--sweep_workers", type=int, default=1, help="number of worker processes")
+args, unknown_args = parser.parse_known_args()
+
+def lattice_to_site(coord):
+    vx = coord[0] % 3
+    vy = coord[1]
+    return ((vx - vy) % 3, 0)
+
+def run_point(args, params, state, env):
+    r"""
+    Optimizes 3SITE iPEPS for J1-J2-J4 model on triangular lattice at coupling ``params["j4"]``.
+    If ``state`` and ``env`` are given, the optimization starts from them instead of random
+    state and fresh environment. The handed-over environment is retained also within
+    the optimization, i.e. ``opt_args.opt_ctm_reinit`` is disabled.
+    """
+    # parsed arguments are passed explicitly, as spawned workers do not inherit them
+    cfg.configure(args)
+    cfg.main_args.out_prefix= f"{args.out_prefix}_j4{params['j4']}"
+    torch.set_num_threads(args.omp_cores)
+    torch.manual_seed(args.seed)
+
+    model= spin_triangular.J1J2J4(j1=args.j1, j2=args.j2, j4=params["j4"])
+    energy_f= model.energy_per_site
+
+    if state is None:
+        if args.instate!=None:
+            state = read_ipeps(args.instate, vertexToSite=lattice_to_site)
+            state.add_noise(args.instate_noise)
+        else:
+            sites= dict()
+            for c in [(0,0), (1,0), (2,0)]:
+                A = torch.rand((model.phys_dim,)+(args.bond_dim,)*4,\
+                    dtype=cfg.global_args.torch_dtype,device=cfg.global_args.device)-0.5
+                sites[c]= A/torch.max(torch.abs(A))
+            state = IPEPS(sites, vertexToSite=lattice_to_site, lX=3, lY=3)
+    ctm_steps0= []
+    if env is None:
+        env = ENV(args.chi, state)
+        init_env(state, env)
+    else:
+        # warm start from the environment converged at the previous point
+        cfg.opt_args.opt_ctm_reinit= False
+
+    @torch.no_grad()
+    def ctmrg_conv_energy(state, env, history, ctm_args=cfg.ctm_args):
+        if not history:
+            history=[]
+        e_curr= energy_f(state, env)
+        history.append(e_curr.item())
+
+        if (len(history) > 1 and abs(history[-1]-history[-2]) < ctm_args.ctm_conv_tol)\
+            or len(history) >= ctm_args.ctm_max_iter:
+            return True, history
+        return False, history
+
+    def loss_fn(state, ctm_env_in, opt_context):
+        ctm_args= opt_context["ctm_args"]
+        opt_args= opt_context["opt_args"]
+
+        # possibly re-initialize the environment
+        if opt_args.opt_ctm_reinit:
+            init_env(state, ctm_env_in)
+
+        ctm_env_out, history, *ctm_log= ctmrg.run(state, ctm_env_in, \
+             conv_check=ctmrg_conv_energy, ctm_args=ctm_args)
+        if not ctm_steps0: ctm_steps0.append(len(history))
+        loss = energy_f(state, ctm_env_out)
+        return (loss, ctm_env_out, history, *ctm_log)
+
+    epochs= [0]
+    @torch.no_grad()
+    def obs_fn(state, ctm_env, opt_context):
+        if not opt_context.get("line_search", False):
+            epochs[0]= len(opt_context["loss_history"]["loss"])
+
+    optimize_state(state, env, loss_fn, obs_fn=obs_fn)
+
+    # hand over the best state together with the environment converged for it,
+    # starting from the last environment of the optimization
+    state= read_ipeps(cfg.main_args.out_prefix+"_state.json", vertexToSite=lattice_to_site)
+    with torch.no_grad():
+        env, *ctm_log= ctmrg.run(state, env.detach(), conv_check=ctmrg_conv_energy)
+        energy= energy_f(state, env).item()
+        obs_values, obs_labels= model.eval_obs(state, env)
+
+    result= dict({"energy": energy, "epochs": epochs[0], "ctm_steps0": ctm_steps0[0]}, \
+        **{l: float(abs(v)) for l,v in zip(obs_labels, obs_values)})
+    return state, env, result
+
+def main():
+    cfg.configure(args)
+    cfg.print_config()
+    j4_start, j4_stop, j4_step= args.j4_path
+    n_points= int(round((j4_stop-j4_start)/j4_step))+1
+    points= [dict(j4=round(j4_start+i*j4_step,12)) for i in range(n_points)]
+
+    records= run_sweep(partial(run_point, args), split_path(points, args.sweep_branches),\
+        n_workers=args.sweep_workers, out_file=args.out_prefix+"_sweep.dat")
+    print(", ".join(["j4","energy","epochs"]))
+    for r in records:
+        print(", ".join([f"{r['j4']}",f"{r['energy']}",f"{r['epochs']}"]))
+
+if __name__=='__main__':
+    if len(unknown_args)>0:
+        print("args not recognized: "+str(unknown_args))
+        raise Exception("Unknown command line arguments")
+    main()
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        args.j4_path=[0.0, 0.1, 0.1]
+        args.bond_dim=2
+        args.chi=8
+        args.opt_max_iter=2
+        args.out_prefix="output"
+        args.sweep_branches=1
+        args.sweep_workers=1
+
+    def test_sweep_warm_start(self):
+        main()
@@ -267,7 +267,7 @@ def read_ipeps(jsonfile, vertexToSite=None, aux_seq=[0,1,2,3], peps_args=cfg.pep
     sites = OrderedDict()
 
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # check for presence of "aux_seq" field in jsonfile
         if "aux_ind_seq" in raw_state.keys():
@@ -288,7 +288,7 @@ def read_ipeps(jsonfile, vertexToSite=None, aux_seq=[0,1,2,3], peps_args=cfg.pep
 
             # depending on the "format", read the bare tensor
             if "format" in t.keys():
-                if t["format"]=="1D":
+                if t["format"] in ["1D","raw"]:
                     X= torch.from_numpy(read_bare_json_tensor_np(t))
             else:
                 # default
@@ -373,8 +373,8 @@ def _write_ipeps_json(state, aux_seq=[0,1,2,3], tol=1.0e-14, normalize=False,\
             # json_tensor["physDim"]= site.size(0)
             # assuming all auxBondDim are identical
             # json_tensor["auxDim"]= site.size(1)
-        elif global_args.tensor_io_format=="1D":
-            json_tensor= serialize_bare_tensor_np(site)
+        else:
+            json_tensor= serialize_bare_tensor(site, global_args.tensor_io_format)
 
         json_tensor["siteId"]=site_ids[-1]
         json_state["sites"].append(json_tensor)
@@ -415,8 +415,7 @@ def write_ipeps(state, outputfile, aux_seq=[0,1,2,3], tol=1.0e-14, normalize=Fal
     json_state= _write_ipeps_json(state, aux_seq=aux_seq, tol=tol, normalize=normalize,\
         peps_args=peps_args, global_args=global_args) 
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 
 class IPEPS_WEIGHTED(IPEPS):
@@ -745,7 +744,7 @@ def read_ipepo(jsonfile, vertexToSite=None, aux_seq=[0,1,2,3], peps_args=cfg.pep
     sites = OrderedDict()
 
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # check for presence of "aux_seq" field in jsonfile
         if "aux_ind_seq" in raw_state.keys():
@@ -766,7 +765,7 @@ def read_ipepo(jsonfile, vertexToSite=None, aux_seq=[0,1,2,3], peps_args=cfg.pep
 
             # depending on the "format", read the bare tensor
             if "format" in t.keys():
-                if t["format"]=="1D":
+                if t["format"] in ["1D","raw"]:
                     X= torch.from_numpy(read_bare_json_tensor_np(t))
             else:
                 # default
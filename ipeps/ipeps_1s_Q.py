@@ -158,7 +158,7 @@ def read_ipeps_1s_q(jsonfile, q=(0,0), vertexToSite=None, aux_seq=[0,1,2,3], pep
     
     # read q-vector
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
         try:
             q= torch.from_numpy(read_bare_json_tensor_np_legacy(raw_state["q"]))
         except Exception as e:
@@ -205,5 +205,4 @@ def write_ipeps_1s_q(state, outputfile, aux_seq=[0,1,2,3], tol=1.0e-14, normaliz
         peps_args=peps_args, global_args=global_args)
     json_state["q"]= serialize_bare_tensor_legacy(state.q)
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
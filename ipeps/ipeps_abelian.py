@@ -430,7 +430,7 @@ def read_ipeps(jsonfile, settings, vertexToSite=None, \
     sites = OrderedDict()
     
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # Loop over non-equivalent tensor,site pairs in the unit cell
         for ts in raw_state["map"]:
@@ -517,7 +517,8 @@ def write_ipeps(state, outputfile, tol=None, normalize=False, metadata=None,\
         site_ids.append(f"A{nid}")
         site_map.append(dict({"siteId": site_ids[-1], "x": coord[0], "y": coord[1]} ))
         
-        json_tensor= serialize_abelian_tensor_legacy(site)
+        json_tensor= serialize_abelian_tensor_legacy(site,\
+            tensor_io_format=global_args.tensor_io_format)
 
         json_tensor["siteId"]=site_ids[-1]
         json_state["sites"].append(json_tensor)
@@ -525,8 +526,7 @@ def write_ipeps(state, outputfile, tol=None, normalize=False, metadata=None,\
     json_state["siteIds"]=site_ids
     json_state["map"]=site_map
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '), cls=NumPy_Encoder)
+    write_json(json_state, outputfile, cls=NumPy_Encoder)
 
 
 class IPEPS_ABELIAN_WEIGHTED(IPEPS_ABELIAN):
@@ -184,7 +184,7 @@ def read_ipeps_c4v(jsonfile, settings, default_irrep=None,\
     sites = OrderedDict()
     
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # Loop over non-equivalent tensor,site pairs in the unit cell
         for ts in raw_state["map"]:
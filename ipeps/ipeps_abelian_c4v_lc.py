@@ -13,6 +13,7 @@ import yastn.yastn as yastn
 from groups.pg_abelian import make_c4v_symm_A1
 from ipeps.tensor_io import *
 from ipeps.ipeps_abelian_c4v import IPEPS_ABELIAN_C4V
+from ipeps.ipeps_lc import build_sparse_basis, contract_sparse_basis
 
 class IPEPS_ABELIAN_C4V_LC(IPEPS_ABELIAN_C4V):
 
@@ -63,10 +64,11 @@ class IPEPS_ABELIAN_C4V_LC(IPEPS_ABELIAN_C4V):
     def build_onsite_tensors(self, verbosity=0):
         if not self.abelian_sym_data or self.nsym==0:
             # assume a regular dense on-site tensor is requested
-            ts= torch.stack([t for m,t in self.elem_tensors])
+            ts= [t for m,t in self.elem_tensors]
+            basis= self._get_sparse_basis("dense", lambda: build_sparse_basis(ts))
             sites=dict()
             for coord,c in self.coeffs.items():
-                sites[coord]= torch.einsum('i,ipuldr->puldr',c,ts)
+                sites[coord]= contract_sparse_basis(basis, c, ts[0].size())
             
             site= yastn.Tensor(config=self.engine, s=IPEPS_ABELIAN_C4V._REF_S_DIRS)
             site.set_block(val=next(iter(sites.values())))
@@ -108,25 +110,43 @@ class IPEPS_ABELIAN_C4V_LC(IPEPS_ABELIAN_C4V):
             i0+=1
 
         # 2) build blocks
+        def _block_basis():
+            # for each charged block, sparse matrix with i-th column holding the elements
+            # of i-th elementary tensor within that block
+            rows, cols, vals= dict(), dict(), dict()
+            for i,meta_and_T in enumerate(self.elem_tensors):
+                m,T= meta_and_T
+                Tnz= torch.nonzero(T, as_tuple=False)
+                for row,val in zip(Tnz.tolist(), T[tuple(Tnz.t())]):
+                    # assign charges to values of indices: first index corresponds to physical leg
+                    c= tuple([oc_p[row[0]]]+[c_a[row[i]] for i in range(1,5)]) # charges
+                    # check if the charged block (key) exists in blocks
+                    if c not in rows:
+                        rows[c], cols[c], vals[c]= [], [], []
+                        if verbosity>0: print(f"Creating block c={c} of "\
+                            +f"D={[1]+[oc_d[_c] for _c in c[1:]]}")
+                    # map dense index_values to block index_values (physical dimension has 
+                    # always size 1) and flatten them
+                    iv_b= 0
+                    for v,_c in zip(row[1:], c[1:]): iv_b= iv_b*oc_d[_c] + a_map[v][1]
+                    rows[c].append(iv_b)
+                    cols[c].append(i)
+                    vals[c].append(val)
+                    if verbosity>0: print(f"elem {c},{tuple(row)} -> {iv_b} val {val}")
+            basis= dict()
+            for c in rows.keys():
+                size= [1]+[oc_d[_c] for _c in c[1:]]
+                # duplicate entries are summed up by coalescing
+                basis[c]= (torch.sparse_coo_tensor(torch.as_tensor([rows[c],cols[c]]),\
+                    torch.stack(vals[c]), size=(math.prod(size), len(self.elem_tensors)),\
+                    check_invariants=False).coalesce(), size)
+            return basis
+
         coeff= next(iter(self.coeffs.values()))
         blocks= dict()
-        for i,meta_and_T in enumerate(self.elem_tensors):
-            x= coeff[i]
-            m,T= meta_and_T
-            Tnz= torch.nonzero(T, as_tuple=False)
-            for row in Tnz:
-                # assign charges to values of indices: first index corresponds to physical leg
-                c= tuple([oc_p[row[0]]]+[c_a[row[i]] for i in range(1,5)]) # charges
-                iv= tuple(row.tolist())                                    # index_values
-                # check if the charged block (key) exists in blocks
-                if c not in blocks:
-                    blocks[c]= torch.zeros([1]+[oc_d[_c] for _c in c[1:]],
-                        dtype=cfg.global_args.torch_dtype, device=cfg.global_args.device)
-                    if verbosity>0: print(f"Creating block c={c} of D={blocks[c].shape}")
-                # map dense index_values to block index_values (physical dimension has always size 1)
-                iv_b= tuple([0]+[a_map[v][1] for v in iv[1:]])
-                blocks[c][iv_b]+= x*T[iv]
-                if verbosity>0: print(f"elem {c},{iv} -> {iv_b} val {x*T[iv]}")
+        for c,(basis,size) in self._get_sparse_basis("blocks", _block_basis).items():
+            blocks[c]= contract_sparse_basis(basis, coeff, size).to(\
+                dtype=cfg.global_args.torch_dtype, device=cfg.global_args.device)
 
         # 3) build on-site tensor cls._ref_s_dir,
         c_phys= set(oc_p) # charges on physical leg
@@ -140,6 +160,17 @@ class IPEPS_ABELIAN_C4V_LC(IPEPS_ABELIAN_C4V):
 
         return site
 
+    def _get_sparse_basis(self, key, build):
+        # elementary tensors are reorganized into sparse matrices only once and then 
+        # reused until any of them or the symmetry data changes
+        fingerprint= tuple((id(t), t._version) for m,t in self.elem_tensors)\
+            + (json.dumps(self.abelian_sym_data),)
+        if not hasattr(self, "_sparse_basis"): self._sparse_basis= dict()
+        if key not in self._sparse_basis or self._sparse_basis[key][0]!=fingerprint:
+            # hold the references to elementary tensors, so that their ids are not reused
+            self._sparse_basis[key]= (fingerprint, build(), tuple(self.elem_tensors))
+        return self._sparse_basis[key][1]
+
     def to(self, device):
         r"""
         :param device: device identifier
@@ -406,7 +437,7 @@ def read_ipeps_c4v_lc(jsonfile, settings, peps_args=cfg.peps_args,\
     dtype= global_args.torch_dtype
     
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
         state= deserialize_from_json(raw_state, settings, peps_args=peps_args,\
             global_args=global_args)
 
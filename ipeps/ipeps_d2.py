@@ -2,6 +2,7 @@ import torch
 import ipeps.ipeps as ipeps
 from groups.pg import make_d2_symm
 import config as cfg
+from ipeps.site_cache import cached_build
 
 class IPEPS_D2SYM(ipeps.IPEPS):
     def __init__(self, site=None, peps_args=cfg.peps_args,\
@@ -62,6 +63,7 @@ class IPEPS_D2SYM(ipeps.IPEPS):
         self.parent_site.requires_grad_(False)
         self.sites= self.build_onsite_tensors()
 
+    @cached_build("parent_site")
     def build_onsite_tensors(self):
         sites=dict()
         sites[(0,0)]=self.parent_site
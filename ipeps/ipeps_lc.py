@@ -6,6 +6,8 @@ import warnings
 import math
 import config as cfg
 import ipeps.ipeps as ipeps
+from ipeps.tensor_io import load_json, write_json
+from ipeps.site_cache import cached_build
 
 class IPEPS_LC(ipeps.IPEPS, ABC):
     
@@ -37,11 +39,33 @@ class IPEPS_LC(ipeps.IPEPS, ABC):
         """
         self.elem_tensors= elem_tensors
         self.coeffs= OrderedDict(coeffs)
+        self._sparse_basis= dict()
         sites= self.build_onsite_tensors()
 
         super().__init__(sites, vertexToSite=vertexToSite, peps_args=peps_args,\
             global_args=global_args)
 
+    def get_sparse_basis(self, key, ts, weights=None):
+        r"""
+        :param key: label of the set of elementary tensors
+        :param ts: elementary tensors
+        :param weights: scalars multiplying elementary tensors
+        :type key: str
+        :type ts: list[torch.Tensor]
+        :type weights: list[complex]
+        :return: elementary tensors as sparse matrix, see :meth:`build_sparse_basis`
+        :rtype: torch.Tensor
+
+        The sparse basis is built once and then reused by subsequent calls until any 
+        of the elementary tensors is replaced or modified in-place.
+        """
+        fingerprint= tuple((id(t), t._version) for t in ts)+tuple(weights or ())
+        if not hasattr(self, "_sparse_basis"): self._sparse_basis= dict()
+        if key not in self._sparse_basis or self._sparse_basis[key][0]!=fingerprint:
+            # hold the references to elementary tensors, so that their ids are not reused
+            self._sparse_basis[key]= (fingerprint, build_sparse_basis(ts, weights), tuple(ts))
+        return self._sparse_basis[key][1]
+
     @abstractmethod
     def get_parameters(self):
         pass
@@ -181,6 +205,7 @@ class IPEPS_LC_1SITE_PG(IPEPS_LC):
         self.pg_irreps= set([m["meta"]["pg"] for m,t in self.elem_tensors])
         self.sites= self.build_onsite_tensors()
 
+    @cached_build("coeffs", "elem_tensors")
     def build_onsite_tensors(self):
         r"""
         :return: sites
@@ -189,18 +214,20 @@ class IPEPS_LC_1SITE_PG(IPEPS_LC):
         Builds ``sites`` by combining elementary tensors.
         """
         if len(self.pg_irreps)==1 and self.pg_irreps==set(["A_1"]):
-            ts= torch.stack([t for m,t in self.elem_tensors])
+            ts= [t for m,t in self.elem_tensors]
+            weights= None
         elif len(self.pg_irreps)==2 and self.pg_irreps==set(["A_1","A_2"]):
             sym_t_A1= list(filter(lambda x: x[0]["meta"]["pg"]=="A_1", self.elem_tensors))
             sym_t_A2= list(filter(lambda x: x[0]["meta"]["pg"]=="A_2", self.elem_tensors))
-            ts= torch.stack( [t for m,t in sym_t_A1] + [ 1.0j*t for m,t in sym_t_A2] )
+            ts= [t for m,t in sym_t_A1] + [t for m,t in sym_t_A2]
+            weights= [1.0]*len(sym_t_A1) + [1.0j]*len(sym_t_A2)
         else:
             raise NotImplementedError("unexpected point group irrep "+str(self.pg_irreps))
 
+        basis= self.get_sparse_basis("site", ts, weights)
         sites=dict()
         for coord,c in self.coeffs.items():
-            if ts.is_complex(): c= c*(1.0+0.j)
-            sites[coord]= torch.einsum('i,ipuldr->puldr',c,ts)
+            sites[coord]= contract_sparse_basis(basis, c, ts[0].size())
 
         return sites
 
@@ -255,6 +282,46 @@ class IPEPS_LC_1SITE_PG(IPEPS_LC):
         else:
             raise RuntimeError(f"Unsupported device {device}")
 
+def build_sparse_basis(ts, weights=None):
+    r"""
+    :param ts: elementary tensors of identical shape
+    :param weights: scalars multiplying elementary tensors
+    :type ts: list[torch.Tensor]
+    :type weights: list[complex]
+    :return: sparse COO matrix of shape (numel, len(ts)) with i-th column holding 
+             flattened i-th elementary tensor
+    :rtype: torch.Tensor
+
+    The elementary tensors are typically mostly zero. Storing them as single sparse matrix
+    turns their linear combination, see :func:`contract_sparse_basis`, into sparse-dense
+    matrix-vector product.
+    """
+    rows, cols, vals= [], [], []
+    for i,t in enumerate(ts):
+        t= t.reshape(-1)
+        nz= t.nonzero(as_tuple=True)[0]
+        rows.append(nz)
+        cols.append(torch.full_like(nz, i))
+        vals.append(t[nz] if weights is None else weights[i]*t[nz])
+    basis= torch.sparse_coo_tensor(torch.stack([torch.cat(rows), torch.cat(cols)]),\
+        torch.cat(vals), size=(ts[0].numel(), len(ts)), check_invariants=False)
+    return basis.coalesce()
+
+def contract_sparse_basis(basis, c, size):
+    r"""
+    :param basis: elementary tensors as sparse matrix, see :func:`build_sparse_basis`
+    :param c: coefficients
+    :param size: shape of elementary tensors
+    :type basis: torch.Tensor
+    :type c: torch.Tensor
+    :type size: torch.Size
+    :return: linear combination :math:`\sum_i c_i t_i` of elementary tensors
+    :rtype: torch.Tensor
+    """
+    if basis.is_complex() and not c.is_complex(): c= c*(1.0+0.j)
+    if c.is_complex() and not basis.is_complex(): basis= basis.to(c.dtype)
+    return torch.sparse.mm(basis, c.unsqueeze(1)).view(size)
+
 def read_ipeps_lc_1site_pg(jsonfile, aux_seq=[0,1,2,3],\
     peps_args=cfg.peps_args, global_args=cfg.global_args):
     r"""
@@ -287,7 +354,7 @@ def read_ipeps_lc_1site_pg(jsonfile, aux_seq=[0,1,2,3],\
          3
     """
     with open(jsonfile) as j:
-        raw_state= json.load(j)
+        raw_state= load_json(j)
         state= from_json_str(json.dumps(raw_state), aux_seq=aux_seq,\
             peps_args=peps_args, global_args=global_args)
     return state
@@ -502,8 +569,7 @@ def write_ipeps_lc_1site_pg(state, outputfile, aux_seq=[0,1,2,3], tol=1.0e-14, n
     json_state["siteIds"]=site_ids
     json_state["map"]=site_map
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 # TODO make consistent with class method
 def load_checkpoint_lc_1site_pg(checkpoint_file, vertexToSite=None, lX=None, lY=None,\
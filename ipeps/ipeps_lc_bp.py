@@ -4,7 +4,9 @@ import json
 import warnings
 import math
 import config as cfg
-from ipeps.ipeps_lc import IPEPS_LC
+from ipeps.ipeps_lc import IPEPS_LC, contract_sparse_basis
+from ipeps.tensor_io import load_json, write_json
+from ipeps.site_cache import cached_build, contract
 
 
 class IPEPS_LC_BP(IPEPS_LC):
@@ -99,28 +101,32 @@ class IPEPS_LC_BP(IPEPS_LC):
         self.pg_irreps= set([m["meta"]["pg"] for m,t in self.elem_tensors])
         self.sites= self.build_onsite_tensors()
 
+    @cached_build("coeffs", "elem_tensors")
     def build_onsite_tensors(self):
         # check presence of "A_2" irrep
         if len(self.pg_irreps)==1 and self.pg_irreps==set(["A_1"]):
-            ts= torch.stack([t for m,t in self.elem_tensors["site"]])
+            ts= [t for m,t in self.elem_tensors["site"]]
+            weights= None
         elif len(self.pg_irreps)==2 and self.pg_irreps==set(["A_1","A_2"]):
             sym_t_A1= list(filter(lambda x: x[0]["meta"]["pg"]=="A_1", self.elem_tensors["site"]))
             sym_t_A2= list(filter(lambda x: x[0]["meta"]["pg"]=="A_2", self.elem_tensors["site"]))
-            ts= torch.stack( [t for m,t in sym_t_A1] + [ 1.0j*t for m,t in sym_t_A2] )
+            ts= [t for m,t in sym_t_A1] + [t for m,t in sym_t_A2]
+            weights= [1.0]*len(sym_t_A1) + [1.0j]*len(sym_t_A2)
         else:
             raise NotImplementedError("unexpected point group irrep "+str(self.pg_irreps))
 
-        ts_b= torch.stack([t for m,t in self.elem_tensors["bond"]])
+        ts_b= [t for m,t in self.elem_tensors["bond"]]
 
         sites=dict()
         c_A= self.coeffs["site"]
         c_b= self.coeffs["bond"]
-        if ts.is_complex(): 
+        if weights is not None: 
             c_A= c_A*(1.0+0.j)
             c_b= c_b*(1.0+0.j)
-        sites[(0,0)]= torch.einsum('i,ipuldr->puldr',c_A,ts)
+        sites[(0,0)]= contract_sparse_basis(self.get_sparse_basis("site", ts, weights),\
+            c_A, ts[0].size())
         
-        b_T= torch.einsum('i,ilr->lr',c_b,ts_b)
+        b_T= contract_sparse_basis(self.get_sparse_basis("bond", ts_b), c_b, ts_b[0].size())
         #
         #        |
         #       b_T
@@ -130,7 +136,7 @@ class IPEPS_LC_BP(IPEPS_LC):
         #       b_T
         #        |
         #
-        sites[(1,0)]= torch.einsum('um,ln,dx,ry,pmnxy->puldr',b_T,b_T,b_T,b_T,sites[(0,0)])
+        sites[(1,0)]= contract('um,ln,dx,ry,pmnxy->puldr',b_T,b_T,b_T,b_T,sites[(0,0)])
         sites[(1,0)]= sites[(1,0)].contiguous()
 
         return sites
@@ -194,7 +200,7 @@ def read_ipeps_lc_bp(jsonfile, aux_seq=[0,1,2,3],\
     sites = OrderedDict()
     
     with open(jsonfile) as j:
-        raw_state= json.load(j)
+        raw_state= load_json(j)
 
         # check for presence of "aux_seq" field in jsonfile
         if "aux_ind_seq" in raw_state.keys():
@@ -388,8 +394,7 @@ def write_ipeps_lc_bp(state, outputfile, aux_seq=[0,1,2,3], tol=1.0e-14, normali
         json_tensor["entries"]=entries
         json_state["coeffs"][nid]=json_tensor
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 # TODO make consistent with class method
 def load_checkpoint_lc_1site_pg(checkpoint_file, vertexToSite=None, lX=None, lY=None,\
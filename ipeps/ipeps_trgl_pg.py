@@ -5,6 +5,7 @@ import math
 import config as cfg
 import ipeps.ipeps as ipeps
 from ipeps.tensor_io import *
+from ipeps.site_cache import cached_build, contract
 
 class IPEPS_TRGL_1S_TTPHYS_PG(ipeps.IPEPS):
     PG_A1= {'t_aux': 'A_1', 't_phys': 'A_1'}
@@ -75,6 +76,7 @@ class IPEPS_TRGL_1S_TTPHYS_PG(ipeps.IPEPS):
         write_ipeps_trgl_1s_ttphys_pg(self,outputfile,tol=tol, normalize=normalize,\
             pg_symmetrize=pg_symmetrize)
 
+    @cached_build("elem_tensors")
     def build_onsite_tensors(self):
         return {(0,0): torch.einsum('ldx,xurp->puldr',self.elem_tensors['t_aux'],\
             self.elem_tensors['t_phys']).contiguous()}
@@ -173,13 +175,12 @@ def write_ipeps_trgl_1s_ttphys_pg(state, outputfile, tol=1.0e-14, normalize=Fals
             # json_tensor["physDim"]= site.size(0)
             # assuming all auxBondDim are identical
             # json_tensor["auxDim"]= site.size(1)
-        elif global_args.tensor_io_format=="1D":
-            json_tensor= serialize_bare_tensor_np(t)
+        else:
+            json_tensor= serialize_bare_tensor(t, global_args.tensor_io_format)
 
         json_state["elem_tensors"][t_id]= json_tensor
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 def read_ipeps_trgl_1s_ttphys_pg(jsonfile, \
     peps_args=cfg.peps_args, global_args=cfg.global_args):
@@ -197,7 +198,7 @@ def read_ipeps_trgl_1s_ttphys_pg(jsonfile, \
     """
     WARN_REAL_TO_COMPLEX=False
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         assert "elem_tensors" in raw_state.keys(), "Missing elem_tensors."
         raw_elem_t= raw_state["elem_tensors"]
@@ -212,7 +213,7 @@ def read_ipeps_trgl_1s_ttphys_pg(jsonfile, \
 
             # depending on the "format", read the bare tensor
             if "format" in t.keys():
-                if t["format"]=="1D":
+                if t["format"] in ["1D","raw"]:
                     X= torch.from_numpy(read_bare_json_tensor_np(t))
             else:
                 # default
@@ -303,8 +304,9 @@ class IPEPS_TRGL_1S_TBT_PG(ipeps.IPEPS):
         write_ipeps_trgl_1s_pg(self,outputfile,tol=tol, normalize=normalize,\
             pg_symmetrize=pg_symmetrize)
 
+    @cached_build("elem_tensors")
     def build_onsite_tensors(self):
-        return {(0,0): torch.einsum('ldx,xyp,yur->puldr',self.elem_tensors['t_aux'],\
+        return {(0,0): contract('ldx,xyp,yur->puldr',self.elem_tensors['t_aux'],\
             self.elem_tensors['t_phys'],self.elem_tensors['t_aux']).contiguous()}
 
     def add_noise(self,noise):
@@ -410,7 +412,7 @@ def read_ipeps_trgl_1s_tbt_pg(jsonfile, peps_args=cfg.peps_args, global_args=cfg
     WARN_REAL_TO_COMPLEX=False
 
     with open(jsonfile) as j:
-        raw_state = json.load(j) 
+        raw_state = load_json(j) 
 
         assert "pgs" in raw_state.keys(),"Missing point-group specification \"pgs\""
         pgs= raw_state["pgs"]
@@ -421,7 +423,7 @@ def read_ipeps_trgl_1s_tbt_pg(jsonfile, peps_args=cfg.peps_args, global_args=cfg
 
             # depending on the "format", read the bare tensor
             if "format" in t.keys():
-                if t["format"]=="1D":
+                if t["format"] in ["1D","raw"]:
                     X= torch.from_numpy(read_bare_json_tensor_np(t))
             else:
                 # default
@@ -465,10 +467,9 @@ def write_ipeps_trgl_1s_tbt_pg(state, outputfile, tol=1.0e-14, normalize=False,\
         
         if global_args.tensor_io_format=="legacy":
             json_tensor= serialize_bare_tensor_legacy(t)
-        elif global_args.tensor_io_format=="1D":
-            json_tensor= serialize_bare_tensor_np(t)
+        else:
+            json_tensor= serialize_bare_tensor(t, global_args.tensor_io_format)
 
         json_state["elem_tensors"][t_id]= json_tensor
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
\ No newline at end of file
+    write_json(json_state, outputfile)
\ No newline at end of file
@@ -5,6 +5,7 @@ import math
 import config as cfg
 from ipeps.ipeps_kagome import IPEPS_KAGOME
 from ipeps.tensor_io import *
+from ipeps.site_cache import cached_build, contract
 
 class IPESS_KAGOME_GENERIC(IPEPS_KAGOME):
     def __init__(self, ipess_tensors,
@@ -116,6 +117,7 @@ class IPESS_KAGOME_GENERIC(IPEPS_KAGOME):
         for t in self.ipess_tensors.values(): t.requires_grad_(False)
         self.sites = self.build_onsite_tensors()
 
+    @cached_build("ipess_tensors")
     def build_onsite_tensors(self):
         r"""
         :return: elementary unit cell of underlying IPEPS
@@ -123,7 +125,7 @@ class IPESS_KAGOME_GENERIC(IPEPS_KAGOME):
 
         Build rank-5 on-site tensor by contracting the iPESS tensors.
         """
-        A= torch.einsum('iab,uji,jkl,vkc,wld->uvwabcd', self.ipess_tensors['T_u'],
+        A= contract('iab,uji,jkl,vkc,wld->uvwabcd', self.ipess_tensors['T_u'],
             self.ipess_tensors['B_c'], self.ipess_tensors['T_d'], self.ipess_tensors['B_b'], \
             self.ipess_tensors['B_a'])
         total_phys_dim= self.ipess_tensors['B_a'].size(0)*self.ipess_tensors['B_b'].size(0)\
@@ -209,7 +211,7 @@ def read_ipess_kagome_generic(jsonfile, peps_args=cfg.peps_args, global_args=cfg
     dtype = global_args.torch_dtype
 
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # Loop over non-equivalent tensor,coeffs pairs in the unit cell
         ipess_tensors= OrderedDict()
@@ -258,10 +260,9 @@ def write_ipess_kagome_generic(state, outputfile, tol=1.0e-14, normalize=False):
     # write list of considered elementary tensors
     for key, t in state.ipess_tensors.items():
         tmp_t= t/t.abs().max() if normalize else t
-        json_state["ipess_tensors"][key]= serialize_bare_tensor_legacy(tmp_t)
+        json_state["ipess_tensors"][key]= serialize_bare_tensor(tmp_t, cfg.global_args.tensor_io_format)
 
-    with open(outputfile, 'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 def read_ipess_kagome_generic_legacy(jsonfile, ansatz="IPESS", peps_args=cfg.peps_args,\
     global_args=cfg.global_args):
@@ -299,7 +300,7 @@ def read_ipess_kagome_generic_legacy(jsonfile, ansatz="IPESS", peps_args=cfg.pep
     dtype = global_args.torch_dtype
 
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # Loop over non-equivalent tensor,coeffs pairs in the unit cell
         ipess_tensors= OrderedDict()
@@ -315,7 +316,7 @@ def read_ipess_kagome_generic_legacy(jsonfile, ansatz="IPESS", peps_args=cfg.pep
                 raise Exception("Tensor with siteId: "+ts["sideId"]+" NOT FOUND in \"sites\"")
 
             if "format" in t.keys():
-                if t["format"] == "1D":
+                if t["format"] in ["1D", "raw"]:
                     X = torch.from_numpy(read_bare_json_tensor_np(t))
             else:
                 # default
@@ -657,7 +658,7 @@ def read_ipess_kagome_pg(jsonfile, peps_args=cfg.peps_args, global_args=cfg.glob
     dtype = global_args.torch_dtype
 
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         SYM_UP_DOWN= True
         if "SYM_UP_DOWN" in raw_state.keys(): SYM_UP_DOWN= raw_state["SYM_UP_DOWN"]
@@ -744,10 +745,9 @@ def write_ipess_kagome_pg(state, outputfile, tol=1.0e-14, normalize=False, pg_sy
     # write list of considered elementary tensors
     for key, t in sym_state.elem_tensors.items():
         tmp_t= t/t.abs().max() if normalize else t
-        json_state["elem_tensors"][key]= serialize_bare_tensor_legacy(tmp_t)
+        json_state["elem_tensors"][key]= serialize_bare_tensor(tmp_t, cfg.global_args.tensor_io_format)
 
-    with open(outputfile, 'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 
 class IPESS_KAGOME_PG_LC(IPESS_KAGOME_PG):
@@ -994,8 +994,7 @@ def write_ipess_kagome_pg_lc(state, outputfile, tol=1.0e-14, normalize=False):
             tmp_t= tmp_t/tmp_t.abs().max()
         json_state["coeffs"][k]= serialize_basis_t(None, tmp_t)
 
-    with open(outputfile,'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '))
+    write_json(json_state, outputfile)
 
 def read_ipess_kagome_pg_lc(jsonfile, peps_args=cfg.peps_args, global_args=cfg.global_args):
     r"""
@@ -1011,7 +1010,7 @@ def read_ipess_kagome_pg_lc(jsonfile, peps_args=cfg.peps_args, global_args=cfg.g
     Read IPESS_KAGOME_PG_LC state from file.
     """
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         SYM_UP_DOWN= True
         if "SYM_UP_DOWN" in raw_state.keys(): 
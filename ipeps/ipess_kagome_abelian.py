@@ -321,7 +321,7 @@ def read_ipess_kagome_generic(jsonfile, settings, peps_args=cfg.peps_args,\
     Read IPESS_KAGOME_GENERIC_ABELIAN from file.
     """
     with open(jsonfile) as j:
-        raw_state = json.load(j)
+        raw_state = load_json(j)
 
         # Loop over non-equivalent tensor,coeffs pairs in the unit cell
         ipess_tensors= OrderedDict()
@@ -365,7 +365,7 @@ def write_ipess_kagome_generic(state, outputfile, tol=None, normalize=False,\
     # write list of considered elementary tensors
     for key, t in state.ipess_tensors.items():
         tmp_t= t/t.norm(p='inf') if normalize else t
-        json_state["ipess_tensors"][key]= serialize_abelian_tensor_legacy(tmp_t)
+        json_state["ipess_tensors"][key]= serialize_abelian_tensor_legacy(tmp_t,\
+            tensor_io_format=global_args.tensor_io_format)
 
-    with open(outputfile, 'w') as f:
-        json.dump(json_state, f, indent=4, separators=(',', ': '), cls=NumPy_Encoder)
\ No newline at end of file
+    write_json(json_state, outputfile, cls=NumPy_Encoder)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import functools
+import torch
+import opt_einsum as oe
+
+def _tensors(x):
+    # tensors held in (possibly nested) dicts, lists and tuples
+    if isinstance(x, torch.Tensor):
+        yield x
+    elif isinstance(x, dict):
+        for v in x.values(): yield from _tensors(v)
+    elif isinstance(x, (list, tuple)):
+        for v in x: yield from _tensors(v)
+
+def _fingerprint(state, attrs):
+    inputs= tuple(t for a in attrs for t in _tensors(getattr(state, a, None)))
+    needs_grad= torch.is_grad_enabled() and any(t.requires_grad for t in inputs)
+    return inputs, tuple((id(t), t._version) for t in inputs), needs_grad
+
+def _is_valid(entry, fingerprint, needs_grad):
+    # tensors built without autograd graph cannot be reused when gradient is required
+    return entry is not None and entry["fingerprint"]==fingerprint \
+        and (entry["grad"] or not needs_grad)
+
+def cached_build(*attrs):
+    r"""
+    :param attrs: names of members holding tensors, possibly within nested dicts, lists
+                  and tuples, from which the result is derived
+    :type attrs: str
+
+    Decorator of methods such as ``build_onsite_tensors``, which derive dict of tensors
+    from members ``attrs`` of the state. The result is cached and the method is
+    re-evaluated only if any of the tensors in ``attrs`` is replaced or modified in-place,
+    as detected by their version counters. Modifications through ``.data``
+    are not detected.
+
+    The cached result is reused in autograd-enabled context only if it has been built
+    with autograd graph. Once the gradient is back-propagated through any of the cached
+    tensors, and hence their graph is released, the result is rebuilt on the next call
+    requiring gradient.
+    """
+    def decorator(build):
+        name= build.__name__
+
+        @functools.wraps(build)
+        def wrapper(self, *args, **kwargs):
+            inputs, fingerprint, needs_grad= _fingerprint(self, attrs)
+            cache= self.__dict__.setdefault("_build_cache", dict())
+            if not args and not kwargs and _is_valid(cache.get(name), fingerprint, needs_grad):
+                return type(cache[name]["result"])(cache[name]["result"])
+
+            result= build(self, *args, **kwargs)
+            if name in cache:
+                for h in cache[name]["hooks"]: h.remove()
+            # hold the references to inputs, so that their ids are not reused
+            entry= {"fingerprint": fingerprint, "grad": needs_grad, "result": result,\
+                "attrs": attrs, "inputs": inputs, "hooks": []}
+            if needs_grad:
+                def invalidate(grad):
+                    # the graph is released, yet the values remain valid without autograd
+                    entry["grad"]= False
+                for t in result.values():
+                    if isinstance(t, torch.Tensor) and t.grad_fn is not None:
+                        entry["hooks"].append(t.register_hook(invalidate))
+            cache[name]= entry
+            return type(result)(result)
+        return wrapper
+    return decorator
+
+def refresh_sites(state):
+    r"""
+    :param state: wavefunction
+    :type state: IPEPS
+
+    If on-site tensors of ``state`` are built by method ``build_onsite_tensors`` decorated
+    with :func:`cached_build` and any of the tensors they are derived from has changed,
+    rebuild them. Otherwise, ``state.sites`` are left untouched.
+
+    Invoked once at the start of CTM, see :func:`ctm.generic.ctmrg.run`,
+    instead of on every access to on-site tensors.
+    """
+    entry= state.__dict__.get("_build_cache", dict()).get("build_onsite_tensors")
+    if entry is None: return
+    inputs, fingerprint, needs_grad= _fingerprint(state, entry["attrs"])
+    if not _is_valid(entry, fingerprint, needs_grad):
+        state.sites= state.build_onsite_tensors()
+
+@functools.lru_cache(maxsize=128)
+def _contract_expression(subscripts, *shapes):
+    return oe.contract_expression(subscripts, *shapes, optimize='optimal')
+
+def contract(subscripts, *operands):
+    r"""
+    :param subscripts: contraction in einsum format
+    :param operands: tensors to contract
+    :type subscripts: str
+    :type operands: torch.Tensor
+    :return: result of the contraction
+    :rtype: torch.Tensor
+
+    Contract small networks, such as those building on-site tensors from elementary
+    tensors, along the optimal path. The path is found once for each combination
+    of ``subscripts`` and shapes of ``operands``.
+    """
+    return _contract_expression(subscripts, *(tuple(t.shape) for t in operands))(\
+        *operands, backend='torch')
@@ -1,11 +1,13 @@
+import os
 import warnings
 from itertools import product
 import json
+import hashlib
+import secrets
+import stat
 import numpy as np
-try:
-    import yastn.yastn as yastn
-except ImportError as e:
-    warnings.warn("yast not available", Warning)
+from config import _lazy_import
+yastn= _lazy_import("yastn.yastn", "yast not available")
 try:
     import torch
 except ImportError as e:
@@ -47,6 +49,10 @@ def read_bare_json_tensor_np(json_obj):
     dims= json_obj["dims"]
     raw_data= json_obj["data"]
 
+    # raw tensor already mapped from the binary container, see load_json
+    if json_obj.get("format",None)=="raw":
+        return raw_data.reshape(dims)
+
     # convert raw_data list[str] into list[dtype]
     if "complex" in dtype_str:
         raw_data= np.asarray(raw_data, dtype=np.complex128)
@@ -56,6 +62,9 @@ def read_bare_json_tensor_np(json_obj):
     return raw_data.reshape(dims)
 
 def read_bare_json_tensor_np_legacy(json_obj):
+    # tensors written with tensor_io_format "1D" or "raw", see serialize_bare_tensor
+    if json_obj.get("format",None) in ["1D", "raw"]:
+        return read_bare_json_tensor_np(json_obj)
     t= json_obj
     # 0) find dtype, else assume float64
     dtype_str= json_obj["dtype"].lower() if "dtype" in t.keys() else "float64"
@@ -77,6 +86,8 @@ def read_bare_json_tensor_np_legacy(json_obj):
     # 
     # index (integer) of physDim, left, up, right, down, (float) Re, Im
     #                             (or generic auxilliary inds ...)  
+    if _fill_entries_np(X, t["entries"]):
+        return X
     if dtype_str=="complex128":
         for entry in t["entries"]:
             l = entry.split()
@@ -89,6 +100,35 @@ def read_bare_json_tensor_np_legacy(json_obj):
     
     return X
 
+def _fill_entries_np(X, entries):
+    r"""
+    Vectorized counterpart of the loops over ``entries`` in 
+    :meth:`read_bare_json_tensor_np_legacy`. All entries are tokenized at once and scattered
+    into zero-initialized ``X`` by a single assignment. As in the loops, the real elements
+    are accumulated over repeated indices, while for complex elements the last one is kept.
+
+    Returns ``False`` if ``entries`` do not form a regular table with one (real)
+    or two (real and imaginary part) values per entry, leaving ``X`` untouched.
+    """
+    if len(entries)==0:
+        return True
+    try:
+        data= np.loadtxt(entries, dtype=np.float64, ndmin=2, comments=None)
+    except ValueError:
+        return False
+    k= data.shape[1]-X.ndim
+    if not (k==2 or (k==1 and not np.iscomplexobj(X))):
+        return False
+    inds= data[:,:X.ndim].astype(np.intp)
+    if np.any(inds!=data[:,:X.ndim]) or np.any(inds<0) or np.any(inds>=X.shape):
+        return False
+    flat_inds= np.ravel_multi_index(inds.T, X.shape)
+    if np.iscomplexobj(X):
+        X.reshape(-1)[flat_inds]= data[:,-2]+data[:,-1]*1.0j
+    else:
+        X+= np.bincount(flat_inds, weights=data[:,-k], minlength=X.size).reshape(X.shape)
+    return True
+
 # assume abelian block as JSON object is composed of bare tensor
 # with additional charge data
 # 
@@ -245,7 +285,52 @@ def serialize_bare_tensor_legacy(t):
     json_tensor["entries"]=entries
     return json_tensor
 
-def serialize_abelian_tensor_legacy(t, native=False):
+def serialize_bare_tensor_raw(t):
+    r"""
+    Parameters
+    ----------
+    t: torch.tensor
+
+    Returns
+    -------
+    json_tensor: dict
+
+        JSON-compliant representation of torch.tensor, with elements held 
+        as little-endian numpy.ndarray to be stored in binary container by :meth:`write_json`
+    """
+    json_tensor=dict()
+
+    data= t.detach().cpu().resolve_conj().contiguous().numpy()
+    json_tensor["format"]= "raw"
+    json_tensor["dtype"]= f"{data.dtype}"
+    json_tensor["dims"]= list(data.shape)
+    json_tensor["data"]= data.astype(data.dtype.newbyteorder('<'), copy=False)
+    return json_tensor
+
+def serialize_bare_tensor(t, tensor_io_format="legacy"):
+    r"""
+    Parameters
+    ----------
+    t: torch.tensor
+
+    tensor_io_format: str
+        one of ``"legacy"``, ``"1D"`` or ``"raw"``
+
+    Returns
+    -------
+    json_tensor: dict
+
+        JSON-compliant representation of torch.tensor in selected format
+    """
+    if tensor_io_format=="legacy":
+        return serialize_bare_tensor_legacy(t)
+    elif tensor_io_format=="1D":
+        return serialize_bare_tensor_np(t)
+    elif tensor_io_format=="raw":
+        return serialize_bare_tensor_raw(t)
+    raise ValueError(f"Unsupported tensor_io_format: {tensor_io_format}")
+
+def serialize_abelian_tensor_legacy(t, native=False, tensor_io_format="legacy"):
     r"""
     Parameters
     ----------
@@ -254,6 +339,9 @@ def serialize_abelian_tensor_legacy(t, native=False):
     native: bool
         if True serialize tensor with all legs unfused
 
+    tensor_io_format: str
+        format of blocks, see :meth:`serialize_bare_tensor`
+
     Returns
     -------
     json_tensor: dict
@@ -278,13 +366,196 @@ def serialize_abelian_tensor_legacy(t, native=False):
 
     json_tensor["blocks"]= []
     for k,D in zip(t.struct.t,t.struct.D):
-        json_block= serialize_bare_tensor_legacy(t[k])
+        json_block= serialize_bare_tensor(t[k], tensor_io_format)
         json_block["charges"]= k
         json_tensor["blocks"].append(json_block)
 
     return json_tensor
 
 
+# binary container holding JSON header followed by raw little-endian arrays
+#
+#   magic (8 bytes) | length of header (uint64) | header (utf-8 JSON) | arrays
+#
+# The header is an ordinary JSON object, in which tensors are represented by
+# JSON objects
+#
+#      key type content
+# i)   format [str] "raw"
+# ii)  dtype  [str] datatype
+# iii) dims   [list[int]] integer array of dimensions
+# iv)  offset [int] position of the array in bytes, relative to the end of header
+#
+# Each array starts at offset aligned to RAW_ALIGN bytes. On read, the arrays are
+# memory-mapped (copy-on-write), i.e. they are loaded lazily from the file.
+#
+RAW_MAGIC= b"PTRAW\x00\x00\x01"
+RAW_ALIGN= 64
+
+def _raw_records(json_obj):
+    if isinstance(json_obj, dict):
+        if json_obj.get("format",None)=="raw":
+            yield json_obj
+        else:
+            for v in json_obj.values(): yield from _raw_records(v)
+    elif isinstance(json_obj, list):
+        for v in json_obj: yield from _raw_records(v)
+
+def _aligned(n):
+    return -(-n//RAW_ALIGN)*RAW_ALIGN
+
+def _open_tmp(outputfile):
+    # unlike tempfile.mkstemp, which creates the file with mode 0600, create the file 
+    # with mode 0666 subject to the umask, as open() does. The mode of existing 
+    # outputfile is preserved
+    dirname, basename= os.path.split(os.path.abspath(outputfile))
+    flags= os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        tmp_file= os.path.join(dirname, f".{basename}.{secrets.token_hex(4)}.tmp")
+        try:
+            fd= os.open(tmp_file, flags, 0o666)
+            break
+        except FileExistsError:
+            continue
+    if os.path.exists(outputfile):
+        os.chmod(tmp_file, stat.S_IMODE(os.stat(outputfile).st_mode))
+    return fd, tmp_file
+
+def write_json(json_obj, outputfile, **kwargs):
+    r"""
+    :param json_obj: JSON-compliant representation of the state
+    :param outputfile: target file
+    :param kwargs: passed to ``json.dump``
+    :type json_obj: dict
+    :type outputfile: str or Path object
+
+    Write out ``json_obj`` as JSON file. If it holds any tensors serialized 
+    by :meth:`serialize_bare_tensor_raw`, a binary container of JSON header 
+    and raw arrays is written instead. The container is first written to a temporary 
+    file, which then replaces ``outputfile``. Hence, the arrays memory-mapped 
+    from previous version of ``outputfile`` remain valid.
+    """
+    records= list(_raw_records(json_obj))
+    if len(records)==0:
+        with open(outputfile,'w') as f:
+            json.dump(json_obj, f, indent=4, separators=(',', ': '), **kwargs)
+        return
+
+    arrays, offset= [], 0
+    for r in records:
+        arrays.append((offset, r.pop("data")))
+        r["offset"]= offset
+        offset= _aligned(offset+arrays[-1][1].nbytes)
+    try:
+        header= json.dumps(json_obj, separators=(',', ':'), **kwargs).encode("utf-8")
+    finally:
+        for r,(o,a) in zip(records,arrays):
+            del r["offset"]
+            r["data"]= a
+    header+= b" "*(_aligned(len(RAW_MAGIC)+8+len(header))-len(RAW_MAGIC)-8-len(header))
+
+    fd, tmp_file= _open_tmp(outputfile)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(RAW_MAGIC)
+            f.write(np.uint64(len(header)).astype('<u8').tobytes())
+            f.write(header)
+            start= f.tell()
+            for o,a in arrays:
+                f.seek(start+o)
+                f.write(a.tobytes())
+        os.replace(tmp_file, outputfile)
+    except BaseException:
+        if os.path.exists(tmp_file): os.remove(tmp_file)
+        raise
+
+def load_json(f):
+    r"""
+    :param f: opened JSON file or binary container written by :meth:`write_json`
+    :type f: file object
+    :return: parsed JSON object 
+    :rtype: dict
+
+    Counterpart of ``json.load``, which in addition reads binary containers.
+    The arrays of the container are memory-mapped and passed under the key ``"data"``
+    of their JSON object, see :meth:`read_bare_json_tensor_np`.
+    """
+    buf= getattr(f, "buffer", None)
+    if buf is None or not hasattr(buf, "peek") or buf.peek(len(RAW_MAGIC))[:len(RAW_MAGIC)]!=RAW_MAGIC:
+        return json.load(f)
+
+    buf.read(len(RAW_MAGIC))
+    len_header= int(np.frombuffer(buf.read(8), dtype='<u8')[0])
+    json_obj= json.loads(buf.read(len_header).decode("utf-8"))
+    start= len(RAW_MAGIC)+8+len_header
+    for r in _raw_records(json_obj):
+        dtype= np.dtype(r["dtype"].lower()).newbyteorder('<')
+        shape= tuple(r["dims"])
+        offset= start+r.pop("offset")
+        if np.prod(shape, dtype=np.int64)==0:
+            data= np.zeros(shape, dtype=dtype)
+        else:
+            data= np.memmap(f.name, dtype=dtype, mode='c', offset=offset, shape=shape)
+        if not dtype.isnative: data= data.astype(dtype.newbyteorder('='))
+        r["data"]= data
+    return json_obj
+
+def _as_tuples(x):
+    if isinstance(x, list): return tuple(_as_tuples(v) for v in x)
+    if isinstance(x, dict): return {k: _as_tuples(v) for k,v in x.items()}
+    return x
+
+def serialize_abelian_tensor_raw(t):
+    r"""
+    Parameters
+    ----------
+    t: yastn.Tensor
+
+    Returns
+    -------
+    json_tensor: dict
+
+        JSON-compliant representation of yastn.Tensor, including the fusion 
+        history of its legs, with data held as raw array. See :meth:`serialize_bare_tensor_raw`
+    """
+    d= yastn.save_to_dict(t)
+    data= np.asarray(d.pop("_d"))
+    json_tensor= dict({"format": "abelian_raw", "struct": d})
+    json_tensor["data"]= {"format": "raw", "dtype": f"{data.dtype}", "dims": list(data.shape),\
+        "data": data.astype(data.dtype.newbyteorder('<'), copy=False)}
+    return json_tensor
+
+def read_abelian_tensor_raw(json_obj, config):
+    r"""
+    :param json_obj: tensor serialized by :meth:`serialize_abelian_tensor_raw`
+    :type json_obj: dict
+    :param config: yastn.Tensor configuration
+    :type config: namedtuple
+    :return: abelian tensor
+    :rtype: yastn.Tensor
+    """
+    assert json_obj["format"]=="abelian_raw", "Invalid JSON format of tensor: "+json_obj["format"]
+    d= _as_tuples(json_obj["struct"])
+    d["_d"]= read_bare_json_tensor_np(json_obj["data"])
+    return yastn.load_from_dict(config=config, d=d)
+
+def fingerprint_tensors(ts):
+    r"""
+    :param ts: tensors, i.e. on-site tensors of iPEPS
+    :type ts: dict[tuple(int,int): torch.Tensor or yastn.Tensor]
+    :return: SHA1 digest of keys, structure and elements of tensors
+    :rtype: str
+    """
+    h= hashlib.sha1()
+    for k in sorted(ts.keys()):
+        t= ts[k]
+        json_t= serialize_bare_tensor_raw(t) if isinstance(t, torch.Tensor) \
+            else serialize_abelian_tensor_raw(t)
+        arrays= [r.pop("data") for r in _raw_records(json_t)]
+        h.update(json.dumps([k, json_t], cls=NumPy_Encoder).encode("utf-8"))
+        for a in arrays: h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
 def serialize_basis_t(meta,t):
     # assume sparse tensor
     assert isinstance(t,torch.Tensor),"torch.tensor is expected"
@@ -1,11 +1,8 @@
 import numpy as np
 import torch
 import torch.nn.functional as Functional
-try:
-    import scipy.sparse.linalg
-    from scipy.sparse.linalg import LinearOperator
-except:
-    print("Warning: Missing scipy. ARNOLDISVD is not available.")
+from config import _lazy_import
+sla= _lazy_import("scipy.sparse.linalg", "Missing scipy. ARNOLDISVD is not available.")
 
 class SYMARNOLDI(torch.autograd.Function):
     @staticmethod
@@ -33,9 +30,9 @@ class SYMARNOLDI(torch.autograd.Function):
             V= torch.as_tensor(v,dtype=M.dtype,device=M.device)
             V= torch.mv(M,V)
             return V.detach().cpu().numpy()
-        M_nograd= LinearOperator(M.size(), matvec=mv)
+        M_nograd= sla.LinearOperator(M.size(), matvec=mv)
 
-        D, U= scipy.sparse.linalg.eigsh(M_nograd, k=k)
+        D, U= sla.eigsh(M_nograd, k=k)
         D= torch.as_tensor(D)
         U= torch.as_tensor(U)
 
@@ -109,7 +106,7 @@ class ARNOLDI(torch.autograd.Function):
                 B= torch.as_tensor(v,dtype=M.dtype,device=M.device)
                 B= torch.mv(M_nograd,B)
                 return B.detach().cpu().numpy()
-            M_op= LinearOperator(M.size(), matvec=mv)
+            M_op= sla.LinearOperator(M.size(), matvec=mv)
         else:
             # otherwise we assume, that M is LinearOperator itself
             assert dtype is not None,"missing dtype for LinearOperator M"
@@ -121,7 +118,7 @@ class ARNOLDI(torch.autograd.Function):
         else:
             v0_nograd= None
 
-        D_, U_= scipy.sparse.linalg.eigs(M_op, k=k, v0=v0_nograd)
+        D_, U_= sla.eigs(M_op, k=k, v0=v0_nograd)
         # here D, U are complex numpy tensors
         D= torch.zeros((k,2), dtype=dtype, device=device)
         D[:,0]= torch.as_tensor(np.real(D_),device=device)
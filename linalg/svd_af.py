@@ -1,10 +1,7 @@
 import torch
 from oe_ext.oe_ext import _debug_allocated_tensors
-from config import _torch_version_check
-try:
-    import arrayfire as af
-except:
-    print("Warning: Missing arrayfire. SVDAF is not available.")
+from config import _torch_version_check, _lazy_import
+af= _lazy_import("arrayfire", "Missing arrayfire. SVDAF is not available.")
 import logging
 log = logging.getLogger(__name__)
 
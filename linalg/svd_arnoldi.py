@@ -1,11 +1,8 @@
 import numpy as np
 import torch
 import torch.nn.functional as Functional
-try:
-    import scipy.sparse.linalg
-    from scipy.sparse.linalg import LinearOperator
-except:
-    print("Warning: Missing scipy. ARNOLDISVD is not available.")
+from config import _lazy_import
+sla= _lazy_import("scipy.sparse.linalg", "Missing scipy. ARNOLDISVD is not available.")
 
 class SVDSYMARNOLDI(torch.autograd.Function):
     @staticmethod
@@ -36,9 +33,9 @@ class SVDSYMARNOLDI(torch.autograd.Function):
             return V.detach().cpu().numpy()
         
         # M_nograd = M.clone().detach().cpu().numpy()
-        M_nograd= LinearOperator(M.size(), matvec=mv)
+        M_nograd= sla.LinearOperator(M.size(), matvec=mv)
 
-        D, U= scipy.sparse.linalg.eigsh(M_nograd, k=k)
+        D, U= sla.eigsh(M_nograd, k=k)
 
         D= torch.as_tensor(D)
         U= torch.as_tensor(U)
@@ -111,9 +108,9 @@ class SVDARNOLDI(torch.autograd.Function):
             B= torch.mv(MMt,B)
             return B.detach().cpu().numpy()
 
-        MMt_op= LinearOperator(M.size(), matvec=mv)
+        MMt_op= sla.LinearOperator(M.size(), matvec=mv)
 
-        D, U= scipy.sparse.linalg.eigsh(MMt_op, k=k)
+        D, U= sla.eigsh(MMt_op, k=k)
         D= torch.as_tensor(D,device=M.device)
         U= torch.as_tensor(U,device=M.device)
 
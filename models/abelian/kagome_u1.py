@@ -274,27 +274,20 @@ class KAGOME_U1():
             obs["e_t_dn"]= e_t_dn
             obs["e_t_up"]= e_t_up
 
-            for label in self.obs_ops.keys():
-                op= self.obs_ops[label]
-                obs_val,_ =rdm_kagome.rdm2x2_dn_triangle_with_operator((0, 0), state, env, op,\
-                    force_cpu=force_cpu)
-                obs_val= obs_val.to_number()
-                obs[f"{label}"]= obs_val
+            obs_vals,_ =rdm_kagome.rdm2x2_dn_triangle_with_operators((0, 0), state, env,\
+                list(self.obs_ops.values()), force_cpu=force_cpu)
+            for label,obs_val in zip(self.obs_ops.keys(),obs_vals):
+                obs[f"{label}"]= obs_val.to_number()
 
             for i in range(3):
                 #obs[f"m_{i}"]= sqrt(_cast_to_real(obs[f"sz_{i}"]*obs[f"sz_{i}"]+ obs[f"sp_{i}"]*obs[f"sm_{i}"]))
                 obs[f"m2_{i}"]= obs[f"sz_{i}"]*obs[f"sz_{i}"]+ obs[f"sp_{i}"]*obs[f"sm_{i}"]
  
             # nn S.S pattern
-            SS_dn_01,_= rdm_kagome.rdm2x2_dn_triangle_with_operator((0, 0), state, env,\
-                self.SS01, force_cpu=force_cpu)
-            SS_dn_01= SS_dn_01.to_number()
-            SS_dn_12,_= rdm_kagome.rdm2x2_dn_triangle_with_operator((0, 0), state, env,\
-                self.SS12, force_cpu=force_cpu)
-            SS_dn_12= SS_dn_12.to_number()
-            SS_dn_02,_= rdm_kagome.rdm2x2_dn_triangle_with_operator((0, 0), state, env,\
-                self.SS02, force_cpu=force_cpu)
-            SS_dn_02= SS_dn_02.to_number()
+            (SS_dn_01, SS_dn_12, SS_dn_02),_= rdm_kagome.rdm2x2_dn_triangle_with_operators(\
+                (0, 0), state, env, [self.SS01, self.SS12, self.SS02], force_cpu=force_cpu)
+            SS_dn_01, SS_dn_12, SS_dn_02= SS_dn_01.to_number(), SS_dn_12.to_number(),\
+                SS_dn_02.to_number()
             
             rdm_up= rdm_kagome.rdm2x2_up_triangle_open((0, 0), state, env, force_cpu=force_cpu)
             #bb=yastn.tensordot(rdm_up.fuse_legs(axes=((0,1,2),(3,4,5))),self.Id3_t,([0,1],[1,0])).to_number()
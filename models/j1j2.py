@@ -4,6 +4,7 @@ import config as cfg
 from ctm.generic.env import ENV
 from ctm.generic import rdm
 from ctm.generic import corrf
+from ctm.generic.obs_context import OBS_CONTEXT
 from ctm.one_site_c4v.env_c4v import ENV_C4V
 from ctm.one_site_c4v import rdm_c4v
 from ctm.one_site_c4v.rdm_c4v_specialized import rdm2x2_NNN_tiled,\
@@ -43,6 +44,7 @@ class J1J2():
         self.h2, self.SS_rot, self.h2x2_nn, self.h2x2_nnn, self.h2x2_nn_rot, \
             self.h2x2_nnn_rot= self.get_h()
         self.obs_ops= self.get_obs_ops()
+        self.h2x2_nn_terms, self.h2x2_nnn_terms= self.get_h_terms()
 
     def get_h(self):
         s2 = su2.SU2(self.phys_dim, dtype=self.dtype, device=self.device)
@@ -75,6 +77,25 @@ class J1J2():
 
         return SS, SS_rot, h2x2_nn, h2x2_nnn, h2x2_nn_rot, h2x2_nnn_rot
 
+    def get_h_terms(self):
+        r"""
+        :return: nearest and next-nearest neighbour terms of the Hamiltonian on 2x2 plaquette
+                 as operator products, with their coefficients
+        :rtype: (list[dict], torch.tensor), (list[dict], torch.tensor)
+
+        Decomposes :math:`\mathbf{S}_i.\mathbf{S}_j = S^z_iS^z_j + (S^+_iS^-_j + S^-_iS^+_j)/2`
+        for the bonds of ``h2x2_nn`` and ``h2x2_nnn``, with sites of the plaquette indexed as
+        in :func:`ctm.generic.rdm.expval2x2`.
+        """
+        s2 = su2.SU2(self.phys_dim, dtype=self.dtype, device=self.device)
+        SS_terms= [(s2.SZ(),s2.SZ(),1.0), (s2.SP(),s2.SM(),0.5), (s2.SM(),s2.SP(),0.5)]
+        def _terms(bonds):
+            terms= [{i: op_i, j: op_j} for i,j in bonds for op_i,op_j,c in SS_terms]
+            coeffs= torch.as_tensor([c for i,j in bonds for op_i,op_j,c in SS_terms],\
+                dtype=self.dtype,device=self.device)
+            return terms, coeffs
+        return _terms([(0,1),(2,3),(0,2),(1,3)]), _terms([(0,3),(1,2)])
+
     def get_obs_ops(self):
         obs_ops = dict()
         s2 = su2.SU2(self.phys_dim, dtype=self.dtype, device=self.device)
@@ -170,12 +191,10 @@ class J1J2():
         # 2 \/ 2   2 \/ 2
         # 0 /\ 0   0 /\ 0
         # A3--1B & B3--1A
-        energy_nn=0
-        energy_nnn=0
-        for coord in state.sites.keys():
-            tmp_rdm= rdm.rdm2x2(coord,state,env)
-            energy_nn += torch.einsum('ijklabcd,ijklabcd',tmp_rdm,self.h2x2_nn)
-            energy_nnn += torch.einsum('ijklabcd,ijklabcd',tmp_rdm,self.h2x2_nnn)
+        tmp_rdms= rdm.rdm2x2_batched(list(state.sites.keys()),state,env,\
+            obs_ctx=OBS_CONTEXT(state,env))
+        energy_nn= torch.einsum('xijklabcd,ijklabcd->',tmp_rdms,self.h2x2_nn)
+        energy_nnn= torch.einsum('xijklabcd,ijklabcd->',tmp_rdms,self.h2x2_nnn)
         energy_per_site= 2.0*(self.j1*energy_nn/8.0 + self.j2*energy_nnn/4.0)
         energy_per_site= _cast_to_real(energy_per_site)
 
@@ -216,12 +235,10 @@ class J1J2():
             0    0   0    0   0    0   0    0
             C3--1D & D3--1C & A3--1B & B3--1A
         """
-        energy_nn=0
-        energy_nnn=0
-        for coord in state.sites.keys():
-            tmp_rdm= rdm.rdm2x2(coord,state,env)
-            energy_nn += torch.einsum('ijklabcd,ijklabcd',tmp_rdm,self.h2x2_nn)
-            energy_nnn += torch.einsum('ijklabcd,ijklabcd',tmp_rdm,self.h2x2_nnn)
+        tmp_rdms= rdm.rdm2x2_batched(list(state.sites.keys()),state,env,\
+            obs_ctx=OBS_CONTEXT(state,env))
+        energy_nn= torch.einsum('xijklabcd,ijklabcd->',tmp_rdms,self.h2x2_nn)
+        energy_nnn= torch.einsum('xijklabcd,ijklabcd->',tmp_rdms,self.h2x2_nnn)
         energy_per_site= 2.0*(self.j1*energy_nn/16.0 + self.j2*energy_nnn/8.0)
         energy_per_site= _cast_to_real(energy_per_site)
 
@@ -267,13 +284,39 @@ class J1J2():
             0    0   0    0   0    0   0    0
             B3--1E & E3--1F & F3--1A & A3--1B 
         """
+        tmp_rdms= rdm.rdm2x2_batched(list(state.sites.keys()),state,env,\
+            obs_ctx=OBS_CONTEXT(state,env))
+        energy_nn= torch.einsum('xijklabcd,ijklabcd->',tmp_rdms,self.h2x2_nn)
+        energy_nnn= torch.einsum('xijklabcd,ijklabcd->',tmp_rdms,self.h2x2_nnn)
+        energy_per_site= 2.0*(self.j1*energy_nn/32.0 + self.j2*energy_nnn/16.0)
+        energy_per_site= _cast_to_real(energy_per_site)
+
+        return energy_per_site
+
+    def energy_2x2_expval(self,state,env):
+        r"""
+        :param state: wavefunction
+        :param env: CTM environment
+        :type state: IPEPS
+        :type env: ENV
+        :return: energy per site
+        :rtype: float
+
+        Evaluates the same terms as :meth:`energy_2x2_2site`, :meth:`energy_2x2_4site`
+        or :meth:`energy_2x2_8site`, depending on the size of the unit cell, 
+        but as expectation values of operator products given by :meth:`get_h_terms` 
+        using :func:`ctm.generic.rdm.expval2x2`, without constructing the 
+        reduced density matrices :math:`\rho_{2x2}`.
+        """
+        (nn_terms, nn_c), (nnn_terms, nnn_c)= self.h2x2_nn_terms, self.h2x2_nnn_terms
         energy_nn=0
         energy_nnn=0
         for coord in state.sites.keys():
-            tmp_rdm= rdm.rdm2x2(coord,state,env)
-            energy_nn += torch.einsum('ijklabcd,ijklabcd',tmp_rdm,self.h2x2_nn)
-            energy_nnn += torch.einsum('ijklabcd,ijklabcd',tmp_rdm,self.h2x2_nnn)
-        energy_per_site= 2.0*(self.j1*energy_nn/32.0 + self.j2*energy_nnn/16.0)
+            vals= rdm.expval2x2(coord,state,env,nn_terms+nnn_terms)
+            energy_nn += (nn_c*vals[:len(nn_terms)]).sum()
+            energy_nnn += (nnn_c*vals[len(nn_terms):]).sum()
+        n_sites= len(state.sites)
+        energy_per_site= 2.0*(self.j1*energy_nn/(4.0*n_sites) + self.j2*energy_nnn/(2.0*n_sites))
         energy_per_site= _cast_to_real(energy_per_site)
 
         return energy_per_site
@@ -294,9 +337,11 @@ class J1J2():
         # TODO optimize/unify ?
         # expect "list" of (observable label, value) pairs ?
         obs= dict({"avg_m": 0.})
+        # intermediates are shared between 1x1, 2x1 and 1x2 RDMs
+        obs_ctx= OBS_CONTEXT(state,env)
         with torch.no_grad():
             for coord,site in state.sites.items():
-                rdm1x1 = rdm.rdm1x1(coord,state,env)
+                rdm1x1 = obs_ctx.rdm1x1(coord)
                 for label,op in self.obs_ops.items():
                     obs[f"{label}{coord}"]= torch.trace(rdm1x1@op)
                 obs[f"m{coord}"]= sqrt(abs(obs[f"sz{coord}"]**2 + obs[f"sp{coord}"]*obs[f"sm{coord}"]))
@@ -304,8 +349,8 @@ class J1J2():
             obs["avg_m"]= obs["avg_m"]/len(state.sites.keys())
 
             for coord,site in state.sites.items():
-                rdm2x1 = rdm.rdm2x1(coord,state,env)
-                rdm1x2 = rdm.rdm1x2(coord,state,env)
+                rdm2x1 = obs_ctx.rdm2x1(coord)
+                rdm1x2 = obs_ctx.rdm1x2(coord)
                 SS2x1= torch.einsum('ijab,ijab',rdm2x1,self.SS_rot)
                 SS1x2= torch.einsum('ijab,ijab',rdm1x2,self.SS_rot)
                 obs[f"SS2x1{coord}"]= _cast_to_real(SS2x1)
@@ -343,9 +388,11 @@ class J1J2():
         # TODO optimize/unify ?
         # expect "list" of (observable label, value) pairs ?
         obs= dict({"avg_m": 0.})
+        # intermediates are shared between 1x1, 2x1 and 1x2 RDMs
+        obs_ctx= OBS_CONTEXT(state,env)
         with torch.no_grad():
             for coord,site in state.sites.items():
-                rdm1x1 = rdm.rdm1x1(coord,state,env)
+                rdm1x1 = obs_ctx.rdm1x1(coord)
                 for label,op in self.obs_ops.items():
                     obs[f"{label}{coord}"]= torch.trace(rdm1x1@op)
                 obs[f"m{coord}"]= sqrt(abs(obs[f"sz{coord}"]**2 + obs[f"sp{coord}"]*obs[f"sm{coord}"]))
@@ -353,8 +400,8 @@ class J1J2():
             obs["avg_m"]= obs["avg_m"]/len(state.sites.keys())
 
             for coord,site in state.sites.items():
-                rdm2x1 = rdm.rdm2x1(coord,state,env)
-                rdm1x2 = rdm.rdm1x2(coord,state,env)
+                rdm2x1 = obs_ctx.rdm2x1(coord)
+                rdm1x2 = obs_ctx.rdm1x2(coord)
                 SS2x1= torch.einsum('ijab,ijab',rdm2x1,self.h2)
                 SS1x2= torch.einsum('ijab,ijab',rdm1x2,self.h2)
                 obs[f"SS2x1{coord}"]= _cast_to_real(SS2x1)
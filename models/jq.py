@@ -4,6 +4,7 @@ import config as cfg
 from ctm.generic.env import ENV
 from ctm.generic import rdm
 from ctm.generic import corrf
+from ctm.generic.obs_context import OBS_CONTEXT
 from ctm.one_site_c4v.env_c4v import ENV_C4V
 from ctm.one_site_c4v import rdm_c4v 
 from ctm.one_site_c4v import corrf_c4v
@@ -115,10 +116,9 @@ class JQ():
             0    0   0    0   0    0   0    0
             C3--1D & D3--1C & A3--1B & B3--1A 
         """
-        rdm2x2_00= rdm.rdm2x2((0,0),state,env)
-        rdm2x2_10= rdm.rdm2x2((1,0),state,env)
-        rdm2x2_01= rdm.rdm2x2((0,1),state,env)
-        rdm2x2_11= rdm.rdm2x2((1,1),state,env)
+        rdm2x2_00, rdm2x2_10, rdm2x2_01, rdm2x2_11= \
+            rdm.rdm2x2_batched([(0,0),(1,0),(0,1),(1,1)],state,env,\
+            obs_ctx=OBS_CONTEXT(state,env))
         energy= torch.einsum('ijklabcd,ijklabcd',rdm2x2_00,self.hp_h_q)
         energy+= torch.einsum('ijklabcd,ijklabcd',rdm2x2_10,self.hp_v_q)
         energy+= torch.einsum('ijklabcd,ijklabcd',rdm2x2_01,self.hp_v_q)
@@ -289,11 +289,10 @@ class S_HALF_KAGOME():
             obs["e_t_up"]= e_t_up
 
             # compute on-site observables i.e. magnetizations
-            norm_wf_1x1 = rdm_kagome.trace1x1_dn_kagome((0, 0), state, env, self.Id3_t)
-            for label in self.obs_ops.keys():
-                op= self.obs_ops[label].view(self.phys_dim**3, self.phys_dim**3)
-                obs_val= rdm_kagome.trace1x1_dn_kagome((0, 0), state, env, op) / norm_wf_1x1
-                obs[f"{label}"]= obs_val
+            obs_vals,_= rdm_kagome.trace1x1_dn_kagome_with_operators((0, 0), state, env,\
+                [op.view(self.phys_dim**3, self.phys_dim**3) for op in self.obs_ops.values()],\
+                force_cpu=force_cpu, **kwargs)
+            obs.update(zip(self.obs_ops.keys(), obs_vals))
 
             # compute magnitude of magnetization, m^2, on-site
             for i in range(3):
@@ -301,17 +300,11 @@ class S_HALF_KAGOME():
                 obs[f"m2_{i}"]= obs[f"sz_{i}"]*obs[f"sz_{i}"]+ obs[f"sp_{i}"]*obs[f"sm_{i}"]
  
             # nn S.S pattern. In self.SSnnId, the identity is placed on s2 of three sites
-            # in the unitcell i.e. \vec{S}_0 \cdot \vec{S}_1 \otimes Id_2
-            SS_dn_01,norm_2x2_dn= rdm_kagome.rdm2x2_dn_triangle_with_operator(\
-                (0, 0), state, env, self.SSnnId, force_cpu=force_cpu, **kwargs)
-            # move identity from site 2 to site 0
-            SS_dn_12,_= rdm_kagome.rdm2x2_dn_triangle_with_operator(\
-                (0, 0), state, env, self.SSnnId.permute(2,1,0, 5,4,3).contiguous(),\
-                force_cpu=force_cpu, **kwargs)
-            # move identity from site 2 to site 1
-            SS_dn_02,_= rdm_kagome.rdm2x2_dn_triangle_with_operator(\
-                (0, 0), state, env, self.SSnnId.permute(0,2,1, 3,5,4).contiguous(),\
-                force_cpu=force_cpu, **kwargs)
+            # in the unitcell i.e. \vec{S}_0 \cdot \vec{S}_1 \otimes Id_2. Permutations 
+            # move identity from site 2 to site 0 and 1 respectively
+            (SS_dn_01, SS_dn_12, SS_dn_02),_= rdm_kagome.rdm2x2_dn_triangle_with_operators(\
+                (0, 0), state, env, [self.SSnnId, self.SSnnId.permute(2,1,0, 5,4,3),\
+                self.SSnnId.permute(0,2,1, 3,5,4)], force_cpu=force_cpu, **kwargs)
             rdm_up= rdm_kagome.rdm2x2_up_triangle_open(\
                 (0, 0), state, env, force_cpu=force_cpu, **kwargs)
             SS_up_01= torch.einsum('ijkmno,mnoijk', rdm_up, self.SSnnId )
@@ -2,7 +2,7 @@ import torch
 import groups.su2 as su2
 import config as cfg
 from ctm.generic.env import ENV
-from ctm.generic import rdm, rdm_looped
+from ctm.generic import rdm, rdm_looped, rdm_dispatch
 from ctm.generic import corrf
 from math import sqrt, pi
 import itertools
@@ -51,53 +51,23 @@ def eval_nn_per_site(coord,state,env,R,Rinv,op_nn,op_nn_diag,
 
 def eval_nnn_per_site_semimanual(coord,state,env,R,Rinv,op_nnn,unroll=False,
     checkpoint_unrolled=False,checkpoint_on_device=False,force_cpu=False,verbosity=0):
-    if not unroll: unroll= {}
-
-    # O(X^3 D^6 s^2)
-    energy_nnn= 0.
-    # RA R^2A R^3A                  B  C  A     x  x s2
-    # A  RA   R^2A => 120deg order  A  B  C <=> s3 x x
-    tmp_rdm_2x3= rdm_looped.rdm2x3_loop_oe_semimanual(coord,state,env,\
-            open_sites=[2,3], unroll=unroll.get('rdm2x3_loop_oe_semimanual',False), 
-            checkpoint_unrolled=checkpoint_unrolled, 
-            checkpoint_on_device=checkpoint_on_device,
-            force_cpu=force_cpu,verbosity=verbosity)
-    energy_nnn+= torch.einsum('iajb,jbia',tmp_rdm_2x3,
-        torch.einsum('jxiy,xb,ya->jbia',op_nnn,R@R@R,R@R@R)) # A--A nnn
-
-    #
-    # R^2A R^3A     x  s3                 C A
-    # RA   R^2A     x  x                  B C
-    # A      RA <=> s2 x  => 120deg order A B
-    tmp_rdm_3x2= rdm_looped.rdm3x2_loop_oe_semimanual(coord,state,env,\
-            open_sites=[2,3], unroll=unroll.get('rdm3x2_loop_oe_semimanual',False), 
-            checkpoint_unrolled=checkpoint_unrolled,
-            checkpoint_on_device=checkpoint_on_device,
-            force_cpu=force_cpu,verbosity=verbosity)
-    energy_nnn+= torch.einsum('iajb,jbia',tmp_rdm_3x2,
-        torch.einsum('jxiy,xb,ya->jbia',op_nnn,R@R@R,R@R@R)) # A--A nnn
-
-    # 
-    # A    RA     s0 x                 A B
-    # R^-1A A <=> x s3 => 120deg order C A
-    tmp_rdm_2x2= rdm.rdm2x2(coord,state,env,open_sites=[0,3],force_cpu=force_cpu,
-        unroll=unroll.get('rdm2x2',False),checkpoint_unrolled=checkpoint_unrolled, 
-        checkpoint_on_device=checkpoint_on_device,
-        verbosity=verbosity)
-    energy_nnn+= torch.einsum('iajb,jbia',tmp_rdm_2x2,op_nnn) # A--A nnn
-
-    return energy_nnn
+    return eval_nnn_per_site(coord,state,env,R,Rinv,op_nnn,unroll=unroll,
+        checkpoint_unrolled=checkpoint_unrolled,checkpoint_on_device=checkpoint_on_device,
+        force_cpu=force_cpu,verbosity=verbosity,semimanual=True)
 
 def eval_nnn_per_site(coord,state,env,R,Rinv,op_nnn,unroll=False,
-    checkpoint_unrolled=False,checkpoint_on_device=False,force_cpu=False,verbosity=0):
+    checkpoint_unrolled=False,checkpoint_on_device=False,force_cpu=False,verbosity=0,
+    semimanual=False):
     if not unroll: unroll= {}
+    # variants used unless selected by rdm_dispatch, see GLOBALARGS.rdm_variant_selection
+    variant= "_loop_oe_semimanual" if semimanual else "_loop_oe"
 
     # O(X^3 D^6 s^2)
     energy_nnn= 0.
     # RA R^2A R^3A                  B  C  A     x  x s2
     # A  RA   R^2A => 120deg order  A  B  C <=> s3 x x
-    tmp_rdm_2x3= rdm_looped.rdm2x3_loop_oe(coord,state,env,\
-            open_sites=[2,3], unroll=unroll.get('rdm2x3_loop_oe',False), 
+    tmp_rdm_2x3= rdm_dispatch.rdm2x3(coord,state,env,\
+            open_sites=[2,3], unroll=unroll, default="rdm2x3"+variant,
             checkpoint_unrolled=checkpoint_unrolled, 
             checkpoint_on_device=checkpoint_on_device,
             force_cpu=force_cpu,verbosity=verbosity)
@@ -108,8 +78,8 @@ def eval_nnn_per_site(coord,state,env,R,Rinv,op_nnn,unroll=False,
     # R^2A R^3A     x  s3                 C A
     # RA   R^2A     x  x                  B C
     # A      RA <=> s2 x  => 120deg order A B
-    tmp_rdm_3x2= rdm_looped.rdm3x2_loop_oe(coord,state,env,\
-            open_sites=[2,3], unroll=unroll.get('rdm3x2_loop_oe',False), 
+    tmp_rdm_3x2= rdm_dispatch.rdm3x2(coord,state,env,\
+            open_sites=[2,3], unroll=unroll, default="rdm3x2"+variant,
             checkpoint_unrolled=checkpoint_unrolled,
             checkpoint_on_device=checkpoint_on_device,
             force_cpu=force_cpu,verbosity=verbosity)
@@ -119,8 +89,8 @@ def eval_nnn_per_site(coord,state,env,R,Rinv,op_nnn,unroll=False,
     # 
     # A    RA     s0 x                 A B
     # R^-1A A <=> x s3 => 120deg order C A
-    tmp_rdm_2x2= rdm.rdm2x2(coord,state,env,open_sites=[0,3],force_cpu=force_cpu,
-        unroll=unroll.get('rdm2x2',False),checkpoint_unrolled=checkpoint_unrolled, 
+    tmp_rdm_2x2= rdm_dispatch.rdm2x2(coord,state,env,open_sites=[0,3],force_cpu=force_cpu,
+        unroll=unroll,checkpoint_unrolled=checkpoint_unrolled, 
         checkpoint_on_device=checkpoint_on_device,
         verbosity=verbosity)
     energy_nnn+= torch.einsum('iajb,jbia',tmp_rdm_2x2,op_nnn) # A--A nnn
@@ -181,14 +151,11 @@ def eval_j1j2j4jX_per_site_legacy(coord,state,env,R,Rinv,\
     if compressed>0:
         tmp_rdm_2x3= rdm.rdm2x3_trglringex_compressed(coord,state,env,compressed,\
             ctm_args=ctm_args,global_args=global_args) 
-    elif unroll:
-        tmp_rdm_2x3= rdm_looped.rdm2x3_loop_trglringex_manual(coord,state,env,\
-            checkpoint_unrolled=checkpoint_unrolled)
     else:
         # x  s0 s1              x  s3 s2
         # s2 s3 x  => (permute) s0 s1 x
-        tmp_rdm_2x3= rdm_looped.rdm2x3_loop_oe(coord, state, env, open_sites=[1,2,3,4], 
-            unroll=unroll.get('rdm2x3_loop_oe',False),\
+        tmp_rdm_2x3= rdm_dispatch.rdm2x3(coord, state, env, open_sites=[1,2,3,4], 
+            unroll=unroll, default='rdm2x3_loop_trglringex_manual' if unroll else 'rdm2x3_loop_oe',\
             sym_pos_def=False, force_cpu=force_cpu, checkpoint_unrolled=checkpoint_unrolled,
             checkpoint_on_device=checkpoint_on_device)
         tmp_rdm_2x3= tmp_rdm_2x3.permute(2,3,1,0, 6,7,5,4).contiguous()
@@ -211,15 +178,12 @@ def eval_j1j2j4jX_per_site_legacy(coord,state,env,R,Rinv,\
     if compressed>0:
         tmp_rdm_3x2= rdm.rdm3x2_trglringex_compressed(coord,state,env,compressed,\
             ctm_args=ctm_args,global_args=global_args) 
-    elif unroll:
-        tmp_rdm_3x2= rdm_looped.rdm3x2_loop_trglringex_manual(coord,state,env,\
-            checkpoint_unrolled=checkpoint_unrolled)
     else:
         # x  s2               x  s2
         # s0 s3               s3 s1
         # s1  x  => (permute) s0  x
-        tmp_rdm_3x2= rdm_looped.rdm3x2_loop_oe(coord, state, env, open_sites=[1,2,3,4], 
-            unroll=unroll.get('rdm3x2_loop_oe',False),\
+        tmp_rdm_3x2= rdm_dispatch.rdm3x2(coord, state, env, open_sites=[1,2,3,4], 
+            unroll=unroll, default='rdm3x2_loop_trglringex_manual' if unroll else 'rdm3x2_loop_oe',\
             sym_pos_def=False, force_cpu=force_cpu, checkpoint_unrolled=checkpoint_unrolled,
             checkpoint_on_device=checkpoint_on_device)
         tmp_rdm_3x2= tmp_rdm_3x2.permute(1,3,2,0, 5,7,6,4).contiguous()
@@ -233,7 +197,7 @@ def eval_j1j2j4jX_per_site_legacy(coord,state,env,R,Rinv,\
 
     # A    RA     s0 s1                 s0 s1     i j                 A B   
     # R^-1A A <=> s2 s3 => (permute) => s3 s2 <=> l k => 120def order C A
-    tmp_rdm_2x2= rdm.rdm2x2(coord,state,env,open_sites=[0,1,2,3],unroll=unroll.get('rdm2x2',False),\
+    tmp_rdm_2x2= rdm_dispatch.rdm2x2(coord,state,env,open_sites=[0,1,2,3],unroll=unroll,\
         checkpoint_unrolled=checkpoint_unrolled,checkpoint_on_device=checkpoint_on_device,force_cpu=force_cpu)
     tmp_rdm_2x2= tmp_rdm_2x2.permute(0,1,3,2, 4,5,7,6).contiguous()
     tmp_rdm_2x2= torch.einsum(tmp_rdm_2x2,[0,10,4,12,1,11,5,13],\
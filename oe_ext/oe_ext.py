@@ -1,6 +1,8 @@
 import logging
 from functools import lru_cache
+from collections import OrderedDict
 from itertools import product
+import math
 import gc, subprocess
 
 import torch
@@ -11,11 +13,11 @@ from opt_einsum.contract import (  # type: ignore
     _VALID_CONTRACT_KWARGS,
     PathInfo,
     shape_only,
+    _core_contract,
 )
-try:
-    import arrayfire as af
-except:
-    print("Warning: Missing arrayfire. SVDAF is not available.")
+from oe_ext.path_cache import PathCache, get_path_cache
+from config import _lazy_import
+af= _lazy_import("arrayfire", "Missing arrayfire. SVDAF is not available.")
 
 
 log = logging.getLogger(__name__)
@@ -30,7 +32,7 @@ def _debug_allocated_tensors(device=None,global_args=None,totals_only=False):
                 return
     if device:
         cuda= device
-    if cuda and cuda!=torch.device("cpu"):
+    if cuda and torch.device(cuda).type!="cpu":
         torch.cuda.synchronize(device=cuda)
     report=""
     try:
@@ -58,7 +60,7 @@ def _debug_allocated_tensors(device=None,global_args=None,totals_only=False):
             report=report+f"{ptr} {row['count']} {row['device']} {row['shape']}\n"
             tot_cuda+= row['size']
     report=report+f"tot_cuda {tot_cuda/1024**3} GiB\n"
-    if cuda and cuda!="cpu":
+    if cuda and torch.device(cuda).type!="cpu":
         try:
             cp=subprocess.run(["nvidia-smi"], capture_output=True, text=True)
             report=report+cp.stdout
@@ -165,6 +167,10 @@ def _get_contraction_path_cached(
     :param names: string labels for tensors used for more readable logging. The order of
                   names has to follow order of tensors as they appear in ``tn_to_contract``
     :param who: string id for logging identifying this optimal contraction path search
+
+    Paths found by the default optimizer are also stored in the persistent
+    :class:`oe_ext.path_cache.PathCache`, if enabled by ``GLOBALARGS.oe_path_cache``,
+    and shared by subsequent runs.
     """
     optimizer = oe.DynamicProgramming(
         minimize="flops",  # 'size' optimize for largest intermediate tensor size, 'flops' for computation complexity
@@ -177,11 +183,21 @@ def _get_contraction_path_cached(
     shapes_unrolled = tuple(tuple(x for x in s if x > 0) for s in shapes[:-1])
     path = kwargs.pop("path", None)
     kwargs.pop("shapes", False)
+    # only paths found by the default optimizer are persisted
+    path_cache = None if "optimizer" in kwargs else get_path_cache()
     optimizer = kwargs.pop("optimizer", optimizer)
+    if not path and path_cache is not None:
+        key = PathCache.key(expr, shapes, unrolled,
+            f"{PathCache.optimizer_settings(optimizer)} {sorted(kwargs.items())}")
+        path = path_cache.get(key)
+        if path:
+            log.info(f"{who} path loaded from {path_cache.cache_dir}")
     if not path:
         path, path_info = oe.contract_path(
             expr, *shapes_unrolled, optimize=optimizer, shapes=True, **kwargs
         )  # ,use_blas=)
+        if path_cache is not None:
+            path_cache.put(key, path)
 
     path_info, mem_list = _get_contraction_path_info(
         path, expr, *shapes_unrolled, unrolled=unrolled, names=names, shapes=True
@@ -194,6 +210,98 @@ def _get_contraction_path_cached(
     return path, path_info
 
 
+def get_unroll_for_memory_target(*tn_to_contract, memory_target=None, candidates=None,
+    max_unroll=8, max_slices=1024, names=None, who=None, **kwargs):
+    r"""Selects indices to unroll for tensor network contraction specified in interleaved
+    format, such that its peak memory does not exceed ``memory_target``.
+
+    :param tn_to_contract: input to einsum in interleaved format. Explicit index labeling
+                           of output is required
+    :param memory_target: peak memory target as the number of elements. If ``None``
+                          or non-positive, no indices are unrolled
+    :param candidates: indices which can be unrolled. By default, any index shared by
+                       two tensors or by tensor and the output
+    :param max_unroll: maximal number of unrolled indices
+    :param max_slices: maximal number of unrolled contractions
+    :param names: string labels for tensors used for more readable logging
+    :param who: string id for logging
+    :return: indices to unroll
+    :rtype: list
+
+    Takes the optimal contraction path of the whole network and estimates the peak memory
+    (see ``mem_list`` of :func:`_get_contraction_path_info`), including the tensor
+    accumulating the results of unrolled contractions, and the total cost of all
+    unrolled contractions along this path. The contractions involving only tensors
+    without unrolled indices are counted once. The indices are added greedily one by one,
+    picking the index with the smallest relative increase of cost per relative decrease
+    of the peak memory, until the peak memory fits ``memory_target``.
+    """
+    assert (
+        len(tn_to_contract) % 2 == 1
+    ), "Explicit specification of output index labels is required"
+    if memory_target is None or memory_target <= 0:
+        return []
+    igs, ig_out = tn_to_contract[1::2], tn_to_contract[-1]
+    i_to_s = {
+        i: s
+        for ig, t in zip(igs, tn_to_contract[0 : 2 * (len(tn_to_contract) // 2) : 2])
+        for i, s in zip(ig, t.shape)
+    }
+    if candidates is None:
+        candidates = [i for i in i_to_s if i_to_s[i] > 1 and \
+            sum([i in ig for ig in igs + (ig_out,)]) > 1]
+
+    path, _ = get_contraction_path(*tn_to_contract, names=names, who=who, **kwargs)
+
+    def _estimate(unroll):
+        # the path of the whole network remains valid for the network with unrolled indices
+        expr, shapes, unrolled_shapes = _preprocess_interleaved_to_expr_and_shapes(
+            *tn_to_contract, unroll=unroll
+        )
+        shapes_unrolled = tuple(tuple(x for x in s if x > 0) for s in shapes[:-1])
+        path_info, mem_list = _get_contraction_path_info(
+            path, expr, *shapes_unrolled, shapes=True
+        )
+        n_slices = int(np.prod(unrolled_shapes)) if len(unroll) > 0 else 1
+        # contractions involving only tensors without unrolled indices are done once,
+        # see contract_with_unroll
+        const = [not any(i in unroll for i in ig) for ig in igs]
+        cost = 0
+        for contract_inds, idx_removed, einsum_str, _, _ in path_info.contraction_list:
+            step_const = all(const.pop(x) for x in contract_inds)
+            const.append(step_const)
+            inputs = einsum_str.split("->")[0].split(",")
+            step_cost = oe.helpers.flop_count(set("".join(inputs)), len(idx_removed) > 0,
+                len(inputs), path_info.size_dict)
+            cost += step_cost if step_const else step_cost * n_slices
+        # tensor accumulating the results of unrolled contractions
+        acc = int(np.prod([i_to_s[i] for i in ig_out] \
+            + [i_to_s[i] for i in unroll if not i in ig_out])) if len(unroll) > 0 else 0
+        return float(max(mem_list) + acc), float(cost), n_slices
+
+    unroll = []
+    peak, cost, _ = _estimate(unroll)
+    while peak > memory_target and len(unroll) < max_unroll:
+        best = None
+        for i in candidates:
+            if i in unroll: continue
+            peak_i, cost_i, n_slices_i = _estimate(unroll + [i])
+            if peak_i >= peak or n_slices_i > max_slices: continue
+            score = math.log(cost_i / cost) / math.log(peak / peak_i)
+            if best is None or score < best[0]:
+                best = (score, i, peak_i, cost_i)
+        if best is None:
+            break
+        _, i, peak, cost = best
+        unroll.append(i)
+
+    if peak > memory_target:
+        log.warning(f"{who} peak memory {peak:4.3e} exceeds target {memory_target:4.3e}"
+            + f" with unrolled indices {unroll}")
+    log.info(f"{who} unroll {unroll} peak-mem {peak:4.3e} cost {cost:4.3e}")
+    return unroll
+
+
 def _get_contraction_path_info(path, *operands, **kwargs):
     r"""opt_einsum contraction path reporting function extended
     to use user-supplied tensor labels ``names`` for description of individual operations.
@@ -507,6 +615,147 @@ def contract_with_unroll_compute_constants(*args, **kwargs):
 
     return result
 
+def _tensor_fingerprint(t):
+    r"""Identifies the content of tensor ``t`` as long as ``t`` is alive. In-place
+    modifications are detected through the version counter shared by all views
+    of the same storage.
+    """
+    return (t.data_ptr(), t._version, tuple(t.shape), t.stride(), t.dtype, t.device,
+        t.is_conj(), torch.is_grad_enabled() and t.requires_grad)
+
+
+class _CompiledExpression():
+    def __init__(self, subscripts, shapes, path, constants, **kwargs):
+        r"""
+        :param subscripts: contraction in default einsum format
+        :param shapes: shapes of all operands
+        :param path: contraction path
+        :param constants: positions of operands, which are constant across unrolled contractions
+        :type subscripts: str
+        :type shapes: tuple(tuple(int))
+        :type path: list[tuple(int)]
+        :type constants: tuple(int)
+
+        Contraction expression with its contraction list split into constant steps,
+        involving only constant operands or their intermediates, and the remaining
+        variable steps. Unlike opt_einsum's ``ContractExpression``, which folds only
+        the leading constant steps of the path, all constant subnetworks are folded.
+
+        For each constant step, the last folded intermediate which does not require gradient
+        is kept together with fingerprints of the constant tensors it depends on and references
+        to these tensors. Hence, subnetworks built from state tensors alone are folded once
+        per state version and reused by subsequent contractions, even when the environment
+        tensors change. Once the fingerprint of any of its constant tensors changes,
+        the intermediate is replaced and references to the previous tensors are dropped,
+        i.e. at most one intermediate per constant step is retained.
+        """
+        self.expr= oe.contract(subscripts, *(shape_only(s) for s in shapes),
+            optimize=path, _gen_expression=True, **kwargs)
+        self.constants= constants
+        self.variables= tuple(i for i in range(len(shapes)) if i not in constants)
+
+        # convert positional contraction list into steps over operand ids
+        ids, is_const= list(range(len(shapes))), [i in constants for i in range(len(shapes))]
+        self.const_steps, self.var_steps= [], []
+        for inds, idx_rm, einsum_str, _, blas_flag in self.expr.contraction_list:
+            ins= tuple(ids.pop(x) for x in inds)
+            step= (ins, len(is_const), (idx_rm, einsum_str, blas_flag))
+            is_const.append(all(is_const[i] for i in ins))
+            (self.const_steps if is_const[-1] else self.var_steps).append(step)
+            ids.append(step[1])
+        self.out= ids[0]
+        # constant operands and intermediates consumed by variable steps
+        self.var_inputs= set(i for ins,_,_ in self.var_steps for i in ins if is_const[i])
+        if not self.var_steps: self.var_inputs.add(self.out)
+
+        self.folded= dict()
+
+    @staticmethod
+    def _step(ops, c, backend):
+        idx_rm, einsum_str, blas_flag= c
+        # _core_contract pops operands by (descending) positions
+        return _core_contract(list(reversed(ops)),
+            [(tuple(range(len(ops)-1,-1,-1)), idx_rm, einsum_str, None, blas_flag)],
+            backend=backend)
+
+    def fold(self, ops, backend, reuse=True):
+        r"""
+        :param ops: all operands of the contraction
+        :param backend: backend of opt_einsum
+        :param reuse: reuse and store folded intermediates across calls
+        :type ops: tuple(torch.Tensor)
+        :type backend: str
+        :type reuse: bool
+        :return: constant operands and intermediates consumed by variable steps
+        :rtype: dict(int, torch.Tensor)
+        """
+        vals= {i: ops[i] for i in self.constants}
+        deps= {i: frozenset([i]) for i in self.constants}
+        fps= {i: _tensor_fingerprint(ops[i]) for i in self.constants}
+        for ins, out, c in self.const_steps:
+            deps[out]= frozenset().union(*(deps[i] for i in ins))
+            key= tuple(fps[i] for i in sorted(deps[out]))
+            if reuse and out in self.folded and self.folded[out][0]==key:
+                vals[out]= self.folded[out][1]
+                continue
+            # stale intermediate, together with the tensors it references, is released
+            self.folded.pop(out, None)
+            vals[out]= self._step([vals[i] for i in ins], c, backend)
+            if reuse and not vals[out].requires_grad and vals[out].device.type!='meta':
+                # keep constant tensors alive, so their fingerprints remain unique
+                self.folded[out]= (key, vals[out], tuple(ops[i] for i in sorted(deps[out])))
+        return {i: vals[i] for i in self.var_inputs}
+
+    def __call__(self, folded, *var_ops, backend='auto'):
+        vals= dict(folded)
+        vals.update(zip(self.variables, var_ops))
+        for ins, out, c in self.var_steps:
+            vals[out]= self._step([vals.pop(i) if i not in folded else vals[i] for i in ins],\
+                c, backend)
+        return vals[self.out]
+
+
+_compiled_expressions= OrderedDict()
+
+def get_compiled_expression(subscripts, shapes, path, constants=(), **kwargs):
+    r"""
+    :param subscripts: contraction in default einsum format
+    :param shapes: shapes of all operands
+    :param path: contraction path
+    :param constants: positions of constant operands
+    :type subscripts: str
+    :type shapes: tuple(tuple(int))
+    :type path: list[tuple(int)]
+    :type constants: tuple(int)
+    :return: compiled expression
+    :rtype: _CompiledExpression
+
+    Compiled expressions are kept in a registry keyed by the signature of the network,
+    i.e. its subscripts, shapes, contraction path and positions of constants, and persist
+    across calls. The registry holds at most ``GLOBALARGS.oe_expression_registry`` expressions,
+    evicting the least recently used ones. If zero, the registry is disabled and
+    a new expression is compiled on each call.
+    """
+    import config as cfg
+    key= (subscripts, shapes, tuple(map(tuple,path)) if not isinstance(path,str) else path,\
+        constants, repr(sorted(kwargs.items())))
+    if key in _compiled_expressions:
+        _compiled_expressions.move_to_end(key)
+        return _compiled_expressions[key]
+    expr= _CompiledExpression(subscripts, shapes, path, constants, **kwargs)
+    if cfg.global_args.oe_expression_registry>0:
+        _compiled_expressions[key]= expr
+        while len(_compiled_expressions)>cfg.global_args.oe_expression_registry:
+            _compiled_expressions.popitem(last=False)
+    return expr
+
+def clear_compiled_expressions():
+    r"""
+    Empties the registry of compiled expressions, releasing all folded intermediates
+    and constant tensors referenced by them.
+    """
+    _compiled_expressions.clear()
+
 # IF checkpoint_on_device moves all ops to checkpoint on device
 # does not use constant expressions in opt_einsum contract
 def contract_with_unroll(*args, **kwargs):
@@ -517,6 +766,14 @@ def contract_with_unroll(*args, **kwargs):
                  of output is required
     :param unroll: indices to unroll
     :param use_checkpoint:
+    :param n_workers: number of threads evaluating unrolled contractions concurrently.
+                      If ``None``, ``GLOBALARGS.oe_unroll_workers`` is used
+    :param max_inflight: maximal number of unrolled contractions evaluated or awaiting
+                         reduction at any time. Default: ``2*n_workers``
+
+    With ``n_workers>1``, the unrolled contractions are evaluated by a thread pool,
+    while intra-op threads of torch are divided among the workers. The results are
+    reduced in the calling thread, hence the contraction remains differentiable.
     """
     verbosity = kwargs.get("verbosity", 0)
     checkpoint_on_device = kwargs.pop("checkpoint_on_device",False)
@@ -544,13 +801,16 @@ def contract_with_unroll(*args, **kwargs):
     verbosity = kwargs.pop("verbosity", 0)
     unroll = kwargs.pop("unroll", [])
     checkpoint_unrolled = kwargs.pop("checkpoint_unrolled", False)
+    n_workers = kwargs.pop("n_workers", None)
+    max_inflight = kwargs.pop("max_inflight", None)
 
     if not unroll or len(unroll) == 0:
         return oe.contract(*args, **kwargs)
 
+    import config as cfg
     # We are unrolling. In general, there will be several constant
     # tensors among the individual unrolled calls.
-    # Strategy is to build opt_einsum's ContractExpression, which makes use of these
+    # Strategy is to build compiled expression, which folds subnetworks made of these
     # constants
     #
     # Although contract supports interleaved format in general, in _gen_expression mode
@@ -564,37 +824,25 @@ def contract_with_unroll(*args, **kwargs):
         idx for idx, ig in enumerate(args[1::2]) if not any([i in unroll for i in ig])
     )
 
-    if not checkpoint_unrolled:
-        kwargs["_constants_dict"] = {
-            i: args[0 : 2 * (len(args) // 2) : 2][i] for i in constants
-        }
-
-        # Build operands, passing tensors for constants and opt_einsum's Shaped (just shapes) for rest of the ops
-        shapes_and_constant_ops = tuple(
-            t if idx in constants else shape_only(tuple(i for i in shapes[idx] if i > 0))
-            for idx, t in enumerate(args[0 : 2 * (len(args) // 2) : 2])
-        )
-    else:
-        # Build operands, passing opt_einsum's Shaped (just shapes) for both constants and rest of the ops
-        shapes_and_constant_ops = tuple(
-            shape_only(tuple(i for i in shapes[idx] if i > 0)) 
-            for idx, t in enumerate(args[0 : 2 * (len(args) // 2) : 2])
-        )
-
-    kwargs["_gen_expression"] = True
+    # compiled expression is retrieved from the registry, as well as constant
+    # subnetworks folded by previous calls
     oe_backend = kwargs.pop("backend", "auto")
-    _contract_unroll_loop_body= oe.contract(
-        subscripts, *shapes_and_constant_ops, **kwargs
-    )
+    path = kwargs.pop("optimize", "auto")
+    compiled_expr = get_compiled_expression(subscripts,
+        tuple(tuple(i for i in s if i > 0) for s in shapes[:-1]), path,
+        constants=constants if not checkpoint_unrolled else (), **kwargs)
+    if not checkpoint_unrolled:
+        folded = compiled_expr.fold(args[0 : 2 * (len(args) // 2) : 2], oe_backend,
+            reuse=cfg.global_args.oe_expression_registry>0)
     def contract_unroll_loop_body(*args):
-        return _contract_unroll_loop_body(*args, backend=oe_backend)
+        return compiled_expr(folded, *args, backend=oe_backend)
 
     # narrowing of ops by unrolled indices is done within checkpointed section
     def contract_unroll_loop_body_checkpointed(unrolled_ops_slices,*args):
         unrolled_ops = tuple(
             t[s] for t, s in zip(args, unrolled_ops_slices)
         )
-        return _contract_unroll_loop_body(*unrolled_ops, backend=oe_backend)
+        return compiled_expr({}, *unrolled_ops, backend=oe_backend)
 
     # assign shape to each index label
     i_to_s = {
@@ -621,7 +869,7 @@ def contract_with_unroll(*args, **kwargs):
             +_debug_allocated_tensors(device=args[0].device,totals_only=True))
 
     all_ops=args[0 : 2 * (len(args) // 2) : 2]
-    for ui_vals in product(*tuple(range(i_to_s[i]) for i in unroll)):
+    def _unrolled_slice(ui_vals):
         ui_map = {u: v for u, v in zip(unroll, ui_vals)}
 
         ig_out = tuple(ui_map[i] if i in unroll else slice(None) for i in args[-1])
@@ -644,7 +892,7 @@ def contract_with_unroll(*args, **kwargs):
                 for ig in args[1::2]
             )
 
-            partials[ig_out + ig_contracted_unrolled]= checkpoint(
+            res= checkpoint(
                 contract_unroll_loop_body_checkpointed, unrolled_ops_slices, *all_ops )
         else:
             # ops containing *only* variable tensors, narrowed by unrolled indices if applicable
@@ -654,14 +902,28 @@ def contract_with_unroll(*args, **kwargs):
                 if len([i for i in unroll if i in ig]) > 0
             )
 
-            partials[ig_out + ig_contracted_unrolled]= contract_unroll_loop_body(
+            res= contract_unroll_loop_body(
                 *unrolled_ops
             )
+        return ig_out + ig_contracted_unrolled, res
+
+    def _reduce(ui_vals, ig_partial, res):
+        partials[ig_partial]= res
 
         if verbosity>1:
             log.info(who+f" unrolled loop {ui_vals}\n"
                 +_debug_allocated_tensors(device=args[0].device,totals_only=True))
 
+    ui_vals_all= product(*tuple(range(i_to_s[i]) for i in unroll))
+    if n_workers is None:
+        n_workers= cfg.global_args.oe_unroll_workers
+    if n_workers > 1:
+        _contract_unrolled_parallel(_unrolled_slice, ui_vals_all, _reduce, n_workers,
+            max_inflight if max_inflight else 2*n_workers)
+    else:
+        for ui_vals in ui_vals_all:
+            _reduce(ui_vals, *_unrolled_slice(ui_vals))
+
     result = oe.contract(
         partials, tuple(args[-1]) + ig_out_contracted_unrolled, args[-1]
     )
@@ -672,6 +934,40 @@ def contract_with_unroll(*args, **kwargs):
 
     return result
 
+def _contract_unrolled_parallel(f_slice, ui_vals_all, f_reduce, n_workers, max_inflight):
+    r"""Evaluates unrolled contractions ``f_slice(ui_vals)`` for all ``ui_vals`` on a pool of
+    ``n_workers`` threads, keeping at most ``max_inflight`` of them submitted or awaiting
+    reduction. The results are passed to ``f_reduce(ui_vals, *f_slice(ui_vals))``
+    in the calling thread, in order.
+
+    Intra-op threads of torch are divided among the workers for the duration of the loop.
+    Gradient mode of the calling thread, which is thread-local, is propagated to the workers.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    grad_enabled = torch.is_grad_enabled()
+    def _f(ui_vals):
+        with torch.set_grad_enabled(grad_enabled):
+            return f_slice(ui_vals)
+
+    n_threads = torch.get_num_threads()
+    torch.set_num_threads(max(1, n_threads // n_workers))
+    try:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            inflight = deque()
+            for ui_vals in ui_vals_all:
+                if len(inflight) >= max_inflight:
+                    ui_vals_done, future = inflight.popleft()
+                    f_reduce(ui_vals_done, *future.result())
+                inflight.append((ui_vals, executor.submit(_f, ui_vals)))
+            while inflight:
+                ui_vals_done, future = inflight.popleft()
+                f_reduce(ui_vals_done, *future.result())
+    finally:
+        torch.set_num_threads(n_threads)
+
+
 # IF checkpoint_on_device move only unrolled ops at each iteration to device
 def HIGHER_PEAK_MEM_contract_with_unroll(*args, **kwargs):
     r"""Extension of opt_einsum's contract allowing for index unrolling
@@ -0,0 +1,176 @@
+import os, json, hashlib, tempfile, functools
+import logging
+import opt_einsum as oe  # type: ignore
+
+log = logging.getLogger(__name__)
+
+
+class PathCache():
+    def __init__(self, cache_dir):
+        r"""
+        :param cache_dir: directory holding the cached contraction paths
+        :type cache_dir: str
+
+        Persistent on-disk cache of contraction paths. Each path is stored in a separate
+        JSON file named by the hash of its key, which is built from the contraction
+        expression, shapes of tensors, shapes of unrolled indices and the settings
+        of the path optimizer.
+
+        The files are written atomically, first to a temporary file, which is then
+        renamed. Hence, the cache can be shared by concurrently running processes without
+        locking. If several processes search for the same path, the last one to finish
+        overwrites the record with an identical path. Records are read lazily,
+        only when their key is requested.
+        """
+        self.cache_dir= cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(expr, shapes, unrolled=(), settings=""):
+        r"""
+        :return: key of the contraction path
+        :rtype: str
+        """
+        return json.dumps([expr, shapes, unrolled, settings, oe.__version__])
+
+    @staticmethod
+    def optimizer_settings(optimizer):
+        r"""
+        :param optimizer: path optimizer
+        :type optimizer: str or opt_einsum.paths.PathOptimizer
+        :return: description of the path optimizer and its settings, to be included
+                 in the key
+        :rtype: str
+
+        The settings are read from the attributes of ``optimizer``, functions being
+        represented by their names.
+        """
+        if isinstance(optimizer, str):
+            return optimizer
+        settings= []
+        for k,v in sorted(vars(optimizer).items()):
+            if isinstance(v, functools.partial):
+                v= f"{v.func.__name__}{sorted(v.keywords.items())}"
+            elif callable(v):
+                v= getattr(v, "__name__", type(v).__name__)
+            elif not isinstance(v, (bool, int, float, str, type(None))):
+                continue
+            settings.append(f"{k}={v}")
+        return f"{type(optimizer).__name__}({','.join(settings)})"
+
+    def _file(self, key):
+        return os.path.join(self.cache_dir,
+            hashlib.sha1(key.encode("utf-8")).hexdigest()+".json")
+
+    def get(self, key):
+        r"""
+        :param key: key of the contraction path, see :meth:`key`
+        :type key: str
+        :return: contraction path or ``None`` if not present
+        :rtype: list[tuple(int)]
+        """
+        try:
+            with open(self._file(key), "r") as f:
+                record= json.load(f)
+        except (OSError, ValueError):
+            return None
+        # guard against hash collisions
+        if record.get("key")!=key:
+            return None
+        return [tuple(x) for x in record["path"]]
+
+    def put(self, key, path):
+        r"""
+        :param key: key of the contraction path, see :meth:`key`
+        :param path: contraction path
+        :type key: str
+        :type path: list[tuple(int)]
+        """
+        fd, tmp_file= tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": key, "path": [list(x) for x in path]}, f)
+            os.replace(tmp_file, self._file(key))
+        except OSError as e:
+            log.warning(f"Failed to store contraction path in {self.cache_dir}: {e}")
+            if os.path.exists(tmp_file): os.remove(tmp_file)
+
+    def __len__(self):
+        return len([f for f in os.listdir(self.cache_dir) if f.endswith(".json")])
+
+
+_path_cache= None
+
+def get_path_cache():
+    r"""
+    :return: path cache in the directory given by ``GLOBALARGS.oe_path_cache`` or ``None``
+             if the persistent cache is disabled
+    :rtype: PathCache
+
+    The cache is created lazily on first request and re-created whenever
+    ``GLOBALARGS.oe_path_cache`` changes.
+    """
+    global _path_cache
+    import config as cfg
+    cache_dir= cfg.global_args.oe_path_cache
+    if cache_dir in ['None','none','NONE','',None]:
+        return None
+    if _path_cache is None or _path_cache.cache_dir!=cache_dir:
+        _path_cache= PathCache(cache_dir)
+    return _path_cache
+
+
+def prewarm(Ds, chis, networks, phys_dim=2, n_sites=1):
+    r"""
+    :param Ds: bond dimensions
+    :param chis: environment bond dimensions
+    :param networks: names of functions of :mod:`ctm.generic.rdm` or
+                     :mod:`ctm.generic.rdm_looped` (default) evaluating the networks
+    :param phys_dim: physical dimension
+    :param n_sites: number of distinct sites in the unit cell of 1xN shape
+    :type Ds: list[int]
+    :type chis: list[int]
+    :type networks: list[str]
+    :type phys_dim: int
+    :type n_sites: int
+
+    Populates the persistent path cache for given networks and all combinations of
+    bond dimensions. The networks are evaluated with tensors on ``meta`` device, i.e.
+    only the contraction paths are searched for without performing any contraction.
+    """
+    import torch
+    from itertools import product
+    from ipeps.ipeps import IPEPS
+    from ctm.generic.env import ENV
+    from ctm.generic import rdm, rdm_looped
+    assert get_path_cache() is not None, "Persistent path cache is not set, "\
+        +"see GLOBALARGS.oe_path_cache"
+    for D, chi in product(Ds, chis):
+        sites= {(x,0): torch.empty((phys_dim,)+(D,)*4, device='meta') for x in range(n_sites)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%n_sites, 0))
+        env= ENV(chi, state)
+        for k,t in env.C.items(): env.C[k]= torch.empty_like(t, device='meta')
+        for k,t in env.T.items(): env.T[k]= torch.empty_like(t, device='meta')
+        for name in networks:
+            f= getattr(rdm, name, None) or getattr(rdm_looped, name)
+            log.info(f"prewarm {name} D={D} chi={chi}")
+            f((0,0), state, env)
+
+
+if __name__=="__main__":
+    import argparse
+    import config as cfg
+    logging.basicConfig(level=logging.INFO)
+    parser= argparse.ArgumentParser(description="Pre-warm persistent cache of contraction paths")
+    parser.add_argument("cache_dir", help="directory of the cache")
+    parser.add_argument("--D", type=int, nargs="+", default=[2,3,4], help="bond dimensions")
+    parser.add_argument("--chi", type=int, nargs="+", default=[16,32,64],
+        help="environment bond dimensions")
+    parser.add_argument("--phys_dim", type=int, default=2, help="physical dimension")
+    parser.add_argument("--n_sites", type=int, default=1, help="number of distinct sites")
+    parser.add_argument("--networks", nargs="+", default=["rdm2x2_oe","rdm2x3_loop_oe",\
+        "rdm3x2_loop_oe"], help="functions of ctm.generic.rdm or ctm.generic.rdm_looped")
+    args= parser.parse_args()
+    cfg.global_args.oe_path_cache= args.cache_dir
+    prewarm(args.D, args.chi, args.networks, phys_dim=args.phys_dim, n_sites=args.n_sites)
+    print(f"{len(get_path_cache())} paths in {args.cache_dir}")
@@ -1,4 +1,5 @@
 import copy
+import math
 import warnings
 import time
 import json
@@ -7,6 +8,7 @@ log = logging.getLogger(__name__)
 import torch
 from optim import lbfgs_modified
 import config as cfg
+from ctm.generic.checkpoint_planner import plan_checkpoints
 
 def store_checkpoint(checkpoint_file, state, optimizer, current_epoch, current_loss,\
     verbosity=0):
@@ -34,9 +36,59 @@ def store_checkpoint(checkpoint_file, state, optimizer, current_epoch, current_l
     if verbosity>0:
         print(checkpoint_file)
 
+def adapt_ctm_args(ctm_args, ctm_conv_tol_final, ctm_max_iter_final, grad_norm=None,\
+    loss_change=None, opt_args=cfg.opt_args):
+    r"""
+    :param ctm_args: CTM algorithm configuration to be updated in-place
+    :param ctm_conv_tol_final: CTM convergence tolerance to reach at the end of optimization
+    :param ctm_max_iter_final: maximal number of CTM iterations at ``ctm_conv_tol_final``
+    :param grad_norm: :math:`\infty`-norm of the last gradient
+    :param loss_change: absolute change of the loss in the last epoch
+    :param opt_args: optimization configuration
+    :type ctm_args: CTMARGS
+    :type ctm_conv_tol_final: float
+    :type ctm_max_iter_final: int
+    :type grad_norm: float
+    :type loss_change: float
+    :type opt_args: OPTARGS
+    :return: ``True`` if ``ctm_conv_tol_final`` has been reached
+    :rtype: bool
+
+    Inexact CTM schedule. Sets ``ctm_args.ctm_conv_tol`` to ``opt_args.ctm_conv_tol_scale`` 
+    times the smaller of ``grad_norm`` and ``loss_change``, bounded by ``opt_args.ctm_conv_tol_max``
+    from above and by ``ctm_conv_tol_final`` from below. If neither ``grad_norm`` nor 
+    ``loss_change`` is given, the loosest tolerance is set. 
+    The maximal number of CTM iterations ``ctm_args.ctm_max_iter`` is interpolated 
+    (in log of tolerance) between ``opt_args.ctm_max_iter_min`` and ``ctm_max_iter_final``.
+
+    To keep the curvature pairs of L-BFGS consistent, the tolerance is never loosened
+    once tightened, i.e. the gradients stored in L-BFGS history are never more accurate
+    than the current one, and it is tightened at most by a factor ``opt_args.ctm_conv_tol_tighten_factor``
+    between two consecutive epochs.
+    """
+    tol_max= max(opt_args.ctm_conv_tol_max, ctm_conv_tol_final)
+    tol= tol_max
+    if grad_norm is not None:
+        tol= min(tol, opt_args.ctm_conv_tol_scale*grad_norm)
+    if loss_change is not None:
+        tol= min(tol, opt_args.ctm_conv_tol_scale*loss_change)
+    if grad_norm is not None or loss_change is not None:
+        tol= min(tol, ctm_args.ctm_conv_tol)
+        tol= max(tol, opt_args.ctm_conv_tol_tighten_factor*ctm_args.ctm_conv_tol)
+    tol= max(tol, ctm_conv_tol_final)
+    ctm_args.ctm_conv_tol= tol
+
+    if tol_max > ctm_conv_tol_final:
+        x= math.log(tol_max/tol)/math.log(tol_max/ctm_conv_tol_final)
+        max_iter_min= min(opt_args.ctm_max_iter_min, ctm_max_iter_final)
+        ctm_args.ctm_max_iter= int(round(max_iter_min + x*(ctm_max_iter_final-max_iter_min)))
+    else:
+        ctm_args.ctm_max_iter= ctm_max_iter_final
+    return tol <= ctm_conv_tol_final
+
 def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     main_args=cfg.main_args, opt_args=cfg.opt_args,ctm_args=cfg.ctm_args, 
-    global_args=cfg.global_args):
+    global_args=cfg.global_args, loop_rdm=False):
     r"""
     :param state: initial wavefunction
     :param ctm_env_init: initial environment corresponding to ``state``
@@ -46,6 +98,8 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     :param opt_args: optimization configuration
     :param ctm_args: CTM algorithm configuration
     :param global_args: global configuration
+    :param loop_rdm: ``loss_fn`` evaluates looped reduced density matrices. Considered in choosing
+                     the checkpointing of CTM to fit ``ctm_args.memory_budget``
     :type state: IPEPS
     :type ctm_env_init: ENV
     :type loss_fn: function(IPEPS,ENV,CTMARGS,OPTARGS,GLOBALARGS)->torch.tensor
@@ -54,6 +108,7 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     :type opt_args: OPTARGS
     :type ctm_args: CTMARGS
     :type global_args: GLOBALARGS
+    :type loop_rdm: bool
 
     Optimizes initial wavefunction ``state`` with respect to ``loss_fn`` using 
     :class:`optim.lbfgs_modified.LBFGS_MOD` optimizer.
@@ -63,12 +118,29 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
 
     The optimizer saves the best energy state into file ``main_args.out_prefix+"_state.json"``
     and checkpoints the optimization at every step to ``main_args.out_prefix+"_state.json"``.
+
+    If ``opt_args.ctm_conv_tol_adaptive`` is set, the convergence tolerance and maximal number
+    of CTM iterations of ``ctm_args`` are adapted in every epoch by :meth:`adapt_ctm_args`.
+    Therefore, the convergence check used by ``loss_fn`` should read these from the ``ctm_args``
+    it is invoked with. The optimization terminates only once the original tolerance
+    of ``ctm_args`` has been reached. The original values are restored on return.
     """
     verbosity = opt_args.verbosity_opt_epoch
     checkpoint_file = main_args.out_prefix+"_checkpoint.p"
     outputstatefile= main_args.out_prefix+"_state.json"
     
+    # choose checkpointing of CTM to fit the memory budget
+    # on a copy of ctm_args passed to loss_fn, leaving the configuration of the caller intact
+    if ctm_args.memory_budget > 0:
+        ctm_args= copy.deepcopy(ctm_args)
+        plan_checkpoints(state, ctm_env_init, loop_rdm=loop_rdm,\
+            ctm_args=ctm_args, global_args=global_args, verbosity=verbosity)
+
     t_data = dict({"loss": [], "min_loss": 1.0e+16, "loss_ls": [], "min_loss_ls": 1.0e+16})
+    if opt_args.ctm_conv_tol_adaptive:
+        ctm_conv_tol_final, ctm_max_iter_final= ctm_args.ctm_conv_tol, ctm_args.ctm_max_iter
+        ctm_conv_tol_reached= adapt_ctm_args(ctm_args, ctm_conv_tol_final, ctm_max_iter_final,\
+            opt_args=opt_args)
     current_env= [ctm_env_init]
     context= dict({"ctm_args":ctm_args, "opt_args":opt_args, "loss_history": t_data})
     epoch=0
@@ -215,34 +287,53 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
 
         return loss
 
-    for epoch in range(main_args.opt_max_iter):
-        # checkpoint the optimizer
-        # checkpointing before step, guarantees the correspondence between the wavefunction
-        # and the last computed value of loss t_data["loss"][-1]
-        if epoch>0:
-            store_checkpoint(checkpoint_file, state, optimizer, epoch, t_data["loss"][-1])
+    try:
+        for epoch in range(main_args.opt_max_iter):
+            # checkpoint the optimizer
+            # checkpointing before step, guarantees the correspondence between the wavefunction
+            # and the last computed value of loss t_data["loss"][-1]
+            if epoch>0:
+                store_checkpoint(checkpoint_file, state, optimizer, epoch, t_data["loss"][-1])
 
-        # After execution closure ``current_env`` **IS NOT** corresponding to ``state``, since
-        # the ``state`` on-site tensors have been modified by gradient. 
-        optimizer.step_2c(closure, closure_linesearch)
+            # After execution closure ``current_env`` **IS NOT** corresponding to ``state``, since
+            # the ``state`` on-site tensors have been modified by gradient. 
+            optimizer.step_2c(closure, closure_linesearch)
         
-        # reset line search history
-        t_data["loss_ls"]=[]
-        t_data["min_loss_ls"]=1.0e+16
+            # reset line search history
+            t_data["loss_ls"]=[]
+            t_data["min_loss_ls"]=1.0e+16
 
-        if post_proc is not None:
-            post_proc(state, current_env[0], context)
+            if post_proc is not None:
+                post_proc(state, current_env[0], context)
 
-        # terminate condition
-        if len(t_data["loss"])>1 and \
-            abs(t_data["loss"][-1]-t_data["loss"][-2])<opt_args.tolerance_change:
-            break
+            # terminate condition
+            if len(t_data["loss"])>1 and \
+                abs(t_data["loss"][-1]-t_data["loss"][-2])<opt_args.tolerance_change:
+                if not opt_args.ctm_conv_tol_adaptive or ctm_conv_tol_reached:
+                    break
+                # converged only with respect to loosely converged environments,
+                # continue tightening the tolerance towards the final one
+                ctm_conv_tol_reached= adapt_ctm_args(ctm_args, ctm_conv_tol_final, ctm_max_iter_final,\
+                    grad_norm=0., loss_change=0., opt_args=opt_args)
+            elif opt_args.ctm_conv_tol_adaptive:
+                flat_grad= torch.cat(tuple(p.grad.view(-1) for p in parameters))
+                loss_change= abs(t_data["loss"][-1]-t_data["loss"][-2]) if len(t_data["loss"])>1 \
+                    else None
+                ctm_conv_tol_reached= adapt_ctm_args(ctm_args, ctm_conv_tol_final, ctm_max_iter_final,\
+                    grad_norm=flat_grad.abs().max().item(), loss_change=loss_change, opt_args=opt_args)
 
-        if (opt_args.line_search not in ["default", None]) and \
-            "STATUS" in context and context["STATUS"]=="ENV_ANTIVAR":
-            raise RuntimeError("Over-optimized environment, see log file for "\
-                +" env_sensitivity and loss_diff.")
+            if opt_args.ctm_conv_tol_adaptive and opt_args.opt_logging:
+                log.info(json.dumps(dict({"id": epoch, "ctm_conv_tol": ctm_args.ctm_conv_tol,\
+                    "ctm_max_iter": ctm_args.ctm_max_iter})))
 
+            if (opt_args.line_search not in ["default", None]) and \
+                "STATUS" in context and context["STATUS"]=="ENV_ANTIVAR":
+                raise RuntimeError("Over-optimized environment, see log file for "\
+                    +" env_sensitivity and loss_diff.")
+    finally:
+        # restore the CTM configuration adapted during optimization
+        if opt_args.ctm_conv_tol_adaptive:
+            ctm_args.ctm_conv_tol, ctm_args.ctm_max_iter= ctm_conv_tol_final, ctm_max_iter_final
 
     # optimization is over, store the last checkpoint if at least a single step was made
     if len(t_data["loss"])>0:
@@ -3,7 +3,9 @@ import time
 import json
 import torch
 import config as cfg
-# from optim import sgd_modified
+from ctm.generic.checkpoint_planner import plan_checkpoints
+from optim import sgd_modified
+from optim.norm_metric import precondition_norm_metric
 from torch.optim import sgd
 import logging
 log = logging.getLogger(__name__)
@@ -36,7 +38,7 @@ def store_checkpoint(checkpoint_file, state, optimizer, current_epoch, current_l
 
 def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     main_args=cfg.main_args, opt_args=cfg.opt_args, ctm_args=cfg.ctm_args, 
-    global_args=cfg.global_args):
+    global_args=cfg.global_args, loop_rdm=False):
     r"""
     :param state: initial wavefunction
     :param ctm_env_init: initial environment corresponding to ``state``
@@ -46,6 +48,8 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     :param opt_args: optimization configuration
     :param ctm_args: CTM algorithm configuration
     :param global_args: global configuration
+    :param loop_rdm: ``loss_fn`` evaluates looped reduced density matrices. Considered in choosing
+                     the checkpointing of CTM to fit ``ctm_args.memory_budget``
     :type state: IPEPS
     :type ctm_env_init: ENV
     :type loss_fn: function(IPEPS,ENV,CTMARGS,OPTARGS,GLOBALARGS)->torch.tensor
@@ -54,16 +58,30 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     :type opt_args: OPTARGS
     :type ctm_args: CTMARGS
     :type global_args: GLOBALARGS
+    :type loop_rdm: bool
 
     Optimizes initial wavefunction ``state`` with respect to ``loss_fn`` using 
     :class:`optim.lbfgs_modified.SGD_MOD` optimizer.
     The main parameters influencing the optimization process are given in :class:`config.OPTARGS`.
     Calls to functions ``loss_fn``, ``obs_fn``, and ``post_proc`` pass the current configuration
     as dictionary ``{"ctm_args":ctm_args, "opt_args":opt_args}``.
+
+    If ``opt_args.precondition`` is ``'NORM'``, the step is taken along the gradient 
+    preconditioned by the norm metric built from the environment converged at the current 
+    state, see :func:`optim.norm_metric.precondition_norm_metric`. Only in this case
+    the line search given by ``opt_args.line_search`` is performed. Otherwise, the step 
+    of :class:`torch.optim.SGD` is taken.
     """
     verbosity = opt_args.verbosity_opt_epoch
     checkpoint_file = main_args.out_prefix+"_checkpoint.p" 
     outputstatefile= main_args.out_prefix+"_state.json"
+    # choose checkpointing of CTM to fit the memory budget
+    # on a copy of ctm_args passed to loss_fn, leaving the configuration of the caller intact
+    if ctm_args.memory_budget > 0:
+        ctm_args= copy.deepcopy(ctm_args)
+        plan_checkpoints(state, ctm_env_init, loop_rdm=loop_rdm,\
+            ctm_args=ctm_args, global_args=global_args, verbosity=verbosity)
+
     t_data = dict({"loss": [], "min_loss": 1.0e+16, "loss_ls": [], "min_loss_ls": 1.0e+16})
     current_env=[ctm_env_init]
     context= dict({"ctm_args":ctm_args, "opt_args":opt_args, "loss_history": t_data})
@@ -72,9 +90,21 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
     parameters= state.get_parameters()
     for A in parameters: A.requires_grad_(True)
 
-    # optimizer = sgd_modified.SGD_MOD(parameters, lr=opt_args.lr, momentum=opt_args.momentum, \
-    #     line_search_fn=opt_args.line_search, line_search_eps=opt_args.line_search_tol)
-    optimizer = sgd.SGD(parameters, lr=opt_args.lr, momentum=opt_args.momentum)
+    if opt_args.precondition=='NORM':
+        optimizer = sgd_modified.SGD_MOD(parameters, lr=opt_args.lr, momentum=opt_args.momentum, \
+            dampening=opt_args.dampening, line_search_fn=opt_args.line_search, \
+            line_search_eps=opt_args.line_search_tol)
+    elif opt_args.precondition=='NONE':
+        optimizer = sgd.SGD(parameters, lr=opt_args.lr, momentum=opt_args.momentum)
+    else:
+        raise ValueError("Invalid precondition: "+str(opt_args.precondition)\
+            +" Supported options: NONE, NORM")
+
+    # approximate natural gradient, the environment is the one converged within closure
+    # for the state at which the gradient is evaluated
+    def precondition_fn(flat_grad):
+        return precondition_norm_metric(state, current_env[0], flat_grad, \
+            eps=opt_args.precondition_eps)
 
     # TODO test opt_resume
     if main_args.opt_resume is not None:
@@ -196,8 +226,10 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
         
         # After execution closure ``current_env`` **IS NOT** corresponding to ``state``, since
         # the ``state`` on-site tensors have been modified by gradient. 
-        # optimizer.step_2c(closure, closure_linesearch)
-        optimizer.step(closure)
+        if opt_args.precondition=='NORM':
+            optimizer.step_2c(closure, closure_linesearch, precondition_fn=precondition_fn)
+        else:
+            optimizer.step(closure)
 
         # reset line search history
         t_data["loss_ls"]=[]
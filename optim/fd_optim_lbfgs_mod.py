@@ -140,7 +140,7 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
                     fd_grad[k][i]=(float(loss1-loss0)/opt_args.fd_eps)
                     log.info(f"FD_GRAD {i} loss1 {loss1} grad_i {fd_grad[k][i]}"\
                         +f" timings {timings}")
-                    state.coeffs[k].data.copy_(A_orig)
+                    state.coeffs[k].copy_(A_orig)
         log.info(f"FD_GRAD grad {fd_grad}")
 
         return fd_grad
@@ -159,7 +159,7 @@ def optimize_state(state, ctm_env_init, loss_fn, obs_fn=None, post_proc=None,
                                 fd_grad_set[k][i]=(float(loss1-loss0)/opt_args.fd_eps)
                                 log.info(f"FD_GRAD {set_name}[{i}] loss1 {loss1} grad_i {fd_grad_set[k][i]}"\
                                 +f" timings {timings}")
-                                coeffs_set[k].data.copy_(A_orig)
+                                coeffs_set[k].copy_(A_orig)
                     log.info(f"FD_GRAD grad {k}, {set_name}: {fd_grad_set}")
         return fd_grad_up, fd_grad_dn, fd_grad_site
 
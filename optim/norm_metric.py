@@ -0,0 +1,92 @@
+import warnings
+import torch
+from ctm.generic.env import ENV
+from ctm.generic.rdm import aux_rdm1x1
+import logging
+log = logging.getLogger(__name__)
+
+def norm_metric_1x1(coord, state, env, eps=1.0e-4):
+    r"""
+    :param coord: vertex (x,y) of the site
+    :param state: wavefunction
+    :param env: environment corresponding to ``state``
+    :param eps: regularization relative to the largest eigenvalue of the metric
+    :type coord: tuple(int,int)
+    :type state: IPEPS
+    :type env: ENV
+    :type eps: float
+    :return: inverse of the regularized metric as :math:`D^4 \times D^4` matrix
+    :rtype: torch.tensor
+
+    Builds single-site norm tensor :math:`N` from 1x1 auxiliary reduced density matrix
+    (see :func:`ctm.generic.rdm.aux_rdm1x1`), i.e. the environment of on-site tensor
+    in the norm :math:`\langle\psi|\psi\rangle`, and returns the pseudo-inverse
+    :math:`(G + \epsilon\,\textrm{max}(G)\,I)^{-1}` of the metric
+    :math:`G=N_+/\langle\psi|\psi\rangle`, where :math:`N_+` is the positive part
+    of the hermitized :math:`N`. The normalization matches the metric to the scale
+    of normalized expectation values.
+    """
+    with torch.no_grad():
+        rdm= aux_rdm1x1(coord, state, env)
+        D4= rdm.size(0)*rdm.size(1)*rdm.size(2)*rdm.size(3)
+        N= rdm.reshape(D4,D4)
+        N= 0.5*(N + N.t().conj())
+        a= state.site(coord).reshape(-1,D4)
+        nrm= torch.einsum('pk,kb,pb->',a,N.to(a.dtype),a.conj()).real
+        w, U= torch.linalg.eigh(N)
+        w= torch.clamp(w, min=0)/nrm
+        w_reg= w + eps*w.max()
+        N_inv= (U / w_reg.to(U.dtype)) @ U.t().conj()
+    return N_inv
+
+def precondition_norm_metric(state, env, flat_grad, eps=1.0e-4):
+    r"""
+    :param state: wavefunction
+    :param env: environment corresponding to ``state``
+    :param flat_grad: flattened gradient with respect to ``state.get_parameters()``
+    :param eps: regularization of the metric, see :func:`norm_metric_1x1`
+    :type state: IPEPS
+    :type env: ENV
+    :type flat_grad: torch.tensor
+    :type eps: float
+    :return: preconditioned gradient
+    :rtype: torch.tensor
+
+    Approximates the natural gradient :math:`G^{-1}g` by replacing the metric :math:`G` of
+    the iPEPS manifold with block-diagonal metric given by the single-site norm tensors
+    :math:`N \otimes I_{phys}` for each on-site tensor, see :func:`norm_metric_1x1`.
+    The norm of the preconditioned gradient of each on-site tensor is bounded by the norm
+    of the on-site tensor. Otherwise, the regularized inverse of the metric, amplifying
+    directions with small eigenvalues, leads to steps much larger than the tensor itself.
+
+    For complex on-site tensors, the gradient :math:`g` computed by PyTorch is the 
+    derivative with respect to the conjugated tensor :math:`\bar{a}`. As the first 
+    (ket) index of :math:`N` is contracted with :math:`a`, i.e. 
+    :math:`\langle\psi|\psi\rangle = a N a^\dagger`, the natural gradient is 
+    :math:`g\,G^{-1}` without further conjugation.
+
+    Only parameters, which are on-site tensors of ``state`` are preconditioned,
+    the rest of the gradient is left unchanged. For environments other than :class:`ENV`
+    the gradient is returned unchanged.
+    """
+    if not isinstance(env, ENV):
+        warnings.warn(f"Norm metric is not supported for {type(env).__name__}", RuntimeWarning)
+        return flat_grad
+    site_coords= {id(t): c for c,t in state.sites.items()}
+    pc_grad= flat_grad.clone()
+    offset= 0
+    for p in state.get_parameters():
+        numel= p.numel()
+        if id(p) in site_coords and p.dim()==5:
+            N_inv= norm_metric_1x1(site_coords[id(p)], state, env, eps=eps)
+            g= flat_grad[offset:offset+numel].view(p.size(0),-1)
+            pc_g= (g @ N_inv.to(g.dtype)).view(-1)
+            # bound the step relative to the on-site tensor
+            pc_g_norm, p_norm= pc_g.norm(), p.detach().norm()
+            if pc_g_norm>p_norm:
+                pc_g= pc_g*(p_norm/pc_g_norm)
+            pc_grad[offset:offset+numel]= pc_g
+        else:
+            log.info(f"parameter {tuple(p.size())} is not an on-site tensor, not preconditioned")
+        offset+= numel
+    return pc_grad
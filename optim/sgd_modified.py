@@ -154,7 +154,7 @@ class SGD_MOD(SGD):
         for p in self._params:
             numel = p.numel()
             # view as to avoid deprecated pointwise semantics
-            p.data.add_(update[offset:offset + numel].view_as(p), alpha=step_size)
+            p.add_(update[offset:offset + numel].view_as(p), alpha=step_size)
             offset += numel
         assert offset == self._numel()
 
@@ -163,10 +163,10 @@ class SGD_MOD(SGD):
 
     def _set_param(self, params_data):
         for p, pdata in zip(self._params, params_data):
-            p.data.copy_(pdata)
+            p.copy_(pdata)
 
     @torch.no_grad()
-    def step_2c(self, closure, closure_linesearch=None):
+    def step_2c(self, closure, closure_linesearch=None, precondition_fn=None):
         r"""
         Performs a single optimization step.
 
@@ -175,6 +175,10 @@ class SGD_MOD(SGD):
         :param closure_linesearch: A closure that reevaluates the model and returns 
             the loss in torch.no_grad context
         :type closure_linesearch: callable, optional 
+        :param precondition_fn: A function mapping flattened gradient to the preconditioned
+            gradient, called after ``closure``. The step is taken along the preconditioned 
+            gradient, while the line search uses its projection on the original gradient.
+        :type precondition_fn: callable, optional
         """
         loss = None
         with torch.enable_grad():
@@ -189,18 +193,18 @@ class SGD_MOD(SGD):
         line_search_eps= self.param_groups[0]['line_search_eps']
         
         flat_grad= self._gather_flat_grad()
-        d_p= flat_grad.clone()
+        d_p= flat_grad.clone() if precondition_fn is None else precondition_fn(flat_grad)
         p= self._gather_flat_params()
         if weight_decay != 0:
-            d_p.add_(weight_decay, p.data)
+            d_p.add_(p.data, alpha=weight_decay)
         if momentum != 0:
             if self._momentum_buffer==None:
                 buf = self._momentum_buffer = torch.clone(d_p).detach()
             else:
                 buf = self._momentum_buffer
-                buf.mul_(momentum).add_(1 - dampening, d_p)
+                buf.mul_(momentum).add_(d_p, alpha=1 - dampening)
             if nesterov:
-                d_p = d_p.add(momentum, buf)
+                d_p = d_p.add(buf, alpha=momentum)
             else:
                 d_p = buf
 
@@ -212,7 +216,8 @@ class SGD_MOD(SGD):
             if line_search_fn == "backtracking":
                 d_p.mul_(-1)
                 x_init = self._clone_param()
-                gtd = flat_grad.dot(d_p)
+                gtd = torch.real(flat_grad.conj().dot(d_p)) if flat_grad.is_complex() \
+                    else flat_grad.dot(d_p)
 
                 def obj_func(t, x, d):
                     return self._directional_evaluate_derivative_free(closure_linesearch, t, x, d)
@@ -0,0 +1,84 @@
+import torch
+import logging
+log = logging.getLogger(__name__)
+
+class SharedBroadcast():
+    def __init__(self, **tensors):
+        r"""
+        :param tensors: named tensors, i.e. coefficients of the state or environment tensors,
+                        which define the shapes and dtypes of broadcasted data
+        :type tensors: torch.Tensor
+
+        Allocate buffers for each of the named ``tensors`` in shared memory
+        together with a version counter. The manager process publishes current data
+        once per gradient evaluation by :meth:`publish` and worker processes map them
+        without copy by :meth:`get`.
+
+        The object is passed to worker processes through ``torch.multiprocessing``,
+        i.e. by ``Pipe.send`` or as an argument of ``Process``. In either case, the worker
+        maps the same shared memory. Hence, the object has to be created before
+        the workers receive it and its buffers are never reallocated.
+
+        Publishing is not synchronized with readers. The manager should publish the data
+        only while no worker reads it and notify workers afterwards, for example
+        by sending them new tasks::
+
+            # manager
+            shared= SharedBroadcast(C=env.get_C(), T=env.get_T())
+            for p in pipes_to_workers: p.send(shared)
+            ...
+            shared.publish(C=env.get_C(), T=env.get_T())
+            dist.send(task, dst=worker)
+
+            # worker
+            shared= pipe.recv()
+            ...
+            dist.recv(task, src=0)
+            ts= shared.get()
+        """
+        self.buffers= {k: torch.zeros(t.size(), dtype=t.dtype, device='cpu').share_memory_()\
+            for k,t in tensors.items()}
+        self._version= torch.zeros(1, dtype=torch.long, device='cpu').share_memory_()
+
+    @property
+    def version(self):
+        r"""
+        :return: number of publish operations so far
+        :rtype: int
+        """
+        return int(self._version[0])
+
+    def publish(self, **tensors):
+        r"""
+        :param tensors: named tensors with the same shapes and dtypes as supplied
+                        on construction
+        :type tensors: torch.Tensor
+        :return: new version
+        :rtype: int
+
+        Copy ``tensors`` into shared buffers and increment the version.
+        """
+        for k,t in tensors.items():
+            if k not in self.buffers:
+                raise ValueError(f"Unknown tensor {k}")
+            if t.size()!=self.buffers[k].size() or t.dtype!=self.buffers[k].dtype:
+                raise ValueError(f"Tensor {k} {t.dtype} {tuple(t.size())} does not match "\
+                    +f"shared buffer {self.buffers[k].dtype} {tuple(self.buffers[k].size())}")
+            self.buffers[k].copy_(t.detach())
+        self._version+= 1
+        log.info(f"published version {self.version}")
+        return self.version
+
+    def get(self, version=None):
+        r"""
+        :param version: expected version. If ``None``, the version is not checked
+        :type version: int
+        :return: named tensors as views into shared memory
+        :rtype: dict[str, torch.Tensor]
+
+        The returned tensors are not copies. Do not modify them in-place.
+        Clone them instead, i.e. before perturbing coefficients of the state.
+        """
+        if version is not None and version!=self.version:
+            raise RuntimeError(f"Expected version {version}, shared data has version {self.version}")
+        return dict(self.buffers)
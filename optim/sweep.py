@@ -0,0 +1,107 @@
+import time
+import torch.multiprocessing as mp
+import logging
+log = logging.getLogger(__name__)
+
+def split_path(points, n_branches):
+    r"""
+    :param points: parameter path, a sequence of points
+    :param n_branches: number of branches
+    :type points: list[dict]
+    :type n_branches: int
+    :return: contiguous segments of the path
+    :rtype: list[list[dict]]
+
+    Splits the path into ``n_branches`` contiguous segments of (almost) equal length.
+    Within each segment, the points are visited in their original order and each point
+    is warm-started from the previous one.
+    """
+    n_branches= max(1, min(n_branches, len(points)))
+    n, r= divmod(len(points), n_branches)
+    branches, i0= [], 0
+    for b in range(n_branches):
+        i1= i0 + n + (1 if b<r else 0)
+        branches.append(list(points[i0:i1]))
+        i0= i1
+    return branches
+
+def run_branch(run_point, points, state=None, env=None):
+    r"""
+    :param run_point: function optimizing the state at single point of the path
+    :param points: points of the branch
+    :param state: initial wavefunction for the first point. If ``None``, ``run_point``
+                  creates its own initial state
+    :param env: initial environment for the first point
+    :type run_point: function(dict,IPEPS,ENV)->(IPEPS,ENV,dict)
+    :type points: list[dict]
+    :return: records for each point of the branch
+    :rtype: list[dict]
+
+    Walks the points of the branch in order. At every point, ``run_point(params, state, env)``
+    is called with the optimized state and the converged environment returned at the previous
+    point and returns the optimized state, its environment and a dictionary of results.
+    The record of each point contains the parameters of the point, the results and
+    the total wall time ``"t"`` in seconds.
+    """
+    records= []
+    for params in points:
+        t0= time.perf_counter()
+        state, env, result= run_point(dict(params), state, env)
+        t1= time.perf_counter()
+        records.append(dict(params, **result, t=t1-t0))
+        log.info(records[-1])
+    return records
+
+def _run_branch_worker(run_point, points):
+    # states and environments do not cross process boundaries, only the records
+    return run_branch(run_point, points)
+
+def run_sweep(run_point, branches, n_workers=1, out_file=None):
+    r"""
+    :param run_point: function optimizing the state at single point of the path,
+                      see :func:`run_branch`
+    :param branches: independent branches of the sweep, each a sequence of points
+    :param n_workers: number of worker processes
+    :param out_file: file to write the table of results to
+    :type run_point: function(dict,IPEPS,ENV)->(IPEPS,ENV,dict)
+    :type branches: list[list[dict]]
+    :type n_workers: int
+    :type out_file: str
+    :return: records of all points, ordered by branch and position within branch
+    :rtype: list[dict]
+
+    Each branch is walked by :func:`run_branch`, warm-starting every point from the state
+    and environment of the previous one. Independent branches are distributed over
+    ``n_workers`` processes. Since worker processes are spawned, ``run_point`` has to
+    be picklable, i.e. defined at the top level of a module, and it has to configure
+    :mod:`config` by itself.
+    """
+    if n_workers>1 and len(branches)>1:
+        ctx= mp.get_context('spawn')
+        with ctx.Pool(min(n_workers,len(branches))) as pool:
+            results= pool.starmap(_run_branch_worker, [(run_point, b) for b in branches])
+    else:
+        results= [run_branch(run_point, b) for b in branches]
+
+    records= [r for branch_records in results for r in branch_records]
+    if out_file:
+        write_sweep_table(records, out_file)
+    return records
+
+def write_sweep_table(records, out_file):
+    r"""
+    :param records: records of the sweep
+    :param out_file: output file
+    :type records: list[dict]
+    :type out_file: str
+
+    Writes records as a single whitespace-separated table with a header line, listing
+    the columns in order of their first appearance. Missing entries are written as ``nan``.
+    """
+    cols= []
+    for r in records:
+        cols+= [k for k in r.keys() if k not in cols]
+    with open(out_file, "w") as f:
+        f.write("# "+" ".join(cols)+"\n")
+        for r in records:
+            f.write(" ".join(f"{r.get(c, float('nan'))}" for c in cols)+"\n")
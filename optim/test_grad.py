@@ -1,4 +1,5 @@
 import copy
+from concurrent.futures import ThreadPoolExecutor
 import time
 import json
 import logging
@@ -198,4 +199,111 @@ def test_grad_fd(state, ctm_env_in, chis, loss_fn,
         print(f"test_grad_fd g X={c} |g|= {torch.norm(g)} |g-g0|= {torch.norm(g-ref_g)}"\
             +f" g.g0= {g.dot(ref_g)} angle= {overlap}")
 
-    return grad_fd
\ No newline at end of file
+    return grad_fd
+
+
+def test_grad_projected(state, ctm_env_in, chis, loss_fn, n_dirs=4, n_workers=1,
+    main_args=cfg.main_args, ctm_args=cfg.ctm_args, opt_args=cfg.opt_args, 
+    global_args=cfg.global_args):
+    r"""
+    :param state: initial wavefunction
+    :param ctm_env_in: initial environment
+    :param chis: list of environment dimensions
+    :param loss_fn: loss function
+    :param n_dirs: number of random directions per parameter tensor
+    :param n_workers: number of threads evaluating finite differences
+    :param main_args: parsed command line arguments
+    :param ctm_args: CTM algorithm configuration
+    :param opt_args: optimization configuration
+    :param global_args: global configuration
+    :type state: IPEPS
+    :type chis: list(int)
+    :type ctm_env_init: ENV
+    :type loss_fn: function(IPEPS,ENV,CTMARGS,OPTARGS,GLOBALARGS)->torch.tensor
+    :type n_dirs: int
+    :type n_workers: int
+    :type main_args: MAINARGS
+    :type ctm_args: CTMARGS
+    :type opt_args: OPTARGS
+    :type global_args: GLOBALARGS
+    :return: for each ``chi``, AD gradient and a report for each parameter tensor (block)
+             with projections of AD gradient ``"ad"`` and finite-difference 
+             derivatives ``"fd"`` along random directions
+    :rtype: dict
+
+    Verifies AD gradient of ``loss_fn`` against finite differences along random directions.
+    For each ``chi``, the environment is converged only once, together with AD gradient. 
+    Then, for every parameter tensor, ``n_dirs`` random unit directions :math:`v` supported 
+    on that tensor are drawn and the central difference 
+    :math:`[L(x+\epsilon v)-L(x-\epsilon v)]/2\epsilon`, with :math:`\epsilon` given by 
+    ``opt_args.fd_eps``, is compared with the projection :math:`g_{AD}\cdot v`. 
+    The displaced losses are evaluated by ``n_workers`` threads, each starting CTM from a copy 
+    of the converged environment (``opt_ctm_reinit`` is disabled). 
+    Hence, the cost does not scale with the number of variational parameters.
+    """
+    report= dict()
+    context= dict({"ctm_args":ctm_args, "opt_args":opt_args})
+    loc_opt_args= copy.deepcopy(opt_args)
+    loc_opt_args.opt_ctm_reinit= False
+    loc_context= dict({"ctm_args":ctm_args, "opt_args":loc_opt_args})
+    parameters= list(state.get_parameters())
+    eps= opt_args.fd_eps
+
+    def eval_displaced(ctm_env0, b, v, sign):
+        # each displacement acts on independent copies of state and environment
+        loc_state= copy.deepcopy(state)
+        loc_env= copy.deepcopy(ctm_env0)
+        with torch.no_grad():
+            list(loc_state.get_parameters())[b].add_(sign*eps*v)
+            loss1, *ctm_log= loss_fn(loc_state, loc_env, loc_context)
+        return float(loss1)
+
+    for i,chi in enumerate(chis):
+        for A in parameters: 
+            A.requires_grad_(True)
+            A.grad= None
+
+        # 1) converge environment and evaluate AD gradient once
+        t_grad0= time.perf_counter()
+        current_env= ctm_env_in.extend(chi, ctm_args=ctm_args, global_args=global_args)
+        loss, ctm_env, *ctm_log = loss_fn(state, current_env, context)
+        loss.backward()
+        grad_ad= [A.grad.clone() if A.grad is not None else torch.zeros_like(A) \
+            for A in parameters]
+        ctm_env= ctm_env.detach()
+        t_grad1= time.perf_counter()
+
+        # 2) draw random directions supported on individual parameter tensors
+        tasks= []
+        for b,A in enumerate(parameters):
+            for d in range(n_dirs):
+                v= torch.rand_like(A)-0.5
+                v= v/v.norm()
+                tasks.append((b, v, (grad_ad[b].conj()*v).sum().real.item()))
+
+        # 3) evaluate central differences
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures= [(executor.submit(eval_displaced, ctm_env, b, v, 1.),\
+                executor.submit(eval_displaced, ctm_env, b, v, -1.)) for b,v,_ in tasks]
+            fd= [(fp.result()-fm.result())/(2*eps) for fp,fm in futures]
+        t_fd1= time.perf_counter()
+
+        # 4) report per parameter tensor
+        blocks= []
+        for b in range(len(parameters)):
+            ad_b= torch.as_tensor([t[2] for t,_ in zip(tasks,fd) if t[0]==b], dtype=torch.float64)
+            fd_b= torch.as_tensor([f for t,f in zip(tasks,fd) if t[0]==b], dtype=torch.float64)
+            rel_err= (ad_b-fd_b).norm()/max(fd_b.norm(), ad_b.norm(), 1.0e-16)
+            blocks.append(dict({"ad": ad_b, "fd": fd_b, "rel_err": rel_err.item()}))
+            print(f"test_grad_projected X= {chi} block= {b} |g_ad|= {grad_ad[b].norm()}"\
+                +f" rel_err= {rel_err}")
+
+        if opt_args.opt_logging:
+            log_entry=dict({"id": f"test_grad_projected-{i}", "chi": chi, \
+                "t_grad": t_grad1-t_grad0, "t_fd": t_fd1-t_grad1})
+            log.info(json.dumps(log_entry))
+
+        report[chi]= dict({"grad_ad": grad_ad, "blocks": blocks})
+        ctm_env_in= ctm_env
+
+    return report
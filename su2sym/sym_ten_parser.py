@@ -1,5 +1,11 @@
 import torch
 import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import logging
+log = logging.getLogger(__name__)
 
 def parse_meta(s):
     f1=s[1:].split(", \'")
@@ -108,6 +114,86 @@ def parse_symten_file(infile):
         data = f.read().replace('\n', '')
         return parse_classification(data)
 
+def _symten_cache_file(infile, digest):
+    # binary caches are kept in __symtencache__ next to the basis files, unless
+    # the directory is given by environment variable PEPS_TORCH_SYMTEN_CACHE
+    cache_dir= os.environ.get("PEPS_TORCH_SYMTEN_CACHE", \
+        os.path.join(os.path.dirname(os.path.abspath(infile)), "__symtencache__"))
+    return os.path.join(cache_dir, f"{os.path.basename(infile)}.{digest[:16]}.npz")
+
+def load_symten_file(infile):
+    r"""
+    :param infile: file with the basis of symmetric tensors
+    :type infile: str
+    :return: list of symmetric tensors, each given by its metadata, 
+             indices of non-zero elements and their values
+    :rtype: list[tuple(dict, numpy.ndarray, numpy.ndarray)]
+
+    Read the basis of symmetric tensors through a binary cache. On first call, 
+    ``infile`` is parsed by :meth:`parse_symten_file` and converted into 
+    arrays of COO indices and values, which are stored together with metadata and 
+    the hash of ``infile``. Any later call with the same content of ``infile`` 
+    loads the arrays directly. If the cache cannot be written, the basis is 
+    parsed anew on each call.
+    """
+    with open(infile,"rb") as f:
+        raw= f.read()
+    digest= hashlib.sha1(raw).hexdigest()
+    cache_file= _symten_cache_file(infile, digest)
+
+    try:
+        with np.load(cache_file) as c:
+            if str(c["hash"])==digest:
+                ptr, inds, vals= c["ptr"], c["inds"], c["vals"]
+                symtens= []
+                for i,meta in enumerate(json.loads(str(c["meta"]))):
+                    v= vals[ptr[i]:ptr[i+1]]
+                    # values were promoted to common dtype
+                    if np.iscomplexobj(v) and not v.imag.any(): v= v.real.copy()
+                    symtens.append((meta, inds[ptr[i]:ptr[i+1]], v))
+                return symtens
+    except (OSError, ValueError, KeyError):
+        pass
+
+    symtens= []
+    for meta,elems in parse_classification(raw.decode("utf-8").replace('\n', '')):
+        inds= np.asarray([e[0] for e in elems], dtype=np.int64).reshape(len(elems),-1) \
+            if len(elems)>0 else np.zeros((0,0), dtype=np.int64)
+        vals= np.asarray([e[1] for e in elems])
+        if not np.iscomplexobj(vals): vals= vals.astype(np.float64)
+        symtens.append((meta, inds, vals))
+
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_file= tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            rank= max([inds.shape[1] for _,inds,_ in symtens], default=1)
+            np.savez(f, hash=np.asarray(digest),\
+                meta=np.asarray(json.dumps([meta for meta,_,_ in symtens])),\
+                ptr=np.cumsum([0]+[len(vals) for _,_,vals in symtens]),\
+                inds=np.concatenate([inds.reshape(-1,rank) for _,inds,_ in symtens]),\
+                vals=np.concatenate([vals for _,_,vals in symtens]))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        log.warning(f"Failed to cache symmetric tensors of {infile}: {e}")
+    return symtens
+
+def fill_from_sparse_coo_np(t, inds, vals):
+    r"""
+    :param t: tensor to fill
+    :param inds: indices of non-zero elements
+    :param vals: values of non-zero elements
+    :type t: torch.tensor
+    :type inds: numpy.ndarray
+    :type vals: numpy.ndarray
+
+    Vectorized counterpart of :meth:`fill_from_sparse_coo`.
+    """
+    if len(vals)==0: return t
+    t[tuple(torch.as_tensor(inds.T, device=t.device))]= \
+        torch.as_tensor(vals, device=t.device).to(t.dtype)
+    return t
+
 def fill_from_sparse_coo_FIX(t,elems):
     """
     :param elems: non-zero elements defined in COO format (tuple(indices),value)
@@ -127,12 +213,15 @@ def import_sym_tensors_FIX(p, D, pg, infile=None, dtype=torch.float64, device='c
 
     infile= f"{os.path.dirname(__file__)}/D{D}.txt" if infile is None else infile 
 
-    tensors_coo= parse_symten_file(infile)
-    for tcoo in tensors_coo:
-        if pg==tcoo[0]["meta"]["pg"]:
+    # indices of all elements are shifted to 0-based, except for the first element
+    # (inds[0]) which is left unchanged, see fill_from_sparse_coo_FIX
+    for meta,inds,vals in load_symten_file(infile):
+        if pg==meta["meta"]["pg"]:
+            inds= inds-1
+            if len(inds)>0: inds[0]+= 1
             t= torch.zeros(dims, dtype=dtype, device=device)
-            t= fill_from_sparse_coo_FIX(t, tcoo[1])
-            tensors.append((tcoo[0],t))
+            t= fill_from_sparse_coo_np(t, inds, vals)
+            tensors.append((meta,t))
 
     return tensors
 
@@ -151,23 +240,21 @@ def import_sym_tensors(p, D, pg, infile=None, dtype=torch.float64, device='cpu')
 
     infile= f"{os.path.dirname(__file__)}/D{D}.txt" if infile is None else infile 
 
-    tensors_coo= parse_symten_file(infile)
-    for tcoo in tensors_coo:
-        if pg==tcoo[0]["meta"]["pg"]:
+    for meta,inds,vals in load_symten_file(infile):
+        if pg==meta["meta"]["pg"]:
             t= torch.zeros(dims, dtype=dtype, device=device)
-            t= fill_from_sparse_coo(t, tcoo[1])
-            tensors.append((tcoo[0],t))
+            t= fill_from_sparse_coo_np(t, inds, vals)
+            tensors.append((meta,t))
 
     return tensors
 
 def import_sym_tensors_generic(dims, pg, infile, dtype=torch.float64, device='cpu'):
     tensors=[] 
-    tensors_coo= parse_symten_file(infile)
-    for tcoo in tensors_coo:
-        if pg==tcoo[0]["meta"]["pg"]:
+    for meta,inds,vals in load_symten_file(infile):
+        if pg==meta["meta"]["pg"]:
             t= torch.zeros(dims, dtype=dtype, device=device)
-            t= fill_from_sparse_coo(t, tcoo[1])
-            tensors.append((tcoo[0],t))
+            t= fill_from_sparse_coo_np(t, inds, vals)
+            tensors.append((meta,t))
 
     return tensors
 
@@ -177,13 +264,11 @@ def import_sym_bonds(D, pg=None, infile=None, dtype=torch.float64, device='cpu')
 
     infile= f"{os.path.dirname(__file__)}/D{D}_bonds.txt" if infile is None else infile 
 
-    tensors_coo= parse_symten_file(infile)
-    print(tensors_coo)
-    for tcoo in tensors_coo:
-        if not pg==None and not pg==tcoo[0]["meta"]["pg"]: continue
+    for meta,inds,vals in load_symten_file(infile):
+        if not pg==None and not pg==meta["meta"]["pg"]: continue
         t= torch.zeros(dims, dtype=dtype, device=device)
-        t= fill_from_sparse_coo(t, tcoo[1])
+        t= fill_from_sparse_coo_np(t, inds, vals)
         t= torch.squeeze(t)
-        tensors.append((tcoo[0],t))
+        tensors.append((meta,t))
 
     return tensors
\ No newline at end of file
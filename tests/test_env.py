@@ -0,0 +1,168 @@
+import context
+import os
+import unittest
+import torch
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+from ctm.generic import ctmrg
+
+class TestEnv(unittest.TestCase):
+    chi= 16
+
+    def test_env_save_load(self):
+        import tempfile
+        torch.manual_seed(1)
+        sites= {(x,y): torch.rand(2,3,3,3,3,dtype=torch.float64)-0.2 for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        env, *ctm_log= ctmrg.run(state, env, conv_check=ctmrg_conv_specC)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputfile= os.path.join(tmp_dir, "env.json")
+            env.save(outputfile, state=state)
+            env_r= ENV.load(outputfile, state=state)
+            for ts, ts_r in [(env.C,env_r.C), (env.T,env_r.T)]:
+                self.assertEqual(ts.keys(), ts_r.keys())
+                for k in ts.keys():
+                    self.assertTrue(torch.equal(ts[k], ts_r[k]))
+            # stored environment belongs to a different state
+            state_p= IPEPS({c: t.clone() for c,t in sites.items()},\
+                vertexToSite=state.vertexToSite, lX=2, lY=2)
+            state_p.sites[(1,1)][0,0,0,0,0]+= 1.0e-12
+            with self.assertRaises(ValueError):
+                read_env(outputfile, state=state_p)
+            with self.assertWarns(Warning):
+                read_env(outputfile, state=state_p, strict=False)
+            # stored environment is extended or compressed to requested chi
+            for chi in [self.chi+4, self.chi-4]:
+                env_r= read_env(outputfile, state=state, chi=chi)
+                self.assertEqual(env_r.chi, chi)
+                self.assertTrue(all(t.size(0)==chi for t in env_r.C.values()))
+
+    def test_env_packed(self):
+        import tempfile
+        from ctm.generic import rdm
+        torch.manual_seed(1)
+        sites= {(x,y): torch.rand(2,3,3,3,3,dtype=torch.float64)-0.2 for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        env_ref, *ctm_log= ctmrg.run(state, env.clone(), conv_check=ctmrg_conv_specC)
+        cfg.ctm_args.ctm_pack_env= True
+        try:
+            env, *ctm_log= ctmrg.run(state, env, conv_check=ctmrg_conv_specC)
+        finally:
+            cfg.ctm_args.ctm_pack_env= False
+        self.assertTrue(env.is_packed())
+        buffer, layout= env.get_packed()
+        self.assertEqual(buffer.numel(), sum(t.numel() for ts in [env.C,env.T] for t in ts.values()))
+        for ts, ts_ref in [(env.C,env_ref.C), (env.T,env_ref.T)]:
+            for k in ts_ref.keys():
+                self.assertTrue(torch.equal(ts[k], ts_ref[k]))
+
+        env_c= env.clone()
+        self.assertTrue(env_c.is_packed())
+        self.assertNotEqual(env_c.get_packed()[0].data_ptr(), buffer.data_ptr())
+        self.assertTrue(all(torch.equal(env_c.T[k], t) for k,t in env.T.items()))
+        env_d= ENV.from_packed(env.chi, env.detach().get_packed()[0].clone().share_memory_(), layout)
+        self.assertTrue(env_d.is_packed())
+        self.assertTrue(torch.allclose(rdm.rdm2x2((0,0),state,env_d), rdm.rdm2x2((0,0),state,env_ref)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputfile= os.path.join(tmp_dir, "env.json")
+            env.save(outputfile, state=state)
+            env_r= ENV.load(outputfile, state=state)
+            self.assertTrue(env_r.is_packed())
+            self.assertTrue(all(torch.equal(env_r.C[k], t) for k,t in env.C.items()))
+
+        # replacing any of the tensors, i.e. by CTM, unpacks the environment
+        env_c.C[((0,0),(-1,-1))]= env_c.C[((0,0),(-1,-1))].clone()
+        self.assertFalse(env_c.is_packed())
+
+    def test_env_out_of_core(self):
+        import tempfile
+        from ctm.generic.env_ooc import OutOfCoreStore
+        torch.manual_seed(1)
+        sites= {(x,y): torch.rand(2,3,3,3,3,dtype=torch.float64)-0.2 for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        cfg.ctm_args.projector_method= '4X2'
+        try:
+            env_ref, *ctm_log= ctmrg.run(state, env.clone(), conv_check=ctmrg_conv_specC)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cfg.ctm_args.ctm_out_of_core= True
+                cfg.ctm_args.ctm_out_of_core_dir= tmp_dir
+                env, *ctm_log= ctmrg.run(state, env, conv_check=ctmrg_conv_specC)
+                # memory-mapped files are unlinked right after they are created
+                self.assertEqual(os.listdir(tmp_dir), [])
+        finally:
+            cfg.ctm_args.projector_method= '4X4'
+            cfg.ctm_args.ctm_out_of_core= False
+            cfg.ctm_args.ctm_out_of_core_dir= 'None'
+        for ts, ts_ref in [(env.C,env_ref.C), (env.T,env_ref.T)]:
+            for k in ts_ref.keys():
+                self.assertTrue(torch.equal(ts[k], ts_ref[k]))
+
+        # Up move does not need tensors on the bottom side, Left move on the right side
+        store= OutOfCoreStore()
+        cfg.ctm_args.projector_method= '4X2'
+        try:
+            store.require(env, (0,-1))
+            self.assertFalse(any(store._is_spilled(env.C,"C",k) for k in env.C.keys() if k[1][1]<1))
+            self.assertTrue(all(store._is_spilled(env.C,"C",k) for k in env.C.keys() if k[1][1]==1))
+            self.assertTrue(torch.equal(env.T[((0,0),(0,1))], env_ref.T[((0,0),(0,1))]))
+            store.prefetch(env, (-1,0))
+            store.require(env, (-1,0))
+            self.assertFalse(any(store._is_spilled(env.T,"T",k) for k in env.T.keys() if k[1][0]<1))
+            self.assertTrue(all(store._is_spilled(env.T,"T",k) for k in env.T.keys() if k[1][0]==1))
+        finally:
+            cfg.ctm_args.projector_method= '4X4'
+            store.close(env)
+        self.assertFalse(any(store._is_spilled(env.T,"T",k) for k in env.T.keys()))
+        self.assertTrue(all(torch.equal(env.T[k], t) for k,t in env_ref.T.items()))
+
+    @unittest.skipIf(not torch.cuda.is_available(), "CUDA not available")
+    def test_env_out_of_core_gpu(self):
+        import tempfile
+        torch.manual_seed(1)
+        sites= {(x,y): torch.rand(2,3,3,3,3,dtype=torch.float64,device='cuda:0')-0.2 \
+            for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        cfg.ctm_args.projector_method= '4X2'
+        try:
+            env_ref, *ctm_log= ctmrg.run(state, env.clone(), conv_check=ctmrg_conv_specC)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cfg.ctm_args.ctm_out_of_core= True
+                cfg.ctm_args.ctm_out_of_core_dir= tmp_dir
+                # convergence check is evaluated with all tensors on device
+                env, *ctm_log= ctmrg.run(state, env, conv_check=ctmrg_conv_specC)
+        finally:
+            cfg.ctm_args.projector_method= '4X4'
+            cfg.ctm_args.ctm_out_of_core= False
+            cfg.ctm_args.ctm_out_of_core_dir= 'None'
+        for ts, ts_ref in [(env.C,env_ref.C), (env.T,env_ref.T)]:
+            for k in ts_ref.keys():
+                self.assertEqual(ts[k].device, ts_ref[k].device)
+                self.assertTrue(torch.allclose(ts[k], ts_ref[k]))
+
+    def test_compress_env(self):
+        from ctm.generic import rdm, rdm_looped
+        torch.manual_seed(1)
+        sites= {(x,y): torch.rand(2,3,3,3,3,dtype=torch.float64)-0.2 for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        env, *ctm_log= ctmrg.run(state, env, conv_check=ctmrg_conv_specC)
+
+        env_c, err= compress_env(state, env, 4)
+        self.assertEqual(env_c.chi, 4)
+        self.assertTrue(all(c.size()==(4,4) for c in env_c.C.values()))
+        for coord in state.sites.keys():
+            for f in [rdm.rdm2x2, rdm.rdm2x2_NNN_11, rdm_looped.rdm2x3_loop_oe]:
+                R= f(coord, state, env)
+                R_c= f(coord, state, env_c)
+                self.assertLess((R-R_c).abs().max().item(), 10*err+1.0e-6)
@@ -0,0 +1,29 @@
+import context
+import unittest
+import torch
+from ipeps.ipeps import IPEPS
+from ctm.generic.env import ENV, init_env
+from ctm.generic import ctmrg
+from optim.norm_metric import norm_metric_1x1, precondition_norm_metric
+
+class TestNormMetric(unittest.TestCase):
+    chi= 16
+
+    def test_precondition_norm_metric_complex(self):
+        # for the loss -log(a G a^\dag), the natural gradient G^{-1}g is parallel 
+        # to the on-site tensor a
+        torch.manual_seed(1)
+        a= torch.rand(2,2,2,2,2,dtype=torch.complex128)-(0.5+0.5j)
+        state= IPEPS({(0,0): a})
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        env, *ctm_log= ctmrg.run(state, env)
+
+        eps= 1.0e-8
+        G= torch.linalg.inv(norm_metric_1x1((0,0), state, env, eps=eps))
+        a_v= a.detach().clone().view(a.size(0),-1).requires_grad_(True)
+        loss= -torch.log(torch.einsum('pk,kb,pb->',a_v,G,a_v.conj()).real)
+        loss.backward()
+        pc_g= precondition_norm_metric(state, env, a_v.grad.view(-1), eps=eps)
+        overlap= torch.vdot(pc_g, a.view(-1))/(pc_g.norm()*a.norm())
+        self.assertTrue(abs(overlap+1)<1.0e-6)
@@ -0,0 +1,36 @@
+import context
+import unittest
+import torch
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+from ctm.generic import ctmrg
+
+class TestObsContext(unittest.TestCase):
+    chi= 16
+
+    def test_obs_context_4SITE(self):
+        from ctm.generic import rdm
+        from ctm.generic.obs_context import OBS_CONTEXT
+        def lattice_to_site(coord):
+            return (coord[0]%2, coord[1]%2)
+        sites= {(x,y): torch.rand(2,2,2,2,2,dtype=torch.float64)-0.5 for x in range(2) \
+            for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lattice_to_site)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        env, *ctm_log= ctmrg.run(state, env)
+
+        obs_ctx= OBS_CONTEXT(state, env)
+        for coord in state.sites.keys():
+            self.assertTrue(torch.allclose(obs_ctx.rdm1x1(coord), rdm.rdm1x1(coord,state,env)))
+            self.assertTrue(torch.allclose(obs_ctx.rdm2x1(coord), rdm.rdm2x1(coord,state,env)))
+            self.assertTrue(torch.allclose(obs_ctx.rdm1x2(coord), rdm.rdm1x2(coord,state,env)))
+            self.assertTrue(torch.allclose(obs_ctx.rdm2x2(coord, open_sites=[0,3]), \
+                rdm.rdm2x2(coord,state,env,open_sites=[0,3])))
+        
+        # modification of state invalidates intermediates
+        with torch.no_grad():
+            state.sites[(0,0)].mul_(-1)
+            state.sites[(0,0)][0,0,0,0,0]+= 0.5
+        self.assertTrue(torch.allclose(obs_ctx.rdm1x1((0,0)), rdm.rdm1x1((0,0),state,env)))
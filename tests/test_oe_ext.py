@@ -0,0 +1,155 @@
+import context
+import unittest
+import torch
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+
+class TestOeExt(unittest.TestCase):
+    chi= 16
+
+    def test_oe_path_cache(self):
+        import tempfile
+        from ctm.generic import rdm
+        from oe_ext.path_cache import get_path_cache
+        from oe_ext.oe_ext import _get_contraction_path_cached
+        _get_contraction_path_cached.cache_clear()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cfg.global_args.oe_path_cache= cache_dir
+            try:
+                sites= {(0,0): torch.rand(2,2,2,2,2,dtype=torch.float64)}
+                state= IPEPS(sites)
+                env= ENV(self.chi, state)
+                init_env(state, env)
+                rdm_ref= rdm.rdm2x2_oe((0,0), state, env)
+                self.assertEqual(len(get_path_cache()), 1)
+
+                # the path is found in the persistent cache, by-passing the in-memory cache
+                _get_contraction_path_cached.cache_clear()
+                self.assertTrue(torch.allclose(rdm.rdm2x2_oe((0,0), state, env), rdm_ref))
+                self.assertEqual(len(get_path_cache()), 1)
+            finally:
+                cfg.global_args.oe_path_cache= 'None'
+
+    def test_oe_path_cache_prewarm(self):
+        import os, sys, subprocess, tempfile
+        from unittest import mock
+        import opt_einsum as oe
+        from ctm.generic import rdm
+        from oe_ext.path_cache import PathCache, get_path_cache, prewarm
+        from oe_ext.oe_ext import _get_contraction_path_cached
+        # the key depends on the settings of the path optimizer
+        self.assertNotEqual(PathCache.optimizer_settings(oe.DynamicProgramming(minimize="flops")),\
+            PathCache.optimizer_settings(oe.DynamicProgramming(minimize="size")))
+
+        _get_contraction_path_cached.cache_clear()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cfg.global_args.oe_path_cache= cache_dir
+            try:
+                prewarm([2], [self.chi], ["rdm2x2_oe"])
+                self.assertEqual(len(get_path_cache()), 1)
+
+                # the prewarmed path is used, without searching for the path again
+                _get_contraction_path_cached.cache_clear()
+                sites= {(0,0): torch.rand(2,2,2,2,2,dtype=torch.float64)}
+                state= IPEPS(sites)
+                env= ENV(self.chi, state)
+                init_env(state, env)
+                with mock.patch("opt_einsum.contract_path", side_effect=AssertionError(\
+                    "path not found in the persistent cache")):
+                    rdm.rdm2x2_oe((0,0), state, env)
+                self.assertEqual(len(get_path_cache()), 1)
+            finally:
+                cfg.global_args.oe_path_cache= 'None'
+                _get_contraction_path_cached.cache_clear()
+
+        # command line interface
+        with tempfile.TemporaryDirectory() as cache_dir:
+            res= subprocess.run([sys.executable, "-m", "oe_ext.path_cache", cache_dir,\
+                "--D", "2", "--chi", str(self.chi), "--networks", "rdm2x2_oe"],\
+                cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),\
+                capture_output=True, text=True)
+            self.assertEqual(res.returncode, 0, res.stderr)
+            self.assertIn(f"1 paths in {cache_dir}", res.stdout)
+            self.assertEqual(len(PathCache(cache_dir)), 1)
+
+    def test_rdm2x2_oe_auto_unroll(self):
+        import opt_einsum as oe
+        from ctm.generic import rdm
+        from oe_ext.oe_ext import get_unroll_for_memory_target, contract_with_unroll
+
+        # chain of matrices with large intermediate
+        tn= torch.rand(4,64),[0,1],torch.rand(64,64),[1,2],torch.rand(64,4),[2,3],[0,3]
+        unroll= get_unroll_for_memory_target(*tn, memory_target=64*64+100)
+        self.assertTrue(len(unroll)>0)
+        self.assertTrue(torch.allclose(contract_with_unroll(*tn,unroll=unroll,backend='torch'),\
+            oe.contract(*tn,backend='torch')))
+
+        sites= {(0,0): torch.rand(2,2,2,2,2,dtype=torch.float64)}
+        state= IPEPS(sites)
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        rdm_ref= rdm.rdm2x2_oe((0,0), state, env)
+        cfg.global_args.oe_memory_target= 1.0e-4
+        try:
+            self.assertTrue(torch.allclose(rdm.rdm2x2_oe((0,0), state, env, unroll='auto'), rdm_ref))
+        finally:
+            cfg.global_args.oe_memory_target= 0.0
+
+    def test_rdm2x2_oe_parallel_unroll(self):
+        from ctm.generic import rdm
+        a= torch.rand(2,2,2,2,2,dtype=torch.float64,requires_grad=True)
+        state= IPEPS({(0,0): a})
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        env= env.detach()
+
+        res= []
+        try:
+            for n_workers in [1,3]:
+                cfg.global_args.oe_unroll_workers= n_workers
+                with self.assertLogs("oe_ext.oe_ext", level="INFO") as logs:
+                    R= rdm.rdm2x2_oe((0,0), state, env, unroll=[100,101,102], verbosity=2)
+                # every unrolled contraction is logged also by the parallel loop
+                self.assertEqual(sum(" unrolled loop (" in m for m in logs.output), 8)
+                (R*R).sum().backward()
+                res.append((R.detach(), a.grad.clone()))
+                a.grad= None
+        finally:
+            cfg.global_args.oe_unroll_workers= 1
+        self.assertTrue(torch.allclose(res[0][0], res[1][0]))
+        self.assertTrue(torch.allclose(res[0][1], res[1][1]))
+
+    def test_oe_compiled_expression_registry(self):
+        from ctm.generic import rdm
+        from oe_ext import oe_ext
+        oe_ext.clear_compiled_expressions()
+        state= IPEPS({(0,0): torch.rand(2,2,2,2,2,dtype=torch.float64)})
+        env= ENV(self.chi, state)
+        init_env(state, env)
+
+        R0= rdm.rdm2x2_oe((0,0), state, env, unroll=[100,101])
+        self.assertEqual(len(oe_ext._compiled_expressions), 1)
+        expr= next(iter(oe_ext._compiled_expressions.values()))
+        folded= list(expr.folded.values())
+        # constant subnetworks are reused for the same tensors
+        R1= rdm.rdm2x2_oe((0,0), state, env, unroll=[100,101])
+        self.assertTrue(all(x[1] is y[1] for x,y in zip(folded, expr.folded.values())))
+        self.assertTrue(torch.allclose(R0, R1))
+        self.assertTrue(torch.allclose(R0, rdm.rdm2x2_oe((0,0), state, env)))
+
+        # and re-folded after in-place update
+        env.C[((0,0),(-1,-1))].mul_(2.)
+        self.assertTrue(torch.allclose(rdm.rdm2x2_oe((0,0), state, env, unroll=[100,101]),\
+            rdm.rdm2x2_oe((0,0), state, env)))
+
+        # intermediates depending on replaced environment tensors are released
+        import weakref
+        del folded
+        C_old= weakref.ref(env.C[((0,0),(-1,-1))])
+        for i in range(3):
+            env.C[((0,0),(-1,-1))]= env.C[((0,0),(-1,-1))].clone()
+            rdm.rdm2x2_oe((0,0), state, env, unroll=[100,101])
+            self.assertLessEqual(len(expr.folded), len(expr.const_steps))
+        self.assertIsNone(C_old())
+        oe_ext.clear_compiled_expressions()
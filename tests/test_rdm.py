@@ -0,0 +1,142 @@
+import context
+import os
+import unittest
+import torch
+import config as cfg
+from ipeps.ipeps import *
+from ctm.generic.env import *
+
+class TestRdm(unittest.TestCase):
+    chi= 16
+
+    def test_rdm2x2_batched(self):
+        from ctm.generic import rdm
+        from ctm.generic.obs_context import OBS_CONTEXT
+        sites= {(x,y): torch.rand(2,2,2,2,2,dtype=torch.float64)-0.5 for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        env= ENV(self.chi, state)
+        init_random(env)
+        coords= list(state.sites.keys())
+        R_ref= torch.stack([rdm.rdm2x2(coord, state, env, open_sites=[0,3]) for coord in coords])
+
+        # batched contraction and fallbacks to rdms computed one by one
+        for rdm_batched, rdm_batched_memory in [(True, 0.0), (False, 0.0), (True, 1.0e-9)]:
+            cfg.ctm_args.rdm_batched= rdm_batched
+            cfg.ctm_args.rdm_batched_memory= rdm_batched_memory
+            try:
+                with self.subTest(rdm_batched=rdm_batched, rdm_batched_memory=rdm_batched_memory):
+                    self.assertTrue(torch.allclose(rdm.rdm2x2_batched(coords, state, env,\
+                        open_sites=[0,3]), R_ref))
+                    self.assertTrue(torch.allclose(rdm.rdm2x2_batched(coords, state, env,\
+                        open_sites=[0,3], obs_ctx=OBS_CONTEXT(state, env)), R_ref))
+            finally:
+                cfg.ctm_args.rdm_batched= False
+                cfg.ctm_args.rdm_batched_memory= 0.0
+
+    def test_rdm_dispatch_benchmark(self):
+        import tempfile, json
+        from ctm.generic import rdm, rdm_dispatch
+        state= IPEPS({(0,0): torch.rand(2,2,2,2,2,dtype=torch.float64)})
+        env= ENV(self.chi, state)
+        init_env(state, env)
+        rdm_ref= rdm.rdm2x2_oe((0,0), state, env)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_file= os.path.join(cache_dir, "variants.json")
+            cfg.global_args.rdm_variant_selection= 'benchmark'
+            cfg.global_args.rdm_variant_cache= cache_file
+            try:
+                self.assertTrue(torch.allclose(rdm_dispatch.rdm2x2((0,0), state, env), rdm_ref))
+                with open(cache_file) as f:
+                    records= list(json.load(f).values())
+                self.assertEqual(len(records), 1)
+                self.assertEqual(set(records[0]["timings"]), {"rdm2x2_oe", "rdm2x2_legacy"})
+                # only rdm2x2_oe handles subset of open sites
+                rdm_dispatch.rdm2x2((0,0), state, env, open_sites=[0,3])
+                self.assertEqual(len(rdm_dispatch.get_variant_cache().records), 2)
+            finally:
+                cfg.global_args.rdm_variant_selection= 'default'
+                cfg.global_args.rdm_variant_cache= 'None'
+
+    def test_rdm_dispatch_variants(self):
+        from ctm.generic import rdm_looped, rdm_dispatch
+        sites= {(x,y): torch.rand(2,2,2,2,2,dtype=torch.float64)-0.5 for x in range(3) for y in range(3)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%3, c[1]%3), lX=3, lY=3)
+        env= ENV(4, state)
+        init_random(env)
+        refs= {"rdm2x3": rdm_looped.rdm2x3_loop_oe, "rdm3x2": rdm_looped.rdm3x2_loop_oe}
+        for group, f_ref in refs.items():
+            for open_sites in [[1,2,3,4], [1,4]]:
+                for coord in [(0,0), (2,1)]:
+                    R_ref= f_ref(coord, state, env, open_sites=open_sites, unroll=False)
+                    for name, f, applicable in rdm_dispatch.VARIANTS[group]:
+                        if not applicable(open_sites): continue
+                        with self.subTest(variant=name, open_sites=open_sites, coord=coord):
+                            R= f(coord, state, env, open_sites=open_sites,\
+                                unroll=rdm_dispatch._unroll_for(False, group, name))
+                            self.assertTrue(torch.allclose(R, R_ref))
+
+    def test_expval2x2_c4v(self):
+        from groups.pg import make_c4v_symm
+        from ipeps.ipeps_c4v import IPEPS_C4V
+        from ctm.one_site_c4v.env_c4v import ENV_C4V, init_env as init_env_c4v
+        from ctm.one_site_c4v import ctmrg_c4v
+        from ctm.one_site_c4v.rdm_c4v import rdm2x2, expval2x2
+        torch.manual_seed(1)
+        state= IPEPS_C4V(make_c4v_symm(torch.rand(2,3,3,3,3,dtype=torch.float64)-0.5))
+        env= ENV_C4V(self.chi, state)
+        init_env_c4v(state, env)
+        env, *ctm_log= ctmrg_c4v.run(state, env)
+
+        # symmetric operators, hence the expectation values do not depend on
+        # the order of bra and ket indices
+        ops= [torch.rand(2,2,dtype=torch.float64) for i in range(4)]
+        ops= [op+op.t() for op in ops]
+        terms= [{0: ops[0], 1: ops[1]}, {0: ops[0], 3: ops[3]}, {1: ops[1], 2: ops[2]},\
+            {i: op for i,op in enumerate(ops)}]
+        R= rdm2x2(state, env).reshape(16,16)
+        Id= torch.eye(2,dtype=torch.float64)
+        vals_ref= []
+        for term in terms:
+            O= term.get(0,Id)
+            for i in range(1,4): O= torch.kron(O, term.get(i,Id))
+            vals_ref.append(torch.trace(R@O))
+        self.assertTrue(torch.allclose(expval2x2(state, env, terms), torch.stack(vals_ref)))
+
+    def test_rdm2x2_dn_triangle_with_operators_abelian(self):
+        try:
+            import yastn.yastn as yastn
+        except ImportError:
+            self.skipTest("test skipped: missing yastn")
+        from yastn.yastn.backend import backend_torch as backend
+        from yastn.yastn.sym import sym_U1
+        from ipeps.ipess_kagome_abelian import IPESS_KAGOME_GENERIC_ABELIAN
+        from ctm.generic_abelian.env_abelian import ENV_ABELIAN
+        import ctm.pess_kagome.rdm_kagome as rdm_kagome_dense
+        import ctm.pess_kagome_abelian.rdm_kagome as rdm_kagome
+        from models.abelian import kagome_u1
+        settings= yastn.make_config(backend=backend, sym=sym_U1, default_dtype="float64")
+        settings.backend.random_seed(1)
+        B= lambda: yastn.rand(config=settings, s=(-1, 1, 1), n=0,\
+            t=((-1, 1), (-1, 0, 1), (-1, 0, 1)), D=((1, 1), (1, 1, 1), (1, 1, 1)))
+        T= lambda: yastn.rand(config=settings, s=(-1, -1, -1), n=0,\
+            t=((-1, 0, 1), (-1, 0, 1), (-1, 0, 1)), D=((1, 1, 1), (1, 1, 1), (1, 1, 1)))
+        state= IPESS_KAGOME_GENERIC_ABELIAN(settings, {'T_u': T(), 'B_a': B(),\
+            'T_d': T(), 'B_b': B(), 'B_c': B()})
+        env= ENV_ABELIAN(self.chi, state=state, init=True)
+        model= kagome_u1.KAGOME_U1(settings)
+
+        # charge-conserving operators only, whose dense form spans the full physical space
+        ops= [model.obs_ops["sz_0"], model.obs_ops["sz_1"], model.obs_ops["sz_2"],\
+            model.SS01, model.SS12, model.SS02]
+        vals, norm= rdm_kagome.rdm2x2_dn_triangle_with_operators((0,0), state, env, ops)
+        state_d= state.to_dense()
+        env_d= env.to_dense(state)
+        for op,val in zip(ops,vals):
+            val_ref, norm_ref= rdm_kagome.rdm2x2_dn_triangle_with_operator((0,0), state, env, op)
+            self.assertAlmostEqual(val.to_number(), val_ref.to_number(), places=12)
+            self.assertAlmostEqual(norm, norm_ref, places=12)
+            val_d, norm_d= rdm_kagome_dense.rdm2x2_dn_triangle_with_operator((0,0),\
+                state_d, env_d, op.to_dense())
+            self.assertAlmostEqual(val.to_number(), val_d.item(), places=12)
+            self.assertTrue(abs(norm-norm_d.item())<=1.0e-12*abs(norm))
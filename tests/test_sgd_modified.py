@@ -0,0 +1,26 @@
+import context
+import unittest
+import torch
+from optim.sgd_modified import SGD_MOD
+
+class TestSGDMod(unittest.TestCase):
+
+    def test_step_2c_backtracking_complex(self):
+        torch.manual_seed(1)
+        x0= torch.rand(4,4,dtype=torch.complex128)
+        x= torch.zeros(4,4,dtype=torch.complex128,requires_grad=True)
+        def loss_fn():
+            return (x-x0).abs().pow(2).sum()
+        def closure(linesearching=False):
+            optimizer.zero_grad()
+            loss= loss_fn()
+            loss.backward()
+            return loss
+        def closure_linesearch(linesearching):
+            return loss_fn()
+
+        optimizer= SGD_MOD([x], lr=1., line_search_fn="backtracking", line_search_eps=1.0e-8)
+        loss0= loss_fn().item()
+        for i in range(3):
+            optimizer.step_2c(closure, closure_linesearch, precondition_fn=lambda g: 0.5*g)
+        self.assertTrue(loss_fn().item()<1.0e-2*loss0)
@@ -0,0 +1,36 @@
+import context
+import unittest
+import torch
+import torch.multiprocessing as mp
+from optim.shared_broadcast import SharedBroadcast
+
+def _read_shared(pipe, result):
+    # map shared data in a spawned process and report (version, sum of T)
+    shared= pipe.recv()
+    pipe.send("ready")
+    pipe.recv()
+    ts= shared.get()
+    result[0]= shared.version
+    result[1]= ts["T"].sum()
+
+class TestSharedBroadcast(unittest.TestCase):
+    def test_shared_broadcast(self):
+        ctx= mp.get_context('spawn')
+        C, T= torch.rand(4,4,dtype=torch.float64), torch.rand(4,4,9,dtype=torch.float64)
+        shared= SharedBroadcast(C=C, T=T)
+        result= torch.zeros(2, dtype=torch.float64).share_memory_()
+        m, w= ctx.Pipe()
+        p= ctx.Process(target=_read_shared, args=(w, result))
+        p.start()
+        m.send(shared)
+        self.assertEqual(m.recv(), "ready")
+        # publish after the worker mapped the shared memory
+        version= shared.publish(C=C, T=2*T)
+        m.send("go")
+        p.join()
+        self.assertEqual(p.exitcode, 0)
+        self.assertEqual(int(result[0]), version)
+        self.assertAlmostEqual(result[1].item(), 2*T.sum().item())
+        self.assertTrue(torch.equal(shared.get(version)["C"], C))
+        with self.assertRaises(ValueError):
+            shared.publish(C=torch.rand(5,5,dtype=torch.float64))
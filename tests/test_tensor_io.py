@@ -0,0 +1,119 @@
+import context
+import os
+import unittest
+import torch
+import config as cfg
+from ipeps.ipeps import *
+
+class TestTensorIO(unittest.TestCase):
+    chi= 16
+
+    def test_tensor_io_raw(self):
+        import tempfile
+        sites= {(x,y): torch.rand(2,3,3,3,3,dtype=torch.float64)-0.5 for x in range(2) for y in range(2)}
+        state= IPEPS(sites, vertexToSite=lambda c: (c[0]%2, c[1]%2), lX=2, lY=2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputfile= os.path.join(tmp_dir, "state.json")
+            cfg.global_args.tensor_io_format= "raw"
+            try:
+                write_ipeps(state, outputfile)
+                state_r= read_ipeps(outputfile)
+                # overwrite the file while its tensors are memory-mapped
+                write_ipeps(IPEPS({c: 2*t for c,t in sites.items()}, lX=2, lY=2), outputfile)
+            finally:
+                cfg.global_args.tensor_io_format= "legacy"
+            for c,t in sites.items():
+                self.assertTrue(torch.equal(state_r.site(c), t))
+            self.assertTrue(torch.equal(read_ipeps(outputfile).site((1,1)), 2*sites[(1,1)]))
+
+    def test_write_json_mode(self):
+        import tempfile
+        import stat
+        from ipeps.tensor_io import write_json, serialize_bare_tensor_raw
+        json_obj= {"t": serialize_bare_tensor_raw(torch.rand(2,2,dtype=torch.float64))}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputfile= os.path.join(tmp_dir, "t.json")
+            umask= os.umask(0o022)
+            try:
+                write_json(json_obj, outputfile)
+            finally:
+                os.umask(umask)
+            self.assertEqual(stat.S_IMODE(os.stat(outputfile).st_mode), 0o644)
+            # mode of the replaced file is preserved
+            os.chmod(outputfile, 0o640)
+            write_json(json_obj, outputfile)
+            self.assertEqual(stat.S_IMODE(os.stat(outputfile).st_mode), 0o640)
+            self.assertEqual(os.listdir(tmp_dir), ["t.json"])
+
+    def test_read_legacy_entries(self):
+        import numpy as np
+        from ipeps.tensor_io import read_bare_json_tensor_np_legacy, serialize_bare_tensor_legacy,\
+            _fill_entries_np
+        t= torch.rand(2,3,3,3,3,dtype=torch.complex128)
+        self.assertTrue(np.array_equal(t.numpy(),\
+            read_bare_json_tensor_np_legacy(serialize_bare_tensor_legacy(t))))
+        # real elements are accumulated over repeated indices by the vectorized parser
+        entries= ["0 0 1.5", "1 1 3.0", "0 0 0.25"]
+        X= np.zeros((2,2))
+        self.assertTrue(_fill_entries_np(X, entries))
+        self.assertTrue(np.array_equal(X, np.asarray([[1.75, 0.],[0., 3.]])))
+        X= read_bare_json_tensor_np_legacy({"dims": [2,2], "entries": entries})
+        self.assertTrue(np.array_equal(X, np.asarray([[1.75, 0.],[0., 3.]])))
+        # irregular entries are handled by the element-wise parser
+        X= read_bare_json_tensor_np_legacy({"dims": [2,2],\
+            "entries": ["0 0 1.5", "1 1 3.0 7.0", "0 1 0.25 1.0"]})
+        self.assertTrue(np.array_equal(X, np.asarray([[1.5, 0.25],[0., 3.]])))
+
+    def test_tensor_io_formats_kagome(self):
+        import tempfile
+        from ipeps.ipess_kagome import IPESS_KAGOME_GENERIC, IPESS_KAGOME_PG,\
+            write_ipess_kagome_generic, read_ipess_kagome_generic,\
+            write_ipess_kagome_pg, read_ipess_kagome_pg
+        ts= {k: torch.rand(3,3,3,dtype=torch.float64)-0.5 for k in ['T_u','T_d']}
+        ts.update({k: torch.rand(2,3,3,dtype=torch.float64)-0.5 for k in ['B_a','B_b','B_c']})
+        state_generic= IPESS_KAGOME_GENERIC(ts)
+        state_pg= IPESS_KAGOME_PG(ts['T_u'], ts['B_c'], T_d=ts['T_d'], B_a=ts['B_a'],\
+            B_b=ts['B_b'], SYM_UP_DOWN=False, SYM_BOND_S=False)
+        for tensor_io_format in ["legacy", "1D", "raw"]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                outputfile= os.path.join(tmp_dir, "state.json")
+                cfg.global_args.tensor_io_format= tensor_io_format
+                try:
+                    write_ipess_kagome_generic(state_generic, outputfile)
+                    state_r= read_ipess_kagome_generic(outputfile)
+                    for k,t in state_generic.ipess_tensors.items():
+                        self.assertTrue(torch.equal(state_r.ipess_tensors[k], t))
+
+                    write_ipess_kagome_pg(state_pg, outputfile)
+                    state_r= read_ipess_kagome_pg(outputfile)
+                    for k,t in state_pg.elem_tensors.items():
+                        self.assertTrue(torch.equal(state_r.elem_tensors[k], t))
+                finally:
+                    cfg.global_args.tensor_io_format= "legacy"
+
+    def test_tensor_io_formats_abelian(self):
+        import tempfile
+        try:
+            import yastn.yastn as yastn
+        except ImportError:
+            self.skipTest("test skipped: missing yastn")
+        from yastn.yastn.backend import backend_torch as backend
+        from yastn.yastn.sym import sym_U1
+        from ipeps.ipeps_abelian import IPEPS_ABELIAN, write_ipeps as write_ipeps_abelian,\
+            read_ipeps as read_ipeps_abelian
+        settings= yastn.make_config(backend=backend, sym=sym_U1, default_dtype="float64")
+        sites= {(x,0): yastn.rand(config=settings, s=IPEPS_ABELIAN._REF_S_DIRS, n=1,\
+            t=((-1,1), (0,-2), (0,-2), (0,2), (0,2)), D=((1,1), (2,1), (2,1), (2,1), (2,1)))\
+            for x in range(2)}
+        state= IPEPS_ABELIAN(settings, sites, lX=2, lY=1)
+        for tensor_io_format in ["legacy", "1D", "raw"]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                outputfile= os.path.join(tmp_dir, "state.json")
+                cfg.global_args.tensor_io_format= tensor_io_format
+                try:
+                    write_ipeps_abelian(state, outputfile)
+                    state_r= read_ipeps_abelian(outputfile, settings)
+                finally:
+                    cfg.global_args.tensor_io_format= "legacy"
+                for c,t in sites.items():
+                    self.assertTrue(state_r.site(c).norm_diff(t)<1.0e-14)
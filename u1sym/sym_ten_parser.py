@@ -1,5 +1,6 @@
 import torch
 import os
+from su2sym.sym_ten_parser import load_symten_file, fill_from_sparse_coo_np
 
 def parse_meta(s):
     f1=s[1:].split(", \'")
@@ -127,12 +128,15 @@ def import_sym_tensors_FIX(p, D, pg, infile=None, dtype=torch.float64, device='c
 
     infile= f"{os.path.dirname(__file__)}/D{D}.txt" if infile is None else infile 
 
-    tensors_coo= parse_symten_file(infile)
-    for tcoo in tensors_coo:
-        if pg==tcoo[0]["meta"]["pg"]:
+    # indices of all elements are shifted to 0-based, except for the first element
+    # (inds[0]) which is left unchanged, see fill_from_sparse_coo_FIX
+    for meta,inds,vals in load_symten_file(infile):
+        if pg==meta["meta"]["pg"]:
+            inds= inds-1
+            if len(inds)>0: inds[0]+= 1
             t= torch.zeros(dims, dtype=dtype, device=device)
-            t= fill_from_sparse_coo_FIX(t, tcoo[1])
-            tensors.append((tcoo[0],t))
+            t= fill_from_sparse_coo_np(t, inds, vals)
+            tensors.append((meta,t))
 
     return tensors
 
@@ -151,12 +155,10 @@ def import_sym_tensors(p, D, pg, infile=None, dtype=torch.float64, device='cpu')
 
     infile= f"{os.path.dirname(__file__)}/D{D}.txt" if infile is None else infile 
 
-    tensors_coo= parse_symten_file(infile)
-    print(tensors_coo)
-    for tcoo in tensors_coo:
-        if pg==tcoo[0]["meta"]["pg"]:
+    for meta,inds,vals in load_symten_file(infile):
+        if pg==meta["meta"]["pg"]:
             t= torch.zeros(dims, dtype=dtype, device=device)
-            t= fill_from_sparse_coo(t, tcoo[1])
-            tensors.append((tcoo[0],t))
+            t= fill_from_sparse_coo_np(t, inds, vals)
+            tensors.append((meta,t))
 
     return tensors
\ No newline at end of file